@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Bench measures the throughput of shazam's hashing and checking paths.
+It generates synthetic files locally (many tiny files, a few huge files and a
+mixed tree of directories), then times:
+	the command line: startup, calc for each hash type, calc -t all and read
+	the in-process `Process` and `File` APIs
+and reports MB/s, files/s and peak RSS, saving all results in a JSON file,
+which can be compared with the results of another commit with --compare.
+The run fails when checking one small file takes longer than --startup-budget.
+
+Each benchmark runs in its own process, whose peak RSS is reported by wait4, as the
+peak RSS of a process only grows and would include the benchmarks run before it.
+Linux reports a peak RSS of each child which is never lower than the parent's own,
+so the parent never imports shazam's modules.
+
+Usage:
+	python3 benchmarks/bench.py [--scale 0.1] [--output results.json] [--compare old.json] [--startup-budget 50]
+"""
+__author__ = "Anaxímeno Brito"
+__license__ = "GNU General Public License v3.0"
+
+import os
+import sys
+import io
+import json
+import time
+import hashlib
+import shutil
+import random
+import argparse
+import platform
+import tempfile
+import subprocess
+import contextlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SHAZAM_LIB = os.path.join(ROOT, 'usr', 'lib', 'shazam')
+SHAZAM = os.path.join(SHAZAM_LIB, 'shazam.py')
+HASHTYPES = ['md5', 'sha1', 'sha224', 'sha256', 'sha384', 'sha512']
+# Name of the benchmark whose time is limited by --startup-budget.
+STARTUP_BENCHMARK = 'cli check (one small file)'
+# Minimum number of runs of the startup benchmarks.
+STARTUP_REPEAT = 10
+
+
+class Corpus(object):
+	"""Synthetic files used by the benchmarks, generated inside one temporary directory."""
+
+	def __init__(self, directory: str, scale: float = 1.0, seed: int = 2021):
+		self.directory = directory
+		self._scale = scale
+		self._random = random.Random(seed)
+		self.tiny = os.path.join(directory, 'tiny')
+		self.huge = os.path.join(directory, 'huge')
+		self.mixed = os.path.join(directory, 'mixed')
+
+	def _scaled(self, value: int) -> int:
+		return max(int(value * self._scale), 1)
+
+	def _write(self, filename: str, size: int) -> None:
+		os.makedirs(os.path.dirname(filename), exist_ok=True)
+		with open(filename, 'wb') as f:
+			while size > 0:
+				chunk = os.urandom(min(size, 1024 * 1024))
+				f.write(chunk)
+				size -= len(chunk)
+
+	def generate(self) -> None:
+		# Many tiny files, where the fixed costs per file dominate.
+		for n in range(self._scaled(5000)):
+			self._write(os.path.join(self.tiny, f'{n // 500:03d}', f'{n:06d}.bin'), self._random.randint(0, 4096))
+		# A few huge files, where the reading and hashing throughput dominate.
+		for n in range(2):
+			self._write(os.path.join(self.huge, f'{n}.img'), self._scaled(512 * 1024 * 1024))
+		# A tree of directories with files of mixed sizes.
+		for n in range(self._scaled(500)):
+			depth = self._random.randint(0, 3)
+			parts = [f'd{self._random.randint(0, 4)}' for _ in range(depth)]
+			size = int(self._random.paretovariate(1.2) * 16 * 1024) if n % 10 else self._random.randint(1, 8) * 1024 * 1024
+			self._write(os.path.join(self.mixed, *parts, f'{n:05d}.dat'), size)
+
+	def stats(self, directory: str) -> tuple:
+		"""Returns the number of files and bytes inside the directory."""
+		files = size = 0
+		for dirpath, _, filenames in os.walk(directory):
+			for filename in filenames:
+				files += 1
+				size += os.path.getsize(os.path.join(dirpath, filename))
+		return files, size
+
+	def paths(self, directory: str) -> list:
+		return sorted(
+			os.path.join(dirpath, filename)
+			for dirpath, _, filenames in os.walk(directory) for filename in filenames)
+
+
+def run_command(args: list, cwd: str = None, env: dict = None) -> tuple:
+	"""Runs the command, returns its wall time in seconds and peak RSS in KiB."""
+	start = time.perf_counter()
+	proc = subprocess.Popen(args, cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+	_, status, rusage = os.wait4(proc.pid, 0)
+	elapsed = time.perf_counter() - start
+	proc.returncode = os.waitstatus_to_exitcode(status) if hasattr(os, 'waitstatus_to_exitcode') else status
+	if proc.returncode != 0:
+		raise RuntimeError(f'{" ".join(args)!r} exited with {proc.returncode}')
+	return elapsed, rusage.ru_maxrss
+
+
+def best_of(repeat: int, function, *args) -> tuple:
+	"""Returns the best (minimum) time of the runs, with the peak RSS of that run."""
+	return min((function(*args) for _ in range(repeat)), key=lambda result: result[0])
+
+
+def result(name: str, elapsed: float, files: int, size: int, rss_kb: int) -> dict:
+	return {
+		'name': name,
+		'seconds': round(elapsed, 6),
+		'files': files,
+		'bytes': size,
+		'mb_per_s': round(size / elapsed / 1e6, 3) if elapsed > 0 else None,
+		'files_per_s': round(files / elapsed, 3) if elapsed > 0 else None,
+		'peak_rss_kb': rss_kb,
+	}
+
+
+def bench_cli(corpus: Corpus, hashtypes: list, repeat: int, extra: list) -> list:
+	"""Benchmarks the command line program, without the cache of the hash sums
+	except when checking one small file, which is run as a user would run it."""
+	shazam = [sys.executable, SHAZAM]
+	results = []
+	# The startup takes some milliseconds, the best of more runs is kept, so it isn't noisy.
+	startup_repeat = max(repeat, STARTUP_REPEAT)
+	# Compiled as when installed, else the bytecode of the modules which changed is compiled by the first runs only.
+	subprocess.run([sys.executable, '-m', 'compileall', '-q', SHAZAM_LIB], stdout=subprocess.DEVNULL)
+
+	elapsed, rss = best_of(startup_repeat, run_command, [sys.executable, '-c', 'pass'])
+	results.append(result('python startup (-c pass)', elapsed, 0, 0, rss))
+
+	elapsed, rss = best_of(startup_repeat, run_command, shazam + ['--version'])
+	results.append(result('cli startup (--version)', elapsed, 0, 0, rss))
+
+	small = corpus.paths(corpus.tiny)[0]
+	with open(small, 'rb') as f:
+		md5sum = hashlib.md5(f.read()).hexdigest()
+	env = dict(os.environ, XDG_CACHE_HOME=os.path.join(corpus.directory, 'cache'))
+	elapsed, rss = best_of(startup_repeat, run_command, shazam + ['check', md5sum, small, '-t', 'md5'], None, env)
+	results.append(result(STARTUP_BENCHMARK, elapsed, 1, os.path.getsize(small), rss))
+
+	for label, directory in (('tiny', corpus.tiny), ('huge', corpus.huge), ('mixed', corpus.mixed)):
+		files, size = corpus.stats(directory)
+		for hashtype in hashtypes + ['all']:
+			elapsed, rss = best_of(repeat, run_command, shazam + ['calc', '-t', hashtype, '-r', directory,
+				'--no-cache'] + extra)
+			results.append(result(f'cli calc -t {hashtype} ({label})', elapsed, files, size, rss))
+
+		manifest = os.path.join(corpus.directory, f'{label}.sha256')
+		run_command(shazam + ['calc', '-t', 'sha256', '-r', directory, '-w', '-n', manifest, '--no-cache'])
+		elapsed, rss = best_of(repeat, run_command, shazam + ['read', manifest, '-t', 'sha256', '--no-cache'] + extra)
+		results.append(result(f'cli read sha256 ({label})', elapsed, files, size, rss))
+
+	return results
+
+
+def api_file(paths: list, hashtypes: list) -> None:
+	from common import File
+	for path in paths:
+		file = File(path)
+		file.update_many_data(hashtypes, file.gen_data(bar_anim=False))
+
+
+def api_process(paths: list, hashtypes: list) -> None:
+	from common import File, Process
+	Process().calculate_hash_sum([File(path) for path in paths], hashtypes[0])
+
+
+# API benchmarks run by the worker processes, by name.
+API_BENCHMARKS = {'File': api_file, 'Process.calculate_hash_sum': api_process}
+
+
+def run_api_worker(name: str, hashtypes: str, directory: str) -> int:
+	"""Runs one API benchmark over the files of the directory in this process and prints its wall time."""
+	sys.path.insert(0, SHAZAM_LIB)
+	from common import Process
+	hashtypes = Process.HASHTYPES_LIST if hashtypes == 'all' else hashtypes.split(',')
+	paths = Corpus(directory).paths(directory)
+	start = time.perf_counter()
+	with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+		API_BENCHMARKS[name](paths, hashtypes)
+	print(time.perf_counter() - start)
+	return 0
+
+
+def run_api(name: str, hashtypes: str, directory: str) -> tuple:
+	"""Runs one API benchmark in a new process, returns its wall time in seconds and the
+	peak RSS of that process in KiB, as the peak RSS of a process never decreases."""
+	args = [sys.executable, os.path.abspath(__file__), '--api-worker', name, hashtypes, directory]
+	proc = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+	output = proc.stdout.read()
+	proc.stdout.close()
+	_, status, rusage = os.wait4(proc.pid, 0)
+	if status != 0:
+		raise RuntimeError(f'{" ".join(args)!r} exited with status {status}')
+	return float(output), rusage.ru_maxrss
+
+
+def bench_api(corpus: Corpus, hashtypes: list, repeat: int) -> list:
+	"""Benchmarks the in-process `File` and `Process` APIs, each run in its own process."""
+	results = []
+	for label, directory in (('tiny', corpus.tiny), ('huge', corpus.huge), ('mixed', corpus.mixed)):
+		files, size = corpus.stats(directory)
+		for hashtype in hashtypes + ['all']:
+			elapsed, rss = best_of(repeat, run_api, 'File', hashtype, directory)
+			results.append(result(f'api File {hashtype} ({label})', elapsed, files, size, rss))
+		elapsed, rss = best_of(repeat, run_api, 'Process.calculate_hash_sum', 'sha256', directory)
+		results.append(result(f'api Process.calculate_hash_sum sha256 ({label})', elapsed, files, size, rss))
+	return results
+
+
+def compare(results: list, old_results: list, threshold: float) -> int:
+	"""Prints the change of each benchmark's time, returns the number of regressions."""
+	old = {r['name']: r for r in old_results}
+	regressions = 0
+	for r in results:
+		if r['name'] not in old or not old[r['name']]['seconds']:
+			continue
+		ratio = r['seconds'] / old[r['name']]['seconds']
+		flag = ''
+		if ratio > 1 + threshold:
+			flag = '  <-- REGRESSION'
+			regressions += 1
+		print(f"{r['name']:<55} {old[r['name']]['seconds']:>9.4f}s -> {r['seconds']:>9.4f}s  x{ratio:.2f}{flag}")
+	return regressions
+
+
+def check_startup(results: list, budget_ms: float) -> bool:
+	"""Prints whether checking one small file fits in the budget, returns False when it is exceeded."""
+	for r in results:
+		if r['name'] == STARTUP_BENCHMARK:
+			elapsed_ms = r['seconds'] * 1000
+			exceeded = elapsed_ms > budget_ms
+			print(f"\n{STARTUP_BENCHMARK}: {elapsed_ms:.1f}ms, budget {budget_ms:g}ms"
+				+ ('  <-- OVER BUDGET' if exceeded else ''))
+			return not exceeded
+	return True
+
+
+def get_commit() -> str:
+	try:
+		return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=ROOT, stderr=subprocess.DEVNULL).decode().strip()
+	except (OSError, subprocess.CalledProcessError):
+		return None
+
+
+def get_args():
+	parser = argparse.ArgumentParser(prog='bench', description='Benchmarks the hashing and checking paths of shazam.')
+	parser.add_argument('--scale', type=float, default=1.0,
+		help='Multiplies the number and size of the generated files (default: 1.0, about 1.5GB)')
+	parser.add_argument('-t', '--types', default=','.join(HASHTYPES),
+		help='Comma separated hash types benchmarked one by one (default: all supported)')
+	parser.add_argument('--repeat', type=int, default=3, help='Runs of each benchmark, the best is kept (default: 3)')
+	parser.add_argument('--skip-cli', action='store_true', help='Do not benchmark the command line program')
+	parser.add_argument('--skip-api', action='store_true', help='Do not benchmark the in-process APIs')
+	parser.add_argument('--shazam-args', default='', metavar='ARGS',
+		help="Extra arguments given to 'shazam calc' and 'shazam read', e.g.: '-j 4'")
+	parser.add_argument('--dir', help='Where the files are generated (default: a temporary directory, removed at the end)')
+	parser.add_argument('-o', '--output', default='bench_results.json', help='JSON file for the results')
+	parser.add_argument('--compare', metavar='JSON', help='Results of a previous run, to compare with')
+	parser.add_argument('--threshold', type=float, default=0.2,
+		help='Slowdown above which a benchmark is reported as a regression (default: 0.2, i.e. 20%%)')
+	parser.add_argument('--api-worker', nargs=3, metavar=('NAME', 'TYPES', 'DIR'), help=argparse.SUPPRESS)
+	parser.add_argument('--startup-budget', type=float, default=50, metavar='MS',
+		help=f"Fails when '{STARTUP_BENCHMARK}' takes longer, in milliseconds (default: 50, 0 to disable)")
+	return parser.parse_args()
+
+
+def main() -> int:
+	args = get_args()
+	if args.api_worker:
+		return run_api_worker(*args.api_worker)
+	hashtypes = [t for t in args.types.split(',') if t]
+	directory = args.dir or tempfile.mkdtemp(prefix='shazam-bench-')
+
+	try:
+		corpus = Corpus(directory, scale=args.scale)
+		start = time.perf_counter()
+		corpus.generate()
+		print(f'corpus generated in {time.perf_counter() - start:.1f}s at {directory!r}', file=sys.stderr)
+
+		results = []
+		if not args.skip_cli:
+			results += bench_cli(corpus, hashtypes, args.repeat, args.shazam_args.split())
+		if not args.skip_api:
+			results += bench_api(corpus, hashtypes, args.repeat)
+	finally:
+		if args.dir is None:
+			shutil.rmtree(directory, ignore_errors=True)
+
+	for r in results:
+		print(f"{r['name']:<55} {r['seconds']:>9.4f}s {r['mb_per_s'] or 0:>10.1f} MB/s "
+			f"{r['files_per_s'] or 0:>10.1f} files/s {r['peak_rss_kb']:>8d} KiB")
+
+	report = {
+		'commit': get_commit(),
+		'python': platform.python_version(),
+		'platform': platform.platform(),
+		'cpus': os.cpu_count(),
+		'scale': args.scale,
+		'date': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+		'results': results,
+	}
+	with open(args.output, 'wt') as f:
+		json.dump(report, f, indent=2)
+	print(f'\nresults saved in {args.output!r}', file=sys.stderr)
+
+	status = 0
+	if args.startup_budget > 0 and not check_startup(results, args.startup_budget):
+		status = 1
+	if args.compare:
+		with open(args.compare, 'rt') as f:
+			old_report = json.load(f)
+		print(f"\ncompared with {old_report.get('commit')}:")
+		if compare(results, old_report['results'], args.threshold) > 0:
+			status = 1
+	return status
+
+
+if __name__ == '__main__':
+	sys.exit(main())
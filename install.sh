@@ -2,4 +2,6 @@ sudo echo 'Moving usr/bin/shazam to /usr/bin...'
 sudo cp usr/bin/shazam /usr/bin/
 echo 'Moving usr/lib/shazam usr/lib/...'
 sudo cp usr/lib/shazam  -r /usr/lib/
+echo 'Compiling /usr/lib/shazam...'
+sudo python3 -m compileall -q /usr/lib/shazam
 echo 'Done!'
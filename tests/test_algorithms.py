@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+""" Tests of the hash algorithms of shazam, run with: python3 -m unittest discover tests"""
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import types
+import hashlib
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'usr', 'lib', 'shazam'))
+
+import algorithms
+from algorithms import get_algorithms, get_name_from_tag, is_supported, new_hasher
+from common import ReadingError, TextFile, get_hashtypes_from_string
+
+
+class TagTest(unittest.TestCase):
+
+	def test_names(self):
+		for tag, name in (('SHA256', 'sha256'), ('sha256', 'sha256'), ('Sha256', 'sha256'), ('MD5', 'md5'),
+			('BLAKE2b', 'blake2b'), ('SHA3-256', 'sha3_256'), ('SHA256-TREE', 'sha256-tree'), ('sha1-tree', 'sha1-tree')):
+			self.assertEqual(get_name_from_tag(tag), name, tag)
+
+	def test_unknown_tags(self):
+		for tag in ('', 'SHA', 'SHA257', 'FOO-TREE', '-TREE', 'SHAKE_128', 'SHAKE128', 'SHA256 TREE'):
+			self.assertIsNone(get_name_from_tag(tag), tag)
+
+	def test_bsd_style_lines(self):
+		with tempfile.TemporaryDirectory() as directory:
+			manifest = os.path.join(directory, 'CHECKSUMS')
+			sha256, blake2b = hashlib.sha256(b'a').hexdigest(), hashlib.blake2b(b'b').hexdigest()
+			with open(manifest, 'wt') as f:
+				# As written by ``sha256sum --tag`` and by BSD's sha256, with a name with parentheses and spaces.
+				f.write(f'SHA256 (a) = {sha256}\n')
+				f.write(f'BLAKE2b (dir/b (1).txt) = {blake2b}\n')
+				f.write(f'SHA3-256 (c) = {hashlib.sha3_256(b"c").hexdigest()} 1\n')
+			self.assertEqual(list(TextFile(manifest).iter_entries()), [
+				('a', sha256, None, 'sha256'),
+				('dir/b (1).txt', blake2b, None, 'blake2b'),
+				('c', hashlib.sha3_256(b'c').hexdigest(), 1, 'sha3_256')])
+			self.assertEqual(TextFile(manifest).get_hashtype(), 'sha256')
+
+			with open(manifest, 'at') as f:
+				f.write(f'WHIRLPOOL2 (d) = {sha256}\n')
+			with self.assertRaises(ReadingError):
+				list(TextFile(manifest).iter_entries())
+
+
+class RegistryTest(unittest.TestCase):
+
+	def setUp(self):
+		self._new = algorithms.hlib.new
+		self._optional = algorithms.OPTIONAL_ALGORITHMS
+		self._algorithms = algorithms._algorithms
+
+	def tearDown(self):
+		algorithms.hlib.new = self._new
+		algorithms.OPTIONAL_ALGORITHMS = self._optional
+		algorithms._algorithms = self._algorithms
+		sys.modules.pop('fakehash', None)
+
+	def test_hashlib_algorithms(self):
+		for name in ('md5', 'sha1', 'sha256', 'sha512', 'blake2b', 'sha3_256'):
+			self.assertTrue(is_supported(name), name)
+			self.assertEqual(new_hasher(name, b'data').hexdigest(), hashlib.new(name, b'data').hexdigest())
+		# Their digests don't have a fixed length.
+		self.assertFalse(any(name.startswith('shake_') for name in get_algorithms()))
+		with self.assertRaises(ValueError):
+			new_hasher('sha257')
+
+	def test_unusable_algorithms(self):
+		def new(name, *args, **kwargs):
+			# As OpenSSL does with the algorithms disabled by its security policy (e.g. FIPS mode).
+			if name == 'md5':
+				raise ValueError(f'unsupported hash type {name}')
+			return self._new(name, *args, **kwargs)
+
+		algorithms.hlib.new = new
+		algorithms._algorithms = None
+		self.assertFalse(is_supported('md5'))
+		self.assertTrue(is_supported('sha256'))
+		self.assertIsNone(get_name_from_tag('MD5'))
+		self.assertIsNone(get_hashtypes_from_string('md5,sha256'))
+		self.assertEqual(get_hashtypes_from_string('sha256,sha256-tree'), ['sha256', 'sha256-tree'])
+		with self.assertRaises(ValueError):
+			new_hasher('md5')
+
+	def test_optional_packages(self):
+		module = types.ModuleType('fakehash')
+		module.fake256 = lambda: hashlib.sha256(b'fake')
+		sys.modules['fakehash'] = module
+		algorithms.OPTIONAL_ALGORITHMS = {'fakehash': ['fake256', 'fake512'], 'not_installed_hash': ['absent']}
+		algorithms._algorithms = None
+		self.assertTrue(is_supported('fake256'))
+		self.assertEqual(new_hasher('fake256').hexdigest(), hashlib.sha256(b'fake').hexdigest())
+		self.assertEqual(get_name_from_tag('FAKE256-TREE'), 'fake256-tree')
+		# Missing from the package, or the package isn't installed.
+		self.assertFalse(is_supported('fake512'))
+		self.assertFalse(is_supported('absent'))
+		self.assertTrue(is_supported('sha256'))
+
+
+if __name__ == '__main__':
+	unittest.main()
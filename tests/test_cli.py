@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+""" Tests of the command line of shazam, run with: python3 -m unittest discover tests"""
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import io
+import hashlib
+import tempfile
+import unittest
+import contextlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'usr', 'lib', 'shazam'))
+
+from cli import main
+
+
+class ReadTest(unittest.TestCase):
+
+	def setUp(self):
+		self._dir = tempfile.TemporaryDirectory()
+		self.manifest = os.path.join(self._dir.name, 'sha256sum.txt')
+		with open(os.path.join(self._dir.name, 'a.txt'), 'wb') as f:
+			f.write(b'a')
+		with open(self.manifest, 'wt') as f:
+			f.write(f"{hashlib.sha256(b'a').hexdigest()}  a.txt\n")
+
+	def tearDown(self):
+		self._dir.cleanup()
+
+	def run_shazam(self, *args) -> tuple:
+		"""Runs the command line, returns its exit code and what it printed."""
+		output = io.StringIO()
+		argv = sys.argv
+		sys.argv = ['shazam'] + list(args)
+		try:
+			with contextlib.redirect_stdout(output), contextlib.redirect_stderr(io.StringIO()):
+				main()
+		except SystemExit as exit:
+			return exit.code, output.getvalue()
+		finally:
+			sys.argv = argv
+		return 0, output.getvalue()
+
+	def test_filtered(self):
+		code, printed = self.run_shazam('read', self.manifest, '--root', self._dir.name, '--no-cache', '-q')
+		self.assertEqual((code, printed), (0, f"{os.path.join(self._dir.name, 'a.txt')}: OK\n"))
+
+		for filters in (['--include', '*.bin'], ['--exclude', '*.txt']):
+			code, printed = self.run_shazam('read', self.manifest, '--no-cache', *filters)
+			self.assertEqual(code, 1)
+			self.assertIn('matches --include and --exclude', printed)
+			self.assertNotIn('is empty', printed)
+
+	def test_other_hash_type(self):
+		with open(self.manifest, 'wt') as f:
+			f.write(f"SHA1 (a.txt) = {hashlib.sha1(b'a').hexdigest()}\n")
+		code, printed = self.run_shazam('read', self.manifest, '-t', 'md5', '--no-cache')
+		self.assertEqual(code, 1)
+		self.assertIn("has the hash type 'md5'", printed)
+
+	def test_empty(self):
+		open(self.manifest, 'w').close()
+		code, printed = self.run_shazam('read', self.manifest, '-t', 'sha256', '--no-cache', '--include', '*')
+		self.assertEqual(code, 1)
+		self.assertIn('is empty', printed)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,893 @@
+#!/usr/bin/env python3
+""" Tests of the support modules of shazam, run with: python3 -m unittest discover tests"""
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import io
+import hashlib
+import tempfile
+import unittest
+import contextlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'usr', 'lib', 'shazam'))
+
+from common import File, Process, RateLimiter, TextFile, dump_record, load_segments, make_record, walk_files
+from cache import DigestCache
+from stats import RunStats
+from api import hash_many, verify_manifest, verify_many
+
+
+class ManifestEntriesTest(unittest.TestCase):
+
+	def setUp(self):
+		self._dir = tempfile.TemporaryDirectory()
+		self.root = self._dir.name
+		self.data = b'shazam\n'
+		with open(os.path.join(self.root, 'f'), 'wb') as f:
+			f.write(self.data)
+
+	def tearDown(self):
+		self._dir.cleanup()
+
+	def test_binary_mode_entry(self):
+		# As written by ``sha256sum -b``: HASH *NAME.
+		manifest = os.path.join(self.root, 'sha256sum.txt')
+		with open(manifest, 'wt') as f:
+			f.write(f'{hashlib.sha256(self.data).hexdigest()} *f\n')
+
+		file = File(os.path.join(self.root, '*f'))
+		self.assertEqual(file.get_fullpath(), os.path.join(self.root, 'f'))
+		self.assertTrue(file.exists())
+		results = list(verify_manifest(manifest, 'sha256', root=self.root))
+		self.assertEqual([result.status for result in results], ['ok'])
+
+
+	def test_names_starting_with_a_number(self):
+		digest = hashlib.sha256(self.data).hexdigest()
+		manifest = os.path.join(self.root, 'sha256sum.txt')
+		with open(manifest, 'wt') as f:
+			# As written by sha256sum, and by shazam with and without the sizes.
+			f.write(f'{digest}  2021 report.pdf\n')
+			f.write(f'{digest} 7 2021 report.pdf\n')
+			f.write(f'{digest} report 2021.pdf\n')
+		self.assertEqual(list(TextFile(manifest).iter_entries()), [
+			('2021 report.pdf', digest, None, None),
+			('2021 report.pdf', digest, 7, None),
+			('report 2021.pdf', digest, None, None)])
+
+	def test_segments_of_names_with_spaces(self):
+		segments = os.path.join(self.root, 'sha256-treesum.txt.segments')
+		with open(segments, 'wt') as f:
+			f.write('00ff,ee11 d/with space.bin\n')
+			f.write(' empty\n')
+			# Written by the older versions.
+			f.write('old 00ff ee11\n')
+		self.assertEqual(load_segments(segments),
+			{'d/with space.bin': ['00ff', 'ee11'], 'empty': [], 'old': ['00ff', 'ee11']})
+
+	def test_hard_links_are_not_cached(self):
+		os.link(os.path.join(self.root, 'f'), os.path.join(self.root, 'g'))
+		results = list(hash_many([os.path.join(self.root, name) for name in ('f', 'g')], 'sha256'))
+		self.assertEqual([result.actual for result in results], [hashlib.sha256(self.data).hexdigest()] * 2)
+		self.assertEqual([result.cached for result in results], [False, False])
+
+
+class WalkFilesTest(unittest.TestCase):
+
+	def setUp(self):
+		self._dir = tempfile.TemporaryDirectory()
+		self.root = self._dir.name
+		for path in ('a.txt', 'b.bin', 'docs/c.txt', 'docs/d.md', 'docs/build/e.txt', 'f/g.bin'):
+			os.makedirs(os.path.join(self.root, os.path.dirname(path)), exist_ok=True)
+			with open(os.path.join(self.root, path), 'wb') as f:
+				f.write(path.encode())
+
+	def tearDown(self):
+		self._dir.cleanup()
+
+	def walk(self, *args, **kwargs) -> list:
+		return [os.path.relpath(file.get_fullpath(), self.root) for file in walk_files(self.root, *args, **kwargs)]
+
+	def test_sorted(self):
+		self.assertEqual(self.walk(), ['a.txt', 'b.bin', 'docs/c.txt', 'docs/d.md', 'docs/build/e.txt', 'f/g.bin'])
+
+	def test_filters(self):
+		self.assertEqual(self.walk(['*.txt']), ['a.txt', 'docs/c.txt', 'docs/build/e.txt'])
+		self.assertEqual(self.walk(['docs/*']), ['docs/c.txt', 'docs/d.md', 'docs/build/e.txt'])
+		self.assertEqual(self.walk(['*.txt', '*.md']), ['a.txt', 'docs/c.txt', 'docs/d.md', 'docs/build/e.txt'])
+		self.assertEqual(self.walk(exclude=['build']), ['a.txt', 'b.bin', 'docs/c.txt', 'docs/d.md', 'f/g.bin'])
+		self.assertEqual(self.walk(['*.txt'], ['docs']), ['a.txt'])
+		self.assertEqual(self.walk(exclude=['*.bin', 'd.md']), ['a.txt', 'docs/c.txt', 'docs/build/e.txt'])
+		self.assertEqual(self.walk(['*.none']), [])
+		self.assertEqual(self.walk(exclude=['*']), [])
+
+	def test_symbolic_links(self):
+		os.symlink(os.path.join(self.root, 'a.txt'), os.path.join(self.root, 'link.txt'))
+		os.symlink('missing', os.path.join(self.root, 'broken'))
+		# Loops back to its parent, and to the root.
+		os.symlink(os.path.join(self.root, 'docs'), os.path.join(self.root, 'docs', 'build', 'up'))
+		os.symlink(self.root, os.path.join(self.root, 'f', 'root'))
+		self.assertEqual(self.walk(), ['a.txt', 'b.bin', 'docs/c.txt', 'docs/d.md', 'docs/build/e.txt', 'f/g.bin'])
+
+		# Each directory is walked once, the broken link is skipped.
+		paths = self.walk(follow_symlinks=True)
+		self.assertEqual(paths, ['a.txt', 'b.bin', 'link.txt', 'docs/c.txt', 'docs/d.md', 'docs/build/e.txt', 'f/g.bin'])
+
+	def test_stat_is_reused(self):
+		files = list(walk_files(self.root))
+		self.assertTrue(all(file._stat for file in files))
+		self.assertEqual([file.get_size() for file in files], [len(file.get_fullpath()) - len(self.root) - 1
+			for file in files])
+
+	def test_many_hashtypes_in_one_read(self):
+		reads = []
+		gen_data = File.gen_data
+
+		def counting_gen_data(file, **kwargs):
+			reads.append(file.get_fullpath())
+			return gen_data(file, **kwargs)
+
+		File.gen_data = counting_gen_data
+		try:
+			output = io.StringIO()
+			with contextlib.redirect_stdout(output):
+				found = Process(output='porcelain').totalcheck(walk_files(self.root), ['md5', 'sha256'])
+		finally:
+			File.gen_data = gen_data
+		paths = [file.get_fullpath() for file in found]
+		self.assertEqual(reads, paths)
+		expected = []
+		for path in paths:
+			with open(path, 'rb') as f:
+				data = f.read()
+			expected += [f'MD5 ({path}) = {hashlib.md5(data).hexdigest()}',
+				f'SHA256 ({path}) = {hashlib.sha256(data).hexdigest()}']
+		self.assertEqual(output.getvalue().splitlines(), expected)
+
+
+class RecordingProgressBar(object):
+	"""Stands for the progress bars of tqdm, recording their total and updates."""
+	bars = []
+
+	def __init__(self, disable: bool = False, **kwargs):
+		self.total = kwargs.get('total')
+		self.updates = 0
+		if not disable:
+			RecordingProgressBar.bars.append(self)
+
+	def update(self, n: int = 1) -> None:
+		self.updates += n
+
+	def close(self) -> None:
+		pass
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_info) -> None:
+		self.close()
+
+
+class ParallelOrderTest(unittest.TestCase):
+
+	# The jobs and executors hashing the files in parallel.
+	POOLS = [(4, 'thread'), (4, 'process'), (3, 'thread'), (3, 'process')]
+
+	def setUp(self):
+		self._dir = tempfile.TemporaryDirectory()
+		self.root = self._dir.name
+		# The first files are the biggest, so they are hashed last when many are hashed at once.
+		self.paths = []
+		for n in range(12):
+			path = os.path.join(self.root, f'{n:02}.bin')
+			with open(path, 'wb') as f:
+				f.write(bytes([n]) * ((12 - n) * 64 * 1024))
+			self.paths.append(path)
+		self.missing = os.path.join(self.root, 'missing')
+		self.directory = os.path.join(self.root, 'directory')
+		os.mkdir(self.directory)
+		# Mixed in between the files, the directory is only found unreadable when it is opened by `hash_many`.
+		self.inputs = self.paths[:3] + [self.missing] + self.paths[3:7] + [self.directory] + self.paths[7:]
+		if os.geteuid() != 0:
+			# The superuser can read it anyway.
+			self.forbidden = os.path.join(self.root, 'forbidden')
+			with open(self.forbidden, 'wb') as f:
+				f.write(b'forbidden')
+			os.chmod(self.forbidden, 0)
+			self.inputs.insert(5, self.forbidden)
+
+	def tearDown(self):
+		self._dir.cleanup()
+
+	def sha256(self, path: str) -> str:
+		with open(path, 'rb') as f:
+			return hashlib.sha256(f.read()).hexdigest()
+
+	def test_hash_many(self):
+		expected = [(path, self.sha256(path) if path in self.paths else None) for path in self.inputs]
+		for jobs, executor in ParallelOrderTest.POOLS:
+			results = list(hash_many(self.inputs, 'sha256', jobs=jobs, executor=executor))
+			self.assertEqual([(result.path, result.actual) for result in results], expected, (jobs, executor))
+			self.assertEqual([result.status for result in results if result.path == self.missing], ['missing'])
+			self.assertEqual([result.status for result in results if result.path == self.directory], ['unreadable'])
+
+	def test_calculate_hash_sum(self):
+		import json
+		for jobs, executor in ParallelOrderTest.POOLS:
+			output = io.StringIO()
+			with contextlib.redirect_stdout(output):
+				found = Process(jobs, executor, output='jsonl').calculate_hash_sum(
+					[File(path) for path in self.inputs], 'sha256')
+			self.assertEqual([file.get_fullpath() for file in found], self.paths, (jobs, executor))
+			records = [json.loads(line) for line in output.getvalue().splitlines()]
+			# The hashed files in the given order, then the ones which couldn't be read.
+			self.assertEqual([(record['path'], record['actual']) for record in records[:len(self.paths)]],
+				[(path, self.sha256(path)) for path in self.paths])
+			self.assertEqual({record['path']: record['status'] for record in records[len(self.paths):]},
+				{path: 'missing' if path == self.missing else 'unreadable'
+					for path in self.inputs if path not in self.paths})
+
+	def test_written_manifest(self):
+		manifests = []
+		for jobs, executor in [(1, 'thread')] + ParallelOrderTest.POOLS:
+			manifest = os.path.join(self.root, f'{executor}{jobs}sum.txt')
+			with contextlib.redirect_stdout(io.StringIO()):
+				process = Process(jobs, executor, output='porcelain')
+				files = process.calculate_hash_sum([File(path) for path in reversed(self.paths)], 'sha256')
+				process.write(files, 'sha256', manifest)
+			with open(manifest, 'rt') as f:
+				manifests.append(f.read())
+		self.assertEqual(manifests[0].splitlines(), [f'{self.sha256(path)}  {path}' for path in reversed(self.paths)])
+		self.assertEqual(manifests, [manifests[0]] * len(manifests))
+
+	def test_aggregate_progress(self):
+		import common
+		progress_bar = common.progress_bar
+		common.progress_bar = RecordingProgressBar
+		try:
+			for jobs, executor in [(1, 'thread')] + ParallelOrderTest.POOLS:
+				RecordingProgressBar.bars = []
+				files = [File(path) for path in self.paths]
+				process = Process(jobs, executor, progress=True)
+				self.assertEqual(list(process._iter_hashed(files, ('sha256',))), files)
+				# One bar for all the files, none of them has its own.
+				self.assertEqual([(bar.total, bar.updates) for bar in RecordingProgressBar.bars],
+					[(len(files), len(files))], (jobs, executor))
+		finally:
+			common.progress_bar = progress_bar
+
+
+class AsyncExecutorTest(unittest.TestCase):
+
+	def setUp(self):
+		self._dir = tempfile.TemporaryDirectory()
+		self.paths = []
+		for n in range(10):
+			path = os.path.join(self._dir.name, f'{n}.bin')
+			with open(path, 'wb') as f:
+				f.write(bytes([n]) * ((10 - n) * 100 * 1024))
+			self.paths.append(path)
+		self._hash_file_async = Process._hash_file_async
+
+	def tearDown(self):
+		Process._hash_file_async = self._hash_file_async
+		self._dir.cleanup()
+
+	def sha256(self, path: str) -> str:
+		with open(path, 'rb') as f:
+			return hashlib.sha256(f.read()).hexdigest()
+
+	def test_order(self):
+		missing = os.path.join(self._dir.name, 'missing')
+		inputs = self.paths[:4] + [missing] + self.paths[4:] + [self._dir.name]
+		for in_flight in (None, 1, 2, 5):
+			results = list(hash_many(inputs, 'md5,sha256', jobs=3, executor='async', in_flight=in_flight,
+				buffer_size=64 * 1024))
+			self.assertEqual([(result.path, result.algorithm) for result in results],
+				[(path, algorithm) for path in inputs for algorithm in ('md5', 'sha256')], in_flight)
+			self.assertEqual([result.actual for result in results if result.algorithm == 'sha256'],
+				[self.sha256(path) if path in self.paths else None for path in inputs], in_flight)
+
+	def test_errors(self):
+		inputs = self.paths[:2] + [self._dir.name] + self.paths[2:]
+		results = list(hash_many(inputs, 'sha256', jobs=2, executor='async'))
+		self.assertEqual([result.status for result in results], ['hashed'] * 2 + ['unreadable'] + ['hashed'] * 8)
+		self.assertIsNotNone(results[2].error)
+		with self.assertRaises(IsADirectoryError):
+			list(hash_many(inputs, 'sha256', jobs=2, executor='async', on_error='raise'))
+
+	def test_in_flight_bound(self):
+		for in_flight in (2, 3, 6):
+			taken = []
+
+			def gen_files():
+				for path in self.paths:
+					taken.append(path)
+					yield File(path)
+
+			process = Process(2, 'async', in_flight=in_flight)
+			for n, file in enumerate(process.iter_hashed(gen_files(), ('sha256',))):
+				self.assertEqual(file.get_fullpath(), self.paths[n])
+				# The files taken, but not yielded yet, are the ones in flight.
+				self.assertLessEqual(len(taken) - n, in_flight)
+			self.assertEqual(len(taken), len(self.paths))
+
+	def test_cancelled_when_stopped(self):
+		import asyncio
+		started, cancelled = [], []
+		hash_file_async = self._hash_file_async
+
+		async def hash_first_file(process, file, hashtypes, readers):
+			started.append(file.get_fullpath())
+			if file.get_fullpath() == self.paths[0]:
+				return await hash_file_async(process, file, hashtypes, readers)
+			try:
+				await asyncio.sleep(3600)
+			except asyncio.CancelledError:
+				cancelled.append(file.get_fullpath())
+				raise
+
+		Process._hash_file_async = hash_first_file
+		results = Process(2, 'async', in_flight=4).iter_hashed((File(path) for path in self.paths), ('sha256',))
+		self.assertEqual(next(results).get_fullpath(), self.paths[0])
+		results.close()
+		# The files after the ones in flight were never started.
+		self.assertEqual(started, self.paths[:4])
+		self.assertEqual(cancelled, self.paths[1:4])
+
+	def test_negative_numbers(self):
+		with self.assertRaises(ValueError):
+			Process(-1)
+		with self.assertRaises(ValueError):
+			Process(2, 'async', in_flight=0)
+		with self.assertRaises(ValueError):
+			list(hash_many(self.paths, 'sha256', jobs=2, in_flight=-1))
+
+
+class ReadingTest(unittest.TestCase):
+
+	def setUp(self):
+		self._dir = tempfile.TemporaryDirectory()
+		self._mmap_threshold = File.MMAP_THRESHOLD
+		File.MMAP_THRESHOLD = 4096
+
+	def tearDown(self):
+		File.MMAP_THRESHOLD = self._mmap_threshold
+		self._dir.cleanup()
+
+	def write(self, name: str, data: bytes) -> str:
+		path = os.path.join(self._dir.name, name)
+		with open(path, 'wb') as f:
+			f.write(data)
+		return path
+
+	def chunk_sizes(self, path: str, **kwargs) -> list:
+		"""Returns the sizes of the chunks generated for the file, checking their data."""
+		chunks = []
+		for chunk in File(path).gen_data(bar_anim=False, **kwargs):
+			chunks.append(bytes(chunk))
+		with open(path, 'rb') as f:
+			self.assertEqual(b''.join(chunks), f.read(), kwargs)
+		return [len(chunk) for chunk in chunks]
+
+	def is_mapped(self, path: str, io_mode: str) -> bool:
+		with open(path, 'rb', buffering=0) as f:
+			mapping = File._map(f, os.fstat(f.fileno()), io_mode)
+		if mapping is not None:
+			mapping.close()
+		return mapping is not None
+
+	def test_read_until_the_end(self):
+		for size, sizes in ((0, []), (1, [1]), (999, [999]), (1000, [1000]), (2000, [1000, 1000]), (2001, [1000, 1000, 1])):
+			path = self.write('f', b'x' * size)
+			self.assertEqual(self.chunk_sizes(path, buffer_size=1000, io_mode='read'), sizes, size)
+			with open(path, 'rb', buffering=0) as f:
+				self.assertEqual([len(chunk) for chunk in File._gen_read_data(f, 1000)], sizes, size)
+
+	def test_buffer_size(self):
+		path = self.write('f', bytes(range(256)) * 40)
+		for io_mode in File.IO_MODES:
+			self.assertEqual(self.chunk_sizes(path, buffer_size=4096, io_mode=io_mode), [4096, 4096, 2048], io_mode)
+		# Adapted to the file, but never smaller than one block.
+		self.assertEqual(self.chunk_sizes(path, io_mode='read'), [10240])
+		self.assertEqual(File.get_buffer_size(10240, 4096), 12288)
+		self.assertEqual(File.get_buffer_size(0, 4096), 4096)
+		self.assertEqual(File.get_buffer_size(1024 ** 3, 4096), File.MAX_BUFFER_SIZE)
+		self.assertEqual(File.get_buffer_size(64 * (File.MIN_BUFFER_SIZE + 1000), 4096), File.MIN_BUFFER_SIZE + 4096)
+
+	def test_mapped_or_read(self):
+		small, big, empty = self.write('small', b'x' * 4095), self.write('big', b'x' * 4096), self.write('empty', b'')
+		self.assertEqual([self.is_mapped(path, 'auto') for path in (small, big, empty)], [False, True, False])
+		self.assertEqual([self.is_mapped(path, 'mmap') for path in (small, big, empty)], [True, True, False])
+		self.assertEqual([self.is_mapped(path, 'read') for path in (small, big, empty)], [False, False, False])
+		self.assertEqual(self.chunk_sizes(big, io_mode='mmap'), [4096])
+		self.assertEqual(self.chunk_sizes(empty, io_mode='mmap'), [])
+
+	def test_pipes_are_read(self):
+		import threading
+		fifo = os.path.join(self._dir.name, 'fifo')
+		os.mkfifo(fifo)
+
+		def write():
+			with open(fifo, 'wb') as f:
+				f.write(b'x' * 10000)
+
+		writer = threading.Thread(target=write)
+		writer.start()
+		file = File(fifo)
+		data = b''.join(bytes(chunk) for chunk in file.gen_data(bar_anim=False, buffer_size=4096, io_mode='mmap'))
+		writer.join()
+		self.assertEqual(data, b'x' * 10000)
+
+
+class HashTreeTest(unittest.TestCase):
+
+	def setUp(self):
+		self._dir = tempfile.TemporaryDirectory()
+		self.path = os.path.join(self._dir.name, 'f')
+		# Three segments and a half.
+		self._segment_size = File.TREE_SEGMENT_SIZE
+		File.TREE_SEGMENT_SIZE = 1024
+		self.data = bytes(range(256)) * 14
+		with open(self.path, 'wb') as f:
+			f.write(self.data)
+
+	def tearDown(self):
+		File.TREE_SEGMENT_SIZE = self._segment_size
+		self._dir.cleanup()
+
+	def segment_sums(self, data: bytes) -> list:
+		return [hashlib.sha256(data[offset:offset + 1024]).digest() for offset in range(0, len(data), 1024)]
+
+	def hashed(self, path: str, given: bytes = None, **kwargs) -> File:
+		given_segments = [segment.hex() for segment in self.segment_sums(given)] if given is not None else None
+		file = File(path, hashlib.sha256(b''.join(self.segment_sums(given))).hexdigest() if given is not None else '',
+			given_segments=given_segments)
+		file.update_tree_data('sha256-tree', **kwargs)
+		return file
+
+	def test_root_digest(self):
+		segments = self.segment_sums(self.data)
+		self.assertEqual(len(segments), 4)
+		for jobs, buffer_size in ((1, None), (4, None), (4, 100), (2, 1024)):
+			file = self.hashed(self.path, jobs=jobs, buffer_size=buffer_size)
+			self.assertEqual(file.get_hashsum('sha256-tree'), hashlib.sha256(b''.join(segments)).hexdigest())
+			self.assertEqual(file.get_segment_sums('sha256-tree'), [segment.hex() for segment in segments])
+
+		empty = os.path.join(self._dir.name, 'empty')
+		open(empty, 'wb').close()
+		file = self.hashed(empty, jobs=4)
+		self.assertEqual(file.get_hashsum('sha256-tree'), hashlib.sha256(b'').hexdigest())
+		self.assertEqual(file.get_segment_sums('sha256-tree'), [])
+
+	def test_pipe(self):
+		import threading
+		fifo = os.path.join(self._dir.name, 'fifo')
+		expected = self.hashed(self.path)
+		for buffer_size in (100, 1024, 3000):
+			os.mkfifo(fifo)
+
+			def write():
+				with open(fifo, 'wb') as f:
+					f.write(self.data)
+
+			writer = threading.Thread(target=write)
+			writer.start()
+			file = self.hashed(fifo, jobs=4, buffer_size=buffer_size)
+			writer.join()
+			os.unlink(fifo)
+			self.assertEqual(file.get_hashsum('sha256-tree'), expected.get_hashsum('sha256-tree'), buffer_size)
+			self.assertEqual(file.get_segment_sums('sha256-tree'), expected.get_segment_sums('sha256-tree'), buffer_size)
+
+	def test_corrupt_ranges(self):
+		file = self.hashed(self.path, self.data)
+		self.assertTrue(file.checksum('sha256-tree'))
+		self.assertEqual(file.get_corrupt_ranges('sha256-tree'), [])
+		self.assertIsNone(File(self.path).get_corrupt_ranges('sha256-tree'))
+
+		for modified, ranges in (
+			([10], [(0, 1023)]),
+			([1500, 3500], [(1024, 2047), (3072, 3583)]),
+			([1500, 2500], [(1024, 3071)]),
+			([0, 1024, 2048, 3072], [(0, 3583)]),
+		):
+			data = bytearray(self.data)
+			for offset in modified:
+				data[offset] ^= 0xff
+			with open(self.path, 'wb') as f:
+				f.write(data)
+			file = self.hashed(self.path, self.data)
+			self.assertFalse(file.checksum('sha256-tree'))
+			self.assertEqual(file.get_corrupt_ranges('sha256-tree'), ranges, modified)
+
+	def test_corrupt_ranges_of_resized_files(self):
+		for size, ranges in (
+			# Truncated, the bytes after its end until the end of the last original segment.
+			(1536, [(1024, 4095)]),
+			(2048, [(2048, 4095)]),
+			(0, [(0, 4095)]),
+			# Grown.
+			(4000, [(3072, 3999)]),
+			(5000, [(3072, 4999)]),
+		):
+			with open(self.path, 'wb') as f:
+				f.write((self.data * 2)[:size])
+			file = self.hashed(self.path, self.data)
+			self.assertEqual(file.get_corrupt_ranges('sha256-tree'), ranges, size)
+
+
+class RateLimiterTest(unittest.TestCase):
+
+	def test_rate(self):
+		import time
+		limiter = RateLimiter(100 * 1024)
+		start = time.monotonic()
+		for _ in range(5):
+			limiter.consume(10 * 1024)
+		# The first 10KiB are the burst, the other 40KiB take 0.4 seconds.
+		self.assertGreaterEqual(time.monotonic() - start, 0.35)
+		self.assertLess(time.monotonic() - start, 1.5)
+
+	def test_shared_by_threads(self):
+		import time
+		from concurrent.futures import ThreadPoolExecutor
+		limiter = RateLimiter(200 * 1024, burst=1024)
+		start = time.monotonic()
+		with ThreadPoolExecutor(max_workers=4) as executor:
+			list(executor.map(lambda _: [limiter.consume(5 * 1024) for _ in range(4)], range(4)))
+		# 80KiB at 200KiB per second, whatever the number of threads.
+		self.assertGreaterEqual(time.monotonic() - start, 0.35)
+		self.assertLess(time.monotonic() - start, 1.5)
+
+
+class DuplicatesTest(unittest.TestCase):
+
+	def setUp(self):
+		self._dir = tempfile.TemporaryDirectory()
+		size = 3 * Process.DUPES_PARTIAL_SIZE
+		self.paths = {}
+		for name, data in (('a', b'a' * size), ('b', b'a' * size), ('c', b'c' * size), ('d', b'a' * (size - 1) + b'd')):
+			self.paths[name] = os.path.join(self._dir.name, name)
+			with open(self.paths[name], 'wb') as f:
+				f.write(data)
+
+	def tearDown(self):
+		self._dir.cleanup()
+
+	def test_partial_sums_are_limited(self):
+		process = Process(max_rate=1024 * 1024 * 1024)
+		consumed = []
+		process._read_options['limiter'].consume = consumed.append
+		groups = process.find_duplicates([File(path) for path in self.paths.values()], 'sha256')
+		self.assertEqual([[file.get_fullpath() for file in group] for group in groups], [[self.paths['a'], self.paths['b']]])
+		# The starting bytes of the four files, then a, b and d entirely, whose starting bytes are the same.
+		self.assertEqual(consumed[:4], [Process.DUPES_PARTIAL_SIZE] * 4)
+		self.assertEqual(sum(consumed[4:]), 3 * 3 * Process.DUPES_PARTIAL_SIZE)
+
+
+class RecordTest(unittest.TestCase):
+
+	KEYS = ['path', 'algorithm', 'expected', 'actual', 'status', 'size', 'expected_size', 'seconds', 'bytes_per_s',
+		'cached', 'error']
+
+	def setUp(self):
+		self._dir = tempfile.TemporaryDirectory()
+		self.paths = {}
+		for name in ('ok', 'failed', 'resized', 'new\nline'):
+			self.paths[name] = os.path.join(self._dir.name, name)
+			with open(self.paths[name], 'wb') as f:
+				f.write(name.encode())
+		self.paths['missing'] = os.path.join(self._dir.name, 'missing')
+		self.paths['directory'] = os.path.join(self._dir.name, 'directory')
+		os.mkdir(self.paths['directory'])
+
+	def tearDown(self):
+		self._dir.cleanup()
+
+	def check(self, files: list, hashtype: str = 'sha256') -> list:
+		"""Checks the files with the jsonl output, returns the lines printed."""
+		output = io.StringIO()
+		with contextlib.redirect_stdout(output):
+			Process(2, output='jsonl').checkfiles(files, hashtype)
+		return output.getvalue().splitlines()
+
+	def test_records(self):
+		import json
+		digest = {name: hashlib.sha256(name.encode()).hexdigest() for name in self.paths}
+		lines = self.check([
+			File(self.paths['ok'], digest['ok'], given_size=2),
+			File(self.paths['failed'], digest['ok']),
+			File(self.paths['resized'], digest['resized'], given_size=1),
+			File(self.paths['new\nline'], digest['new\nline']),
+			File(self.paths['missing'], digest['missing']),
+			File(self.paths['directory'], digest['directory']),
+		])
+		# One object per line, also for the paths with new lines.
+		self.assertEqual(len(lines), 6)
+		records = {record['path']: record for record in map(json.loads, lines)}
+		for record in records.values():
+			self.assertEqual(list(record), RecordTest.KEYS)
+			self.assertEqual(record['algorithm'], 'sha256')
+
+		record = records[self.paths['ok']]
+		self.assertEqual((record['status'], record['expected'], record['actual']), ('ok', digest['ok'], digest['ok']))
+		self.assertEqual((record['size'], record['expected_size'], record['cached'], record['error']), (2, 2, False, None))
+		self.assertGreaterEqual(record['seconds'], 0)
+		self.assertTrue(record['bytes_per_s'] is None or record['bytes_per_s'] > 0)
+
+		record = records[self.paths['failed']]
+		self.assertEqual((record['status'], record['expected'], record['actual']), ('failed', digest['ok'], digest['failed']))
+		record = records[self.paths['new\nline']]
+		self.assertEqual((record['status'], record['actual']), ('ok', digest['new\nline']))
+		# Not read at all, as its size isn't the given one.
+		record = records[self.paths['resized']]
+		self.assertEqual((record['status'], record['actual'], record['size'], record['expected_size']), ('failed', None, 7, 1))
+		self.assertEqual((record['seconds'], record['bytes_per_s'], record['cached']), (0, None, False))
+
+		record = records[self.paths['missing']]
+		self.assertEqual((record['status'], record['actual'], record['size'], record['cached']), ('missing', None, None, False))
+		record = records[self.paths['directory']]
+		self.assertEqual((record['status'], record['actual'], record['cached']), ('unreadable', None, False))
+
+	def test_read_errors(self):
+		import json
+		file = File(self.paths['directory'])
+		with self.assertRaises(OSError) as raised:
+			list(Process().iter_hashed([file], ('sha256',)))
+		file.set_read_error(raised.exception)
+		self.assertEqual(json.loads(dump_record(file, 'sha256', 'unreadable'))['error'], raised.exception.strerror)
+		self.assertEqual(make_record(file, 'sha256', 'unreadable')['error'], raised.exception.strerror)
+
+	def test_hash_tree_records(self):
+		import json
+		file = File(self.paths['ok'], '00' * 32, given_segments=['00' * 32])
+		file.update_tree_data('sha256-tree')
+		self.assertEqual(make_record(file, 'sha256-tree', 'failed')['corrupt_ranges'], [[0, 1]])
+		self.assertEqual(json.loads(dump_record(file, 'sha256-tree', 'ok'))['corrupt_ranges'], None)
+		self.assertEqual(list(make_record(file, 'sha256-tree', 'failed')), RecordTest.KEYS + ['corrupt_ranges'])
+
+
+class RunStatsTest(unittest.TestCase):
+
+	# The jobs and executors hashing the files.
+	POOLS = [(1, 'thread'), (3, 'thread'), (3, 'process'), (3, 'async')]
+
+	def setUp(self):
+		self._dir = tempfile.TemporaryDirectory()
+		self.paths = []
+		for name, size in (('a', 1000), ('b', 0), ('c', 200 * 1024)):
+			path = os.path.join(self._dir.name, name)
+			with open(path, 'wb') as f:
+				f.write(b'x' * size)
+			self.paths.append(path)
+		self.size = 1000 + 200 * 1024
+		# It can't be read, so it isn't counted.
+		self.directory = os.path.join(self._dir.name, 'directory')
+		os.mkdir(self.directory)
+
+	def tearDown(self):
+		self._dir.cleanup()
+
+	def test_counters(self):
+		for jobs, executor in RunStatsTest.POOLS:
+			stats = RunStats()
+			results = list(hash_many(self.paths[:2] + [self.directory] + self.paths[2:], 'md5,sha256', jobs=jobs,
+				executor=executor, stats=stats))
+			self.assertEqual([result.status for result in results], ['hashed'] * 4 + ['unreadable'] * 2 + ['hashed'] * 2)
+			self.assertEqual(stats.files_hashed, 3, executor)
+			# Each file is read once, for both hashtypes.
+			self.assertEqual(stats.bytes_read, self.size, (jobs, executor))
+			self.assertEqual(stats.digest_bytes, {'md5': self.size, 'sha256': self.size}, (jobs, executor))
+			self.assertEqual(set(stats.digest_times), {'md5', 'sha256'})
+			self.assertTrue(all(seconds >= 0 for seconds in stats.times.values()))
+			self.assertGreater(stats.times['read'] + stats.times['digest'], 0)
+
+	def test_report(self):
+		stats = RunStats()
+		process = Process(output='porcelain', stats=stats)
+		with contextlib.redirect_stdout(io.StringIO()):
+			process.calculate_hash_sum([File(path) for path in self.paths + [self.directory]], 'sha256')
+		self.assertEqual(stats.files_hashed, 3)
+		self.assertEqual(stats.bytes_read, self.size)
+		self.assertEqual(stats.digest_bytes, {'sha256': self.size})
+		self.assertGreater(stats.times['probe'], 0)
+		self.assertGreater(stats.times['output'], 0)
+
+		stderr = io.StringIO()
+		with contextlib.redirect_stderr(stderr):
+			process.print_stats()
+		lines = stderr.getvalue().splitlines()
+		self.assertEqual([line.split(':')[0].strip() for line in lines],
+			['stats', 'files hashed', 'bytes hashed', 'probe', 'cache', 'read', 'digest', 'sha256', 'output'])
+		self.assertTrue(lines[1].strip().startswith('files hashed: 3 ('), lines[1])
+		self.assertTrue(lines[2].strip().startswith('bytes hashed: 201.0 KiB ('), lines[2])
+
+	def test_merged(self):
+		stats, other = RunStats(), RunStats()
+		stats.add_read(0.5, 100)
+		other.add_read(0.25, 50)
+		other.add_digest('md5', 0.125, 50)
+		other.add_file()
+		stats.merge(other.to_dict())
+		self.assertEqual((stats.bytes_read, stats.files_hashed, stats.times['read']), (150, 1, 0.75))
+		self.assertEqual((stats.digest_bytes, stats.digest_times), ({'md5': 50}, {'md5': 0.125}))
+
+
+class DigestCacheTest(unittest.TestCase):
+
+	def setUp(self):
+		self._dir = tempfile.TemporaryDirectory()
+		self.path = os.path.join(self._dir.name, 'f')
+		# The files of the tests are just written, and small, they must be cached anyway.
+		self._racy_window_ns = DigestCache.RACY_WINDOW_NS
+		self._min_size = DigestCache.MIN_SIZE
+		DigestCache.RACY_WINDOW_NS = 0
+		DigestCache.MIN_SIZE = 0
+
+	def tearDown(self):
+		DigestCache.RACY_WINDOW_NS = self._racy_window_ns
+		DigestCache.MIN_SIZE = self._min_size
+		self._dir.cleanup()
+
+	def test_rewritten_with_the_same_mtime(self):
+		cache = DigestCache(os.path.join(self._dir.name, 'digests.sqlite'))
+		with open(self.path, 'wb') as f:
+			f.write(b'original')
+		mtime_ns = os.stat(self.path).st_mtime_ns
+		entries = [(self.path, hashlib.sha256(b'original').hexdigest())]
+		self.assertEqual([result.status for result in verify_many(entries, 'sha256', cache=cache)], ['ok'])
+
+		# Tampered with data of the same size, and its modification time set back (as ``touch -d`` does).
+		with open(self.path, 'r+b') as f:
+			f.write(b'tampered')
+		os.utime(self.path, ns=(mtime_ns, mtime_ns))
+		results = list(verify_many(entries, 'sha256', cache=cache))
+		self.assertEqual([(result.status, result.cached) for result in results], [('failed', False)])
+		cache.close()
+
+	def test_shared_by_threads(self):
+		from concurrent.futures import ThreadPoolExecutor
+		cache = DigestCache(os.path.join(self._dir.name, 'digests.sqlite'))
+		with open(self.path, 'wb') as f:
+			f.write(b'shared')
+		entries = [(self.path, hashlib.sha256(b'shared').hexdigest())]
+		# Opened by this thread, then used by the others.
+		self.assertEqual([result.cached for result in verify_many(entries, 'sha256', cache=cache)], [False])
+		with ThreadPoolExecutor(max_workers=4) as executor:
+			results = list(executor.map(lambda _: list(verify_many(entries, 'sha256', cache=cache)), range(8)))
+		self.assertEqual([(result.status, result.cached) for result, in results], [('ok', True)] * 8)
+		cache.close()
+
+	def test_shared_by_runs_at_once(self):
+		import time
+		filename = os.path.join(self._dir.name, 'digests.sqlite')
+		first, second = DigestCache(filename), DigestCache(filename)
+		keys = []
+		for name in ('f', 'g'):
+			with open(os.path.join(self._dir.name, name), 'wb') as f:
+				f.write(name.encode())
+			keys.append(first.get_key(os.path.join(self._dir.name, name)))
+		first.put(keys[0], 'sha256', '00ff')
+		self.assertEqual(first.get(keys[0], 'sha256'), '00ff')
+
+		# The first run is still running, the second one doesn't wait for it.
+		start = time.monotonic()
+		second.put(keys[1], 'sha256', 'ee11')
+		self.assertLess(time.monotonic() - start, 0.5)
+		self.assertEqual(second.get(keys[0], 'sha256'), '00ff')
+		first.close()
+		second.close()
+		cache = DigestCache(filename)
+		self.assertEqual([cache.get(key, 'sha256') for key in keys], ['00ff', 'ee11'])
+		cache.close()
+
+
+class UpdateManifestTest(unittest.TestCase):
+
+	def setUp(self):
+		self._dir = tempfile.TemporaryDirectory()
+		self.root = self._dir.name
+		self.manifest = os.path.join(self.root, 'sha256sum.txt')
+		self._cwd = os.getcwd()
+		for name in ('a', 'b'):
+			with open(os.path.join(self.root, name), 'wb') as f:
+				f.write(name.encode())
+		with open(self.manifest, 'wt') as f:
+			for name in ('a', 'b'):
+				f.write(f'{hashlib.sha256(name.encode()).hexdigest()}  {name}\n')
+
+		self._racy_window_ns = DigestCache.RACY_WINDOW_NS
+		self._min_size = DigestCache.MIN_SIZE
+		DigestCache.RACY_WINDOW_NS = 0
+		DigestCache.MIN_SIZE = 0
+
+	def tearDown(self):
+		DigestCache.RACY_WINDOW_NS = self._racy_window_ns
+		DigestCache.MIN_SIZE = self._min_size
+		os.chdir(self._cwd)
+		self._dir.cleanup()
+
+	def update(self, files=(), cache=None, **kwargs) -> list:
+		"""Updates the manifest, returns the paths of the hashed files."""
+		output = io.StringIO()
+		with contextlib.redirect_stdout(output):
+			Process(output='porcelain', cache=cache).update(self.manifest, [File(path) for path in files], 'sha256', **kwargs)
+		return [line.split(None, 1)[1] for line in output.getvalue().splitlines()]
+
+	def read_manifest(self):
+		with open(self.manifest, 'rt') as f:
+			return f.read().splitlines()
+
+	def test_paths_relative_to_the_manifest(self):
+		for name in ('c', 'd'):
+			with open(os.path.join(self.root, name), 'wb') as f:
+				f.write(name.encode())
+		# Updated from another directory, the listed files are found, and the new ones are written
+		# relative to the manifest, but the ones given by their absolute path.
+		os.chdir(os.path.dirname(self.root))
+		self.update([os.path.join(os.path.basename(self.root), 'c'), os.path.join(self.root, 'd')])
+		self.assertEqual([line.split()[1] for line in self.read_manifest()], ['a', 'b', 'c', os.path.join(self.root, 'd')])
+		self.assertEqual(self.read_manifest()[0], f"{hashlib.sha256(b'a').hexdigest()}  a")
+
+	def test_missing_entries_are_kept(self):
+		os.unlink(os.path.join(self.root, 'b'))
+		before = self.read_manifest()
+		self.update()
+		self.assertEqual([line.split() for line in self.read_manifest()], [line.split() for line in before])
+
+		self.update(prune=True)
+		self.assertEqual([line.split()[1] for line in self.read_manifest()], ['a'])
+
+		# But the given files must exist.
+		with self.assertRaises(SystemExit) as raised:
+			self.update([os.path.join(self.root, 'c')])
+		self.assertEqual(raised.exception.code, 1)
+		self.assertEqual([line.split()[1] for line in self.read_manifest()], ['a'])
+
+	def test_unchanged_by_their_stat(self):
+		# Without the cache, and small files, which it never has.
+		DigestCache.MIN_SIZE = self._min_size
+		path = os.path.join(self.root, 'a')
+		self.assertEqual(self.update(), [path, os.path.join(self.root, 'b')])
+		self.assertEqual(self.update(), [])
+
+		with open(path, 'ab') as f:
+			f.write(b'a')
+		self.assertEqual(self.update(), [path])
+		self.assertEqual(self.read_manifest()[0], f"{hashlib.sha256(b'aa').hexdigest()}  a")
+		self.assertEqual(self.update(), [])
+
+	def test_written_manifests_have_the_stat(self):
+		os.chdir(self.root)
+		with contextlib.redirect_stdout(io.StringIO()):
+			process = Process(output='porcelain')
+			files = list(process.calculate_hash_sum([File('a'), File('b')], 'sha256'))
+			process.write(files, 'sha256', self.manifest)
+		self.assertEqual(self.update(), [])
+
+	def test_only_the_changed_files_are_hashed(self):
+		cache = DigestCache(os.path.join(self.root, 'digests.sqlite'))
+		path = os.path.join(self.root, 'a')
+		self.assertEqual(self.update(cache=cache), [path, os.path.join(self.root, 'b')])
+		self.assertEqual(self.update(cache=cache), [])
+
+		# Modified keeping its size and modification time, and the manifest copied over
+		# itself, which is then newer than the modification.
+		mtime_ns = os.stat(path).st_mtime_ns
+		with open(path, 'wb') as f:
+			f.write(b'A')
+		os.utime(path, ns=(mtime_ns, mtime_ns))
+		with open(self.manifest, 'rt') as f:
+			lines = f.read()
+		with open(self.manifest + '.copy', 'wt') as f:
+			f.write(lines)
+		os.replace(self.manifest + '.copy', self.manifest)
+
+		self.assertEqual(self.update(cache=cache), [path])
+		self.assertEqual(self.read_manifest()[0], f"{hashlib.sha256(b'A').hexdigest()}  a")
+		cache.close()
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+""" Tests of the binary manifests of shazam, run with: python3 -m unittest discover tests"""
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import hashlib
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'usr', 'lib', 'shazam'))
+
+from common import TextFile, InputError
+from manifest import BinaryManifest, convert, is_binary_manifest, open_manifest
+
+
+def digest(name: str) -> str:
+	return hashlib.sha256(name.encode()).hexdigest()
+
+
+class BinaryManifestTest(unittest.TestCase):
+
+	# Each kind of line read by shazam, the last one without a newline.
+	LINES = [
+		f"{digest('a.txt')}  a.txt\n",
+		f"{digest('b.bin')} *dir/b.bin\n",
+		f"{digest('c d.txt').upper()}  dir/c d.txt\n",
+		f"{digest('e')} e\n",
+		f"SHA256 (dir/f) = {digest('f')}\n",
+		f"SHA256 (dir/sub/g) = {digest('g')} 42\n",
+		f"{digest('h')} 7 dir/sub/h",
+	]
+
+	def setUp(self):
+		self._dir = tempfile.TemporaryDirectory()
+		self.text = os.path.join(self._dir.name, 'sha256sum.txt')
+		self.binary = os.path.join(self._dir.name, 'sha256sum.bin')
+		with open(self.text, 'wt') as f:
+			f.writelines(BinaryManifestTest.LINES)
+		convert(self.text, self.binary)
+
+	def tearDown(self):
+		self._dir.cleanup()
+
+	def test_converted_back_into_the_same_text(self):
+		self.assertTrue(is_binary_manifest(self.binary))
+		self.assertFalse(is_binary_manifest(self.text))
+		converted = os.path.join(self._dir.name, 'converted.txt')
+		self.assertEqual(convert(self.binary, converted), len(BinaryManifestTest.LINES))
+		with open(self.text, 'rb') as original, open(converted, 'rb') as f:
+			self.assertEqual(f.read(), original.read())
+
+	def test_same_entries_as_the_text(self):
+		with open_manifest(self.binary) as manifest:
+			self.assertIsInstance(manifest, BinaryManifest)
+			self.assertEqual(manifest.get_hashtype(), 'sha256')
+			self.assertEqual(list(manifest.iter_entries()), list(TextFile(self.text).iter_entries()))
+			self.assertEqual(manifest.lookup('dir/sub/g'), ('dir/sub/g', digest('g'), 42, 'sha256'))
+			self.assertEqual(manifest.lookup('dir/c d.txt'), ('dir/c d.txt', digest('c d.txt').upper(), None, None))
+			self.assertEqual(manifest.lookup('dir/sub/h'), ('dir/sub/h', digest('h'), 7, None))
+
+	def test_lookup(self):
+		text = TextFile(self.text)
+		with BinaryManifest(self.binary) as manifest:
+			for name, hashtype in (('a.txt', None), ('*dir/b.bin', None), ('dir/f', 'sha256'), ('dir/f', 'md5'),
+				('dir', None), ('dir/sub/i', None), ('', None)):
+				self.assertEqual(manifest.lookup(name, hashtype), text.lookup(name, hashtype), (name, hashtype))
+			self.assertIsNone(manifest.lookup('dir/f', 'md5'))
+			self.assertIsNone(manifest.lookup('dir'))
+
+	def test_iter_matching(self):
+		text = TextFile(self.text)
+		with BinaryManifest(self.binary) as manifest:
+			for patterns, names in (
+				(['dir/sub/*'], ['dir/sub/g', 'dir/sub/h']),
+				(['*.txt'], ['a.txt', 'dir/c d.txt']),
+				(['dir/sub/*', 'a*'], ['a.txt', 'dir/sub/g', 'dir/sub/h']),
+				(['dir/[cf]*', 'dir/?'], ['dir/c d.txt', 'dir/f']),
+				(['e'], ['e']),
+				(['missing/*'], []),
+			):
+				entries = list(manifest.iter_matching(patterns))
+				self.assertEqual([entry[0] for entry in entries], names, patterns)
+				self.assertEqual(entries, list(text.iter_matching(patterns)), patterns)
+
+	def test_lines_changed_by_the_conversion(self):
+		with open(self.text, 'at') as f:
+			f.write(f"\n{digest('i')}  i \n")
+		with self.assertRaises(InputError):
+			convert(self.text, os.path.join(self._dir.name, 'other.bin'))
+
+	def test_mixed_case_hash_sums(self):
+		mixed = digest('i')[:5] + digest('i')[5:].upper()
+		with open(self.text, 'at') as f:
+			f.write(f"\n{mixed}  i\n")
+		with self.assertRaises(InputError):
+			convert(self.text, os.path.join(self._dir.name, 'other.bin'))
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+""" Tests of the daemon of shazam, run with: python3 -m unittest discover tests"""
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import json
+import socket
+import hashlib
+import argparse
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'usr', 'lib', 'shazam'))
+
+from cache import DigestCache
+from common import ShazamError
+from server import Client, Daemon
+from cli import DAEMON_READING_DEFAULTS, connect_daemon
+
+
+class DaemonTest(unittest.TestCase):
+
+	def setUp(self):
+		self._dir = tempfile.TemporaryDirectory()
+		self.socket = os.path.join(self._dir.name, 'shazam.sock')
+
+	def tearDown(self):
+		self._dir.cleanup()
+
+	def test_files_are_not_memory_mapped(self):
+		# A memory-mapped file truncated while it is hashed would kill the daemon.
+		for io_mode, expected in (('auto', 'read'), ('read', 'read'), ('mmap', 'mmap')):
+			daemon = Daemon(self.socket, jobs=1, io_mode=io_mode)
+			self.assertEqual(daemon._process._read_options['io_mode'], expected)
+			daemon._process.close()
+
+
+class ProtocolTest(unittest.TestCase):
+
+	def setUp(self):
+		self._dir = tempfile.TemporaryDirectory()
+		self.socket = os.path.join(self._dir.name, 'shazam.sock')
+		self.paths = []
+		for name in ('a', 'b'):
+			self.paths.append(os.path.join(self._dir.name, name))
+			with open(self.paths[-1], 'wb') as f:
+				f.write(name.encode())
+		self.missing = os.path.join(self._dir.name, 'missing')
+		# The files of the tests are just written, and small, they must be cached anyway.
+		self._racy_window_ns = DigestCache.RACY_WINDOW_NS
+		self._min_size = DigestCache.MIN_SIZE
+		DigestCache.RACY_WINDOW_NS = 0
+		DigestCache.MIN_SIZE = 0
+
+		# Served by a thread, as the daemon's `serve_forever` handles the signals of the main one.
+		self.daemon = Daemon(self.socket, jobs=2)
+		self.daemon.listen()
+		self._thread = threading.Thread(target=self.daemon._server.serve_forever)
+		self._thread.start()
+		self.client = Client(self.socket)
+
+	def tearDown(self):
+		self.client.close()
+		self.daemon._server.shutdown()
+		self.daemon._server.server_close()
+		self._thread.join()
+		self.daemon._process.close()
+		DigestCache.RACY_WINDOW_NS = self._racy_window_ns
+		DigestCache.MIN_SIZE = self._min_size
+		self._dir.cleanup()
+
+	def test_socket_of_the_user_only(self):
+		self.assertEqual(os.stat(self.socket).st_mode & 0o077, 0)
+		with self.assertRaises(ShazamError):
+			Daemon(self.socket).listen()
+
+	def test_ping(self):
+		response = self.client.ping()
+		self.assertEqual((response['done'], response['pid']), (True, os.getpid()))
+		self.assertEqual(response['cache'], {'entries': 0, 'hits': 0, 'misses': 0})
+
+	def test_hash(self):
+		records = list(self.client.hash(self.paths + [self.missing], ['md5', 'sha256']))
+		self.assertEqual([(record['path'], record['algorithm'], record['status']) for record in records], [
+			(self.paths[0], 'md5', 'hashed'), (self.paths[0], 'sha256', 'hashed'),
+			(self.paths[1], 'md5', 'hashed'), (self.paths[1], 'sha256', 'hashed'),
+			(self.missing, 'md5', 'missing'), (self.missing, 'sha256', 'missing')])
+		self.assertEqual(records[3]['actual'], hashlib.sha256(b'b').hexdigest())
+		self.assertEqual(records[0]['actual'], hashlib.md5(b'a').hexdigest())
+
+	def test_verify(self):
+		entries = [(self.paths[0], hashlib.sha256(b'a').hexdigest()), (self.paths[1], hashlib.sha256(b'a').hexdigest(), 1)]
+		records = list(self.client.verify(entries, 'sha256'))
+		self.assertEqual([record['status'] for record in records], ['ok', 'failed'])
+
+	def test_cache_hits(self):
+		first = list(self.client.hash(self.paths, ['sha256']))
+		self.assertEqual([record['cached'] for record in first], [False, False])
+		second = list(self.client.hash(self.paths, ['sha256']))
+		self.assertEqual([record['cached'] for record in second], [True, True])
+		self.assertEqual([record['actual'] for record in second], [record['actual'] for record in first])
+		self.assertEqual(self.client.ping()['cache'], {'entries': 2, 'hits': 2, 'misses': 2})
+
+		# Changed, so it is hashed again.
+		with open(self.paths[0], 'ab') as f:
+			f.write(b'a')
+		third = list(self.client.hash(self.paths, ['sha256']))
+		self.assertEqual([(record['cached'], record['actual']) for record in third],
+			[(False, hashlib.sha256(b'aa').hexdigest()), (True, first[1]['actual'])])
+
+	def test_malformed_requests(self):
+		for request in ({'op': 'unknown'}, {'op': 'hash'}, {'op': 'hash', 'paths': self.paths, 'algos': ['sha257']},
+			{'op': 'verify', 'algo': 'sha256', 'entries': [[self.paths[0], 'not hexadecimal']]}):
+			with self.assertRaises(ShazamError, msg=request):
+				list(self.client.request(request))
+		# The connection is still served.
+		self.assertTrue(self.client.ping()['done'])
+
+		with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+			connection.connect(self.socket)
+			reader = connection.makefile('rb')
+			for line in (b'not json\n', b'[1, 2]\n', b'"ping"\n', b'{"op": "ping"}\n'):
+				connection.sendall(line)
+				response = json.loads(reader.readline())
+				self.assertTrue(response['done'], line)
+				self.assertEqual('error' in response, line != b'{"op": "ping"}\n', line)
+			reader.close()
+
+	def test_client_stopping_early(self):
+		records = self.client.hash(self.paths, ['sha256'])
+		self.assertEqual(next(records)['path'], self.paths[0])
+		records.close()
+		# The connection of the unfinished response is closed, a new one is opened.
+		self.assertTrue(self.client.ping()['done'])
+
+
+class ClientFallbackTest(unittest.TestCase):
+
+	def setUp(self):
+		self._dir = tempfile.TemporaryDirectory()
+		self.socket = os.path.join(self._dir.name, 'shazam.sock')
+
+	def tearDown(self):
+		self._dir.cleanup()
+
+	def get_args(self, **kwargs) -> argparse.Namespace:
+		options = dict(DAEMON_READING_DEFAULTS, subparser='check', no_daemon=False, no_cache=False, refresh=False,
+			socket=self.socket)
+		options.update(kwargs)
+		return argparse.Namespace(**options)
+
+	def test_no_daemon(self):
+		with self.assertRaises(OSError):
+			Client(self.socket)
+		self.assertIsNone(connect_daemon(self.get_args()))
+
+	def test_socket_left_by_a_stopped_daemon(self):
+		left = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		left.bind(self.socket)
+		left.close()
+		self.assertTrue(os.path.exists(self.socket))
+		self.assertIsNone(connect_daemon(self.get_args()))
+
+		# Replaced by the next daemon.
+		daemon = Daemon(self.socket, jobs=1)
+		daemon.listen()
+		thread = threading.Thread(target=daemon._server.serve_forever)
+		thread.start()
+		try:
+			client = connect_daemon(self.get_args())
+			self.assertIsInstance(client, Client)
+			client.close()
+			# Not used when the files are read in another way, or without the cache.
+			for options in ({'jobs': 4}, {'io': 'mmap'}, {'no_daemon': True}, {'no_cache': True}, {'refresh': True},
+				{'subparser': 'serve'}):
+				self.assertIsNone(connect_daemon(self.get_args(**options)), options)
+		finally:
+			daemon._server.shutdown()
+			daemon._server.server_close()
+			thread.join()
+			daemon._process.close()
+
+
+if __name__ == '__main__':
+	unittest.main()
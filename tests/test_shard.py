@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+""" Tests of the shards of shazam, run with: python3 -m unittest discover tests"""
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import io
+import json
+import tempfile
+import unittest
+import contextlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'usr', 'lib', 'shazam'))
+
+from common import InputError
+from shard import ResultsWriter, iter_shard, merge, parse_shard
+
+
+class ShardTest(unittest.TestCase):
+
+	def assertPartition(self, entries: list, shards: int, by: str) -> list:
+		"""Asserts that the shards have each entry once, and returns them."""
+		parts = [list(iter_shard(iter(entries), shard, shards, by=by)) for shard in range(1, shards + 1)]
+		self.assertEqual(sorted(entry for part in parts for entry in part), sorted(entries))
+		for part in parts:
+			self.assertEqual(part, [entry for entry in entries if entry in part])
+		return parts
+
+	def test_parse_shard(self):
+		self.assertEqual(parse_shard('2/8'), (2, 8))
+		self.assertEqual(parse_shard('1/1'), (1, 1))
+		for value in ('0/2', '3/2', '1/0', '-1/2', 'a/2', '2', '1/2/3', ''):
+			self.assertIsNone(parse_shard(value), value)
+
+	def test_by_path(self):
+		entries = [(f'dir/{n}.bin', '00', None, None) for n in range(200)]
+		parts = self.assertPartition(entries, 4, 'path')
+		self.assertTrue(all(parts), 'some shard is empty')
+		# The shard of a path doesn't depend on the other entries.
+		self.assertEqual(list(iter_shard(entries[:10], 1, 4)), [entry for entry in parts[0] if entry in entries[:10]])
+
+	def test_by_size(self):
+		entries = [(name, '00', size, None) for name, size in (('a', 10), ('b', 10), ('c', 10), ('d', 70))]
+		self.assertEqual(self.assertPartition(entries, 2, 'size'), [entries[:3], entries[3:]])
+		self.assertPartition(entries, 8, 'size')
+		# All empty, the entries are split by their number.
+		empty = [(name, '00', 0, None) for name in 'abcd']
+		self.assertEqual(self.assertPartition(empty, 2, 'size'), [empty[:2], empty[2:]])
+
+	def test_by_size_without_sizes(self):
+		entries = [('a', '00', 10, None), ('b', '00', None, None)]
+		with self.assertRaises(InputError):
+			list(iter_shard(entries, 1, 2, by='size'))
+		with self.assertRaises(InputError):
+			list(iter_shard(entries, 1, 2, by='name'))
+
+
+class MergeTest(unittest.TestCase):
+
+	def setUp(self):
+		self._dir = tempfile.TemporaryDirectory()
+
+	def tearDown(self):
+		self._dir.cleanup()
+
+	def write_results(self, shard: int, statuses: list, shards: int = 2, stop: type = None) -> str:
+		"""Writes the partial results file of the shard, as `read --shard --results` does, interrupted by `stop`."""
+		filename = os.path.join(self._dir.name, f'part{shard}.jsonl')
+		try:
+			with ResultsWriter(filename, {'shard': shard, 'shards': shards, 'by': 'path', 'manifest': 'sha256sum.txt'}) as results:
+				results.write(''.join(json.dumps({'path': f'{shard}-{n}', 'status': status}) + '\n'
+					for n, status in enumerate(statuses)))
+				if stop is not None:
+					raise stop()
+		except (KeyboardInterrupt, SystemExit):
+			pass
+		return filename
+
+	def merge(self, filenames: list, output: str = 'human') -> tuple:
+		"""Returns the result of merging the files and what was printed."""
+		stdout = io.StringIO()
+		with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(io.StringIO()):
+			ok = merge(filenames, output)
+		return ok, stdout.getvalue()
+
+	def test_all_ok(self):
+		ok, printed = self.merge([self.write_results(2, ['ok']), self.write_results(1, ['ok', 'ok'])], 'porcelain')
+		self.assertTrue(ok)
+		self.assertEqual(printed, '1-0: OK\n1-1: OK\n2-0: OK\n')
+
+	def test_not_ok(self):
+		for status in ('failed', 'missing', 'unreadable'):
+			ok, printed = self.merge([self.write_results(1, ['ok']), self.write_results(2, ['ok', status])])
+			self.assertFalse(ok, status)
+			self.assertIn('2-1', printed)
+
+	def test_workers_not_finished(self):
+		for stop in (KeyboardInterrupt, SystemExit):
+			ok, _ = self.merge([self.write_results(1, ['ok']), self.write_results(2, ['ok'], stop=stop)])
+			self.assertFalse(ok, stop)
+
+	def test_jsonl_of_workers_not_finished(self):
+		ok, printed = self.merge([self.write_results(1, ['ok']), self.write_results(2, ['ok'], stop=KeyboardInterrupt)],
+			'jsonl')
+		self.assertFalse(ok)
+		self.assertEqual([json.loads(line)['path'] for line in printed.splitlines()], ['1-0', '2-0'])
+
+	def test_shards_not_given(self):
+		with self.assertRaises(InputError):
+			self.merge([self.write_results(1, ['ok'], shards=3), self.write_results(2, ['ok'], shards=3)])
+		with self.assertRaises(InputError):
+			self.merge([self.write_results(1, ['ok'], shards=2), self.write_results(2, ['ok'], shards=3)])
+
+
+if __name__ == '__main__':
+	unittest.main()
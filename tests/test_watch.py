@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+""" Tests of the watch mode of shazam, run with: python3 -m unittest discover tests"""
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import time
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'usr', 'lib', 'shazam'))
+
+import watch
+from common import File
+
+
+class RecordingProcess(object):
+	"""Stands for a `common.Process`, recording the paths of the checked files."""
+
+	def __init__(self):
+		self.checked = []
+
+	def get_output(self) -> str:
+		return 'porcelain'
+
+	def checkfiles(self, files, hashtype, **kwargs) -> None:
+		self.checked.append([file.get_fullpath() for file in files])
+
+
+class WatchTest(unittest.TestCase):
+
+	def setUp(self):
+		self._dir = tempfile.TemporaryDirectory()
+		self.path = os.path.join(self._dir.name, 'f')
+		with open(self.path, 'wb') as f:
+			f.write(b'original')
+		self._stat_watcher = watch.StatWatcher
+
+	def tearDown(self):
+		watch.StatWatcher = self._stat_watcher
+		self._dir.cleanup()
+
+	def test_rewritten_with_the_same_mtime(self):
+		path = self.path
+
+		class RewritingWatcher(watch.StatWatcher):
+			"""Polls the files once, after rewriting the file with the same size and
+			modification time (as ``touch -d`` does), then stops the watch."""
+
+			calls = 0
+
+			def wait(self, timeout: float):
+				RewritingWatcher.calls += 1
+				if RewritingWatcher.calls > 2:
+					raise KeyboardInterrupt()
+				if RewritingWatcher.calls == 1:
+					mtime_ns = os.stat(path).st_mtime_ns
+					# So the status change time (of a coarse clock) is surely another one.
+					time.sleep(0.05)
+					with open(path, 'r+b') as f:
+						f.write(b'tampered')
+					os.utime(path, ns=(mtime_ns, mtime_ns))
+				return super().wait(0)
+
+		watch.StatWatcher = RewritingWatcher
+		process = RecordingProcess()
+		watch.watch(process, [File(path, '00' * 32)], 'sha256', interval=0, debounce=0)
+		self.assertEqual(process.checked, [[path], [path]])
+
+
+if __name__ == '__main__':
+	unittest.main()
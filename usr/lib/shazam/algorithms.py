@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+""" Algorithms is a support module, which keeps the registry of the hash
+algorithms supported by this programm: the ones of hashlib and, when they are
+installed, the accelerated ones of the blake3 and xxhash packages."""
+# -*- coding: utf-8 -*-
+
+__author__ = "Anaxímeno Brito"
+__version__ = "0.4.7.1-beta"
+__license__ = "GNU General Public License v3.0"
+__copyright__ = "Copyright (c) 2020-2021 by " + __author__
+
+import hashlib as hlib
+from functools import partial
+
+# The optional packages and their algorithms, by name, used when they are installed.
+OPTIONAL_ALGORITHMS = {
+	'blake3': ['blake3'],
+	'xxhash': ['xxh32', 'xxh64', 'xxh3_64', 'xxh3_128'],
+}
+
+# Built by the first `get_algorithms` call, so nothing is imported while it isn't needed.
+_algorithms = None
+
+
+def get_algorithms() -> dict:
+	"""Returns the constructors of the hashers of all supported algorithms, by name. Each hasher has
+	the `update`, `digest` and `hexdigest` methods of the hashlib ones. The algorithms whose digests
+	don't have a fixed length (e.g. 'shake_128') aren't supported."""
+	global _algorithms
+	if _algorithms is None:
+		algorithms = {}
+		for name in sorted(hlib.algorithms_available):
+			name = name.lower()
+			if name.startswith('shake_') or name in algorithms:
+				continue
+			try:
+				hlib.new(name)
+			except ValueError:
+				# Listed by OpenSSL, but not usable (e.g. disabled by its security policy).
+				continue
+			algorithms[name] = partial(hlib.new, name)
+		for package, names in OPTIONAL_ALGORITHMS.items():
+			try:
+				module = __import__(package)
+			except ImportError:
+				continue
+			for name in names:
+				if hasattr(module, name):
+					algorithms[name] = getattr(module, name)
+		_algorithms = algorithms
+	return _algorithms
+
+
+def is_supported(name: str) -> bool:
+	return name in get_algorithms()
+
+
+def new_hasher(name: str, data: bytes = b''):
+	"""Returns a new hasher of the algorithm, updated with the data, if it is given.
+
+	Raises `ValueError` when the algorithm isn't supported."""
+	try:
+		hasher = get_algorithms()[name]()
+	except KeyError:
+		raise ValueError(f'unsupported hash type {name!r}') from None
+	if data:
+		hasher.update(data)
+	return hasher
+
+
+def get_name_from_tag(tag: str):
+	"""Returns the name of the algorithm of a tag, as written in the tagged lines of the manifests
+	(e.g.: 'SHA256', 'BLAKE2b' or 'SHA3-256'), or None if it isn't supported. Any suffix of the
+	hash tree types (e.g.: 'SHA256-TREE') is kept."""
+	name = tag.lower()
+	suffix = ''
+	if name.endswith('-tree'):
+		name, suffix = name[:-len('-tree')], '-tree'
+	for candidate in (name, name.replace('-', '_'), name.replace('-', '')):
+		if is_supported(candidate):
+			return candidate + suffix
+	return None
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+""" Api is the module for using shazam as a library, inside another Python program,
+e.g. a long running service which verifies batches of files without starting a new
+shazam process for each one. Nothing is printed and the program never exits: the
+results are generated as `Result` objects, as soon as they are known, and the
+errors are raised, or given in the results of the files which couldn't be read.
+
+Usage:
+	from api import verify_many, hash_many
+
+	for result in verify_many([('image.iso', 'e3b0c442...')], 'sha256', jobs=4):
+		if not result.ok:
+			print(result.path, result.status, result.error)
+"""
+# -*- coding: utf-8 -*-
+
+__author__ = "Anaxímeno Brito"
+__version__ = "0.4.7.1-beta"
+__license__ = "GNU General Public License v3.0"
+__copyright__ = "Copyright (c) 2020-2021 by " + __author__
+
+import os
+from collections import deque, namedtuple
+from collections.abc import Generator, Iterable
+from common import File, Process, InputError, make_record
+from common import is_supported_hashtype, load_manifest_segments
+from manifest import open_manifest
+
+# What is done with the files which weren't found or couldn't be read: 'collect' gives them as results,
+# with the 'missing' or 'unreadable' status, 'raise' raises their `OSError` (e.g. `FileNotFoundError`).
+ON_ERROR = ['collect', 'raise']
+
+
+class Result(namedtuple('Result', ['path', 'algorithm', 'expected', 'actual', 'status', 'size', 'expected_size',
+	'seconds', 'bytes_per_s', 'cached', 'error', 'corrupt_ranges'], defaults=(None,))):
+	"""Result of one file and hash type, its fields are the keys of the records of the jsonl output (see
+	`common.make_record`): the path, algorithm, expected and actual hexadecimal hash sums (None when unknown),
+	status ('ok' or 'failed' when verified, 'hashed', 'missing' or 'unreadable'), size and expected_size
+	(in bytes, None when unknown, the file isn't read when they differ), seconds spent reading and hashing
+	it (0 when cached), bytes_per_s (None when not read), cached, the error which didn't let it be read and
+	the ``[first, last]`` bytes of its modified segments, `corrupt_ranges`, only known for the hash tree types."""
+
+	__slots__ = ()
+
+	@property
+	def ok(self) -> bool:
+		"""Returns if the file was hashed and, when verified, if it has the expected hash sum."""
+		return self.status in ('ok', 'hashed')
+
+
+def _get_hashtypes(algos) -> tuple:
+	"""Returns the hashtypes of one name, or comma separated names, or a list of them."""
+	hashtypes = tuple(algos.split(',') if isinstance(algos, str) else algos)
+	for hashtype in hashtypes:
+		if not is_supported_hashtype(hashtype):
+			raise InputError(f'{hashtype!r} is not a supported hash type!')
+	if not any(hashtypes):
+		raise InputError('no hash type was given!')
+	return hashtypes
+
+
+def _gen_results(files: Iterable, hashtypes: tuple, verify: bool, on_error: str, process: Process,
+	options: dict) -> Generator:
+	"""Hashes the files, and yields their results in the same order, with the process, if it is
+	given, else with a new one created with the options."""
+	if on_error not in ON_ERROR:
+		raise InputError(f'on_error must be one of: {", ".join(ON_ERROR)}')
+	process = process or Process(progress=False, **options)
+	# The files given but not yielded yet, the ones before a yielded file couldn't be read.
+	given = deque()
+
+	def gen_given():
+		for file in files:
+			given.append(file)
+			yield file
+
+	def gen_failed(until: File = None):
+		while given and given[0] is not until:
+			file = given.popleft()
+			status = 'unreadable' if file.exists() else 'missing'
+			for hashtype in hashtypes:
+				yield Result(**make_record(file, hashtype, status))
+
+	unreadable = [] if on_error == 'collect' else None
+	for file in process.iter_hashed(gen_given(), hashtypes, unreadable=unreadable):
+		yield from gen_failed(until=file)
+		given.popleft()
+		for hashtype in hashtypes:
+			status = ('ok' if file.checksum(hashtype) else 'failed') if verify else 'hashed'
+			yield Result(**make_record(file, hashtype, status))
+	yield from gen_failed()
+
+
+def hash_many(paths: Iterable, algos='sha256', *, on_error: str = 'collect', process: Process = None,
+	**options) -> Generator:
+	"""Calculates the hash sums of the algorithms (one name, comma separated names or a list of them, e.g.
+	'sha256' or ['md5', 'blake2b']) of the files, and yields one `Result` per file and algorithm, with the
+	'hashed' status, in the same order, as soon as each file is hashed. The paths can be lazily generated.
+
+	The keyword options are the ones of `common.Process`, e.g. ``jobs=4, executor='thread'`` or a
+	`cache.DigestCache` kept between the calls, which isn't closed here, or the `process` itself, which
+	can be shared by the calls (e.g. from many threads, as done by `server.Daemon`). Raises `common.InputError`
+	for an unsupported algorithm, see `ON_ERROR` for the files which can't be read."""
+	hashtypes = _get_hashtypes(algos)
+	files = (File(os.fspath(path)) for path in paths)
+	return _gen_results(files, hashtypes, False, on_error, process, options)
+
+
+def verify_many(entries: Iterable, algo: str, *, on_error: str = 'collect', process: Process = None,
+	**options) -> Generator:
+	"""Verifies the files of the entries, ``(path, hash sum)`` or ``(path, hash sum, size)`` tuples (the
+	size in bytes, or None, the files with another size aren't read), with the hash sums of the algorithm,
+	and yields one `Result` per entry, with the 'ok' or 'failed' status, in the same order, as soon as each
+	file is checked. The entries can be lazily generated.
+
+	The keyword options are the ones of `hash_many`. Raises `common.InputError` for an unsupported
+	algorithm or a hash sum which isn't hexadecimal, see `ON_ERROR` for the files which can't be read."""
+	hashtypes = _get_hashtypes([algo])
+	files = (
+		File(os.fspath(entry[0]), entry[1], given_size=entry[2] if len(entry) > 2 else None)
+		for entry in entries
+	)
+	return _gen_results(files, hashtypes, True, on_error, process, options)
+
+
+def verify_manifest(filename: str, algo: str = None, root: str = None, *, on_error: str = 'collect',
+	process: Process = None, **options) -> Generator:
+	"""Verifies the files listed in the manifest (e.g. written by ``shazam calc --write``, in the text or binary
+	format), as `verify_many`, only the ones of the algorithm if its lines are tagged, which is found as by
+	``shazam read`` when not given. The paths of the files are relative to `root`, if it is given. Raises
+	`common.ShazamError` when the manifest can't be read, or its algorithm can't be found."""
+	manifest = open_manifest(filename)
+	hashtype = algo or manifest.get_hashtype()
+	if hashtype is None:
+		raise InputError(f'the hash type of {filename!r} was not recognized, please give its algorithm!')
+	hashtypes = _get_hashtypes([hashtype])
+	segments = load_manifest_segments(filename, hashtype)
+	files = (
+		File(os.path.join(root, name) if root else name, hashsum, given_size=size, given_segments=segments.get(name))
+		for name, hashsum, size, entry_hashtype in manifest.iter_entries()
+		if entry_hashtype is None or entry_hashtype == hashtype
+	)
+	return _gen_results(files, hashtypes, True, on_error, process, options)
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+""" Cache is a support module, which keeps the calculated hash sums
+between the executions of this programm, so unchanged files aren't hashed again."""
+# -*- coding: utf-8 -*-
+
+__author__ = "Anaxímeno Brito"
+__version__ = "0.4.7.1-beta"
+__license__ = "GNU General Public License v3.0"
+__copyright__ = "Copyright (c) 2020-2021 by " + __author__
+
+import os
+import sys
+import stat
+import time
+import threading
+from collections import OrderedDict
+
+# Imported by the first `DigestCache`, so the program doesn't pay for it when the cache isn't used.
+sqlite3 = None
+
+
+def _import_sqlite3() -> bool:
+	"""Imports the sqlite3 module, returns False if it isn't available."""
+	global sqlite3
+	if sqlite3 is None:
+		try:
+			import sqlite3
+		except ImportError:
+			return False
+	return True
+
+
+def get_cache_dir() -> str:
+	"""Returns the directory where the cache is stored, following the XDG base directory specification."""
+	base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+	return os.path.join(base, 'shazam')
+
+
+def get_key(filename: str, file_stat: os.stat_result = None):
+	"""Returns the key of the file in the caches, see `DigestCache.get_key`."""
+	if file_stat is None:
+		try:
+			file_stat = os.stat(filename)
+		except OSError:
+			return None
+	if not stat.S_ISREG(file_stat.st_mode) or file_stat.st_size < DigestCache.MIN_SIZE:
+		return None
+	return (os.path.abspath(filename), file_stat.st_dev, file_stat.st_ino,
+		file_stat.st_size, file_stat.st_mtime_ns, file_stat.st_ctime_ns)
+
+
+def _is_racy(key: tuple) -> bool:
+	"""Returns if the file of the key was changed too recently for caching its hash sums."""
+	return time.time_ns() - max(key[4], key[5]) < DigestCache.RACY_WINDOW_NS
+
+
+class DigestCache(object):
+	"""Persistent cache of the calculated hash sums, kept in a SQLite database.
+
+	Each hash sum is stored by file path and hashtype, together with the identity and
+	stat metadata of the file (device, inode, size, modification and status change time),
+	it is only returned while all of them are unchanged. The status change time can't be
+	set back, so a file rewritten with the same size and modification time (e.g. restored
+	by ``touch -d``) is still hashed again. It can be used from many threads at once."""
+
+	# Maximum number of hash sums kept, the least recently used are evicted when closing.
+	MAX_ENTRIES = 500000
+	# Smaller files are hashed about as fast as their hash sums are looked up, so they aren't cached,
+	# and the database isn't even opened by the commands which only hash small files.
+	MIN_SIZE = 64 * 1024
+	# Files modified less than this number of nanoseconds before being hashed aren't cached,
+	# because they can still be changed without changing their modification time.
+	RACY_WINDOW_NS = 2 * 10 ** 9
+
+	def __init__(self, filename: str = None, refresh: bool = False, max_entries: int = None):
+		"""`refresh` if True the cached hash sums are ignored, but the new ones are still stored.
+		The database is only opened when the cache is first used."""
+		self._filename = filename
+		self._refresh = refresh
+		self._max_entries = max_entries or DigestCache.MAX_ENTRIES
+		self._db = None
+		self._opened = False
+		# The connection is shared by the threads, which use it one at a time.
+		self._lock = threading.RLock()
+		# The paths and hashtypes of the hash sums found, whose last use is only written when closing.
+		self._used = []
+		self.hits = 0
+		self.misses = 0
+
+	def _open(self):
+		"""Returns the database, opening it the first time, or None if it can't be used."""
+		if self._opened:
+			return self._db
+		with self._lock:
+			if not self._opened:
+				self._connect()
+				self._opened = True
+		return self._db
+
+	def _connect(self) -> None:
+		"""Opens the database and creates its table, the cache is disabled if it fails."""
+		if not _import_sqlite3():
+			return
+		filename = self._filename
+		try:
+			if filename is None:
+				os.makedirs(get_cache_dir(), exist_ok=True)
+				filename = os.path.join(get_cache_dir(), 'digests.sqlite')
+			# Each statement is committed on its own (and `close` writes in one transaction), so the database
+			# is never locked while the files are hashed, and many runs at once can share it.
+			self._db = sqlite3.connect(filename, timeout=5, check_same_thread=False, isolation_level=None)
+			self._db.execute('PRAGMA journal_mode=WAL')
+			self._db.execute('PRAGMA synchronous=NORMAL')
+			columns = [row[1] for row in self._db.execute('PRAGMA table_info(digests)')]
+			if any(columns) and 'ctime_ns' not in columns:
+				# Written by an older version, whose hash sums can't be trusted without the status change time.
+				self._db.execute('DROP TABLE digests')
+			self._db.execute('''CREATE TABLE IF NOT EXISTS digests (
+				path TEXT NOT NULL, hashtype TEXT NOT NULL,
+				dev INTEGER, ino INTEGER, size INTEGER, mtime_ns INTEGER, ctime_ns INTEGER,
+				digest TEXT NOT NULL, used REAL NOT NULL,
+				PRIMARY KEY (path, hashtype))''')
+			self._db.execute('CREATE INDEX IF NOT EXISTS digests_used ON digests (used)')
+		except (OSError, sqlite3.Error) as error:
+			self._disable(error)
+
+	def _disable(self, error: Exception = None) -> None:
+		"""Stops using the database, the cache is an optimization, so its errors aren't fatal, but reported."""
+		if error is not None:
+			print(f'shazam: cache error: the cache of the hash sums is not used anymore: {error}', file=sys.stderr)
+		if self._db is not None:
+			try:
+				self._db.close()
+			except sqlite3.Error:
+				pass
+		self._db = None
+
+	def is_enabled(self) -> bool:
+		return self._open() is not None
+
+	def get_key(self, filename: str, file_stat: os.stat_result = None):
+		"""Returns the key identifying the current state of the file, or None if it can't be
+		cached (e.g. it doesn't exist, isn't a regular file or is smaller than `DigestCache.MIN_SIZE`). The file is only queried with
+		`os.stat` when its `file_stat` isn't given."""
+		key = get_key(filename, file_stat)
+		return key if key is not None and self._open() is not None else None
+
+	def get(self, key: tuple, hashtype: str):
+		"""Returns the cached hash sum of the file with the given key, or None."""
+		if key is None or self._open() is None:
+			return None
+		path, *metadata = key
+		digest = None
+		with self._lock:
+			if self._refresh is False and self._db is not None:
+				try:
+					row = self._db.execute('SELECT dev, ino, size, mtime_ns, ctime_ns, digest FROM digests '
+						'WHERE path = ? AND hashtype = ?', (path, hashtype)).fetchone()
+					if row is not None and list(row[:5]) == metadata:
+						digest = row[5]
+						self._used.append((path, hashtype))
+				except sqlite3.Error as error:
+					self._disable(error)
+			if digest is None:
+				self.misses += 1
+			else:
+				self.hits += 1
+		return digest
+
+	def put(self, key: tuple, hashtype: str, digest: str) -> None:
+		"""Stores the hash sum of the file with the given key."""
+		if key is None or digest is None or self._open() is None:
+			return
+		if _is_racy(key):
+			return
+		with self._lock:
+			if self._db is None:
+				return
+			try:
+				self._db.execute('INSERT OR REPLACE INTO digests VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+					(key[0], hashtype, *key[1:], digest, time.time()))
+			except sqlite3.Error as error:
+				self._disable(error)
+
+	def close(self) -> None:
+		"""Writes when the hash sums found were last used and evicts the least recently used ones above the limit."""
+		with self._lock:
+			if self._db is None:
+				return
+			try:
+				self._db.execute('BEGIN IMMEDIATE')
+				now = time.time()
+				self._db.executemany('UPDATE digests SET used = ? WHERE path = ? AND hashtype = ?',
+					((now, path, hashtype) for path, hashtype in self._used))
+				count, = self._db.execute('SELECT COUNT(*) FROM digests').fetchone()
+				if count > self._max_entries:
+					self._db.execute('DELETE FROM digests WHERE rowid IN '
+						'(SELECT rowid FROM digests ORDER BY used LIMIT ?)', (count - self._max_entries,))
+				self._db.execute('COMMIT')
+			except sqlite3.Error as error:
+				self._disable(error)
+			self._used = []
+			self._disable()
+
+
+class MemoryDigestCache(object):
+	"""Cache of the calculated hash sums kept in memory, with the same methods as `DigestCache`, used by
+	the long running daemon (see `server.Daemon`). It keeps the most recently used hash sums, evicting
+	the others above its limit, and can be used from many threads at once."""
+
+	# Maximum number of hash sums kept.
+	MAX_ENTRIES = 100000
+
+	def __init__(self, max_entries: int = None):
+		self._max_entries = max_entries or MemoryDigestCache.MAX_ENTRIES
+		self._lock = threading.Lock()
+		# The hash sums by path and hashtype, with the identity and stat metadata of
+		# their files, from the least to the most recently used.
+		self._entries = OrderedDict()
+		self.hits = 0
+		self.misses = 0
+
+	def __len__(self) -> int:
+		return len(self._entries)
+
+	def is_enabled(self) -> bool:
+		return True
+
+	def get_key(self, filename: str, file_stat: os.stat_result = None):
+		return get_key(filename, file_stat)
+
+	def get(self, key: tuple, hashtype: str):
+		if key is None:
+			return None
+		path, *metadata = key
+		with self._lock:
+			entry = self._entries.get((path, hashtype))
+			if entry is not None and entry[0] == metadata:
+				self._entries.move_to_end((path, hashtype))
+				self.hits += 1
+				return entry[1]
+			self.misses += 1
+			return None
+
+	def put(self, key: tuple, hashtype: str, digest: str) -> None:
+		if key is None or digest is None:
+			return
+		if _is_racy(key):
+			return
+		path, *metadata = key
+		with self._lock:
+			self._entries[(path, hashtype)] = (metadata, digest)
+			self._entries.move_to_end((path, hashtype))
+			if len(self._entries) > self._max_entries:
+				self._entries.popitem(last=False)
+
+	def close(self) -> None:
+		"""Nothing is saved, the hash sums are kept while the daemon runs."""
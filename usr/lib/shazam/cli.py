@@ -0,0 +1,661 @@
+#!/usr/bin/env python3
+""" Cli is a support module, which reads the arguments of the command line and runs the
+sub-command given, see `main`. It is imported by the ``shazam.py`` script, so its bytecode
+is cached, and only the modules of the sub-command run are imported by it."""
+# -*- coding: utf-8 -*-
+
+__author__ = "Anaxímeno Brito"
+__version__ = "0.4.7.1-beta"
+__license__ = "GNU General Public License v3.0"
+__copyright__ = "Copyright (c) 2020-2021 by " + __author__
+
+from common import get_hashtype_from_string_length, get_hashtypes_from_string
+from common import is_supported_hashtype, load_manifest_segments
+from algorithms import get_algorithms
+from common import parse_size, match_filters, walk_files
+from common import File, Process, Errors, ShazamError, animate
+from cache import DigestCache
+from stats import RunStats
+from itertools import chain
+import contextlib
+import argparse
+import sys
+import os
+
+
+class MainFlow(object):
+	"""Organizes the program's processing flow."""
+
+	__slots__ = ["args", "subarg", "_process"]
+	def __init__(self, args):
+		self.args = args
+		daemon = connect_daemon(args)
+		io_mode = getattr(args, 'io', 'auto')
+		if io_mode == 'auto' and getattr(args, 'watch', False):
+			# The watched files are expected to change, so they are only mapped with --io mmap (see `File.gen_data`).
+			io_mode = 'read'
+		self._process = Process(
+			jobs=getattr(args, 'jobs', 1),
+			executor=getattr(args, 'executor', 'thread'),
+			max_rate=getattr(args, 'max_rate', None),
+			buffer_size=getattr(args, 'buffer_size', None),
+			io_mode=io_mode,
+			cache=None if getattr(args, 'no_cache', True) or daemon is not None else DigestCache(refresh=args.refresh),
+			in_flight=getattr(args, 'in_flight', None),
+			output=getattr(args, 'output', 'human'),
+			stats=RunStats() if getattr(args, 'stats', False) else None,
+			daemon=daemon)
+
+		if not args.subparser:
+			e = Errors(to_exit=True, error_type='input error')
+			e.print_error("subcommands were not given!")
+
+		self.subarg = args.subparser
+
+	def close(self):
+		"""Releases the resources kept by the processing, e.g. saving the cache."""
+		self._process.close()
+
+	def make_process(self):
+		"""Performs specific processing depending on the arguments."""
+		if self.subarg == 'check':
+			if self.args.from_manifest:
+				file, hashtype = self.find_listed_file()
+			else:
+				if self.args.FILE is None:
+					e = Errors(to_exit=True, error_type='input error')
+					e.print_error('the FILE was not given, give its HASH_SUM and FILE, or --from-manifest MANIFEST FILE!')
+				hashtype = self.args.type or get_hashtype_from_string_length(self.args.HASH_SUM)
+				file = File(self.args.FILE, self.args.HASH_SUM, given_size=self.args.size)
+
+			if hashtype is None:
+				e = Errors(to_exit=True, error_type='input error')
+				e.print_error('the hash type was not recognized, please specify it using -t/--type <TYPE>',
+				f'Available Hash Types: {get_available_hashtypes()}')
+
+			self._process.checkfile(file=file, hashtype=hashtype, verbosity=self.args.verbose)
+		elif self.subarg == 'calc':
+			files = [File(fname) for fname in self.args.FILES]
+			hashtypes = self.args.type
+
+			if not any(files) and not self.args.recursive and not self.args.update:
+				e = Errors(to_exit=True, error_type='input error')
+				e.print_error('there are no files to calculate the hash sums, give FILES or -r/--recursive DIR!')
+			if self.args.write and self.args.name and len(hashtypes) > 1:
+				e = Errors(to_exit=True, error_type='input error')
+				e.print_error('--name can only be used when writing one hash type!')
+			if self.args.dupes and (len(hashtypes) > 1 or self.args.write or self.args.update):
+				e = Errors(to_exit=True, error_type='input error')
+				e.print_error('--dupes can only be used with one hash type, and without --write or --update!')
+			if self.args.update and (len(hashtypes) > 1 or self.args.write):
+				e = Errors(to_exit=True, error_type='input error')
+				e.print_error('--update can only be used with one hash type, and without --write!')
+			if self.args.prune and not self.args.update:
+				e = Errors(to_exit=True, error_type='input error')
+				e.print_error('--prune can only be used with --update!')
+
+			if self.args.recursive:
+				for directory in self.args.recursive:
+					if not os.path.isdir(directory):
+						e = Errors(to_exit=True, error_type='input error')
+						e.print_error(f'{directory!r} is not a directory!')
+				# The files inside the directories are found while the others are being hashed.
+				files = chain(files, *(
+					walk_files(directory, self.args.include, self.args.exclude, self.args.follow_symlinks)
+					for directory in self.args.recursive))
+
+			if self.args.dupes:
+				self._process.duplicates(files, hashtypes[0])
+			elif self.args.update:
+				self._process.update(self.args.update, files, hashtypes[0], self.args.sizes, self.args.tag, self.args.prune)
+			elif len(hashtypes) == 1:
+				found = self._process.calculate_hash_sum(
+					files=files, verbosity=self.args.no_verbose,
+					hashtype=hashtypes[0])
+			else:
+				found = self._process.totalcheck(files, hashtypes)
+
+			if self.args.write:
+				for hashtype in hashtypes:
+					self._process.write(found, hashtype, self.args.name, self.args.sizes, self.args.tag)
+		elif self.subarg == 'read':
+			from manifest import open_manifest
+			t = open_manifest(self.args.filename)
+			hashtype = self.args.type or t.get_hashtype()
+			# The listed files are checked while the file is being read, only the
+			# ones of the hash type, when the lines are tagged with theirs.
+			entries = (
+				entry for entry in (t.iter_matching(self.args.only) if self.args.only else t.iter_entries())
+				if (entry[3] is None or entry[3] == hashtype)
+				and match_filters(entry[0], self.args.include, self.args.exclude)
+			)
+			if self.args.shard:
+				from shard import iter_shard
+				entries = iter_shard(entries, *self.args.shard, by=self.args.shard_by)
+			contents = (
+				(os.path.join(self.args.root, filename) if self.args.root else filename, hashsum, size, filename)
+				for filename, hashsum, size, _ in entries
+			)
+			first = next(contents, None)
+			segments = load_manifest_segments(self.args.filename, hashtype)
+
+			if self.args.results and (not self.args.shard or self.args.watch):
+				e = Errors(to_exit=True, error_type='input error')
+				e.print_error('--results can only be used with --shard K/N, and without --watch!')
+			elif first is None and self.args.only:
+				e = Errors(to_exit=True, error_type='input error')
+				e.print_error(f'no file listed in {self.args.filename!r} matches --only!')
+			elif first is None and not self.args.shard and next(iter(t.iter_entries()), None) is None:
+				e = Errors(to_exit=True, error_type='reading error')
+				e.print_error(f'{self.args.filename!r} is empty!')
+			elif first is None and not self.args.shard and (self.args.include or self.args.exclude):
+				e = Errors(to_exit=True, error_type='input error')
+				e.print_error(f'no file listed in {self.args.filename!r} matches --include and --exclude!')
+			elif first is None and not self.args.shard:
+				e = Errors(to_exit=True, error_type='input error')
+				e.print_error(f'no file listed in {self.args.filename!r} has the hash type {hashtype!r}!')
+			elif hashtype is None:
+				e = Errors(to_exit=True, error_type='input error')
+				e.print_error('the hash type was not recognized, please specify it using -t/--type <TYPE>',
+				f'Available Hash Types: {get_available_hashtypes()}')
+
+			# The worker of an empty shard has nothing to check, but still writes its results, so they can be merged.
+			files = (File(filename, hashsum, given_size=size, given_segments=segments.get(listed_name))
+				for filename, hashsum, size, listed_name in (chain([first], contents) if first is not None else ()))
+			if self.args.watch:
+				from watch import watch
+				watch(self._process, list(files), hashtype, interval=self.args.interval, debounce=self.args.debounce,
+					inotify=self.args.inotify, verbosity=self.args.verbose, fail_fast=self.args.fail_fast)
+			else:
+				results = self.open_results(hashtype) if self.args.results else contextlib.nullcontext()
+				with results:
+					self._process.checkfiles(
+						files=files,
+						hashtype=hashtype,
+						verbosity=self.args.verbose,
+						fail_fast=self.args.fail_fast,
+						results=results if self.args.results else None)
+		elif self.subarg == 'merge':
+			from shard import merge
+			if not merge(self.args.RESULTS, self.args.output):
+				sys.exit(1)
+		elif self.subarg == 'convert':
+			from manifest import convert
+			try:
+				n_entries = convert(self.args.SOURCE, self.args.DESTINATION)
+			except OSError as err:
+				e = Errors(to_exit=True, error_type='save error')
+				e.print_error(f'{self.args.DESTINATION!r} could not be written: {err.strerror}!')
+			if self.args.output == 'human':
+				animate(f"\nFile {self.args.DESTINATION!r} was created, with {n_entries} entries!", secs=0.045)
+		elif self.subarg == 'serve':
+			from server import Daemon
+			d = Daemon(self.args.socket, max_entries=self.args.max_entries, jobs=self.args.jobs,
+				executor=self.args.executor, in_flight=self.args.in_flight, max_rate=self.args.max_rate,
+				buffer_size=self.args.buffer_size, io_mode=self.args.io)
+			d.listen()
+			if self.args.output == 'human':
+				print(f'serving at {d.get_socket_path()!r}, stop it with Ctrl+C', flush=True)
+			try:
+				d.serve_forever()
+			except KeyboardInterrupt:
+				pass
+
+		self._process.print_cache_stats()
+		self._process.print_stats()
+
+	def open_results(self, hashtype: str):
+		"""Returns the `shard.ResultsWriter` of the partial results file of --results, whose header
+		has what is checked, so `shazam merge` only merges the results of the same checks."""
+		from shard import ResultsWriter
+		shard, shards = self.args.shard
+		header = {'shard': shard, 'shards': shards, 'by': self.args.shard_by,
+			'manifest': os.path.basename(self.args.filename), 'hashtype': hashtype,
+			'only': self.args.only, 'include': self.args.include, 'exclude': self.args.exclude}
+		try:
+			return ResultsWriter(self.args.results, header)
+		except OSError as err:
+			e = Errors(to_exit=True, error_type='save error')
+			e.print_error(f'{self.args.results!r} could not be written: {err.strerror}!')
+
+	def find_listed_file(self) -> tuple:
+		"""Returns the file given to check, with the hash sum and size listed in the manifest of
+		--from-manifest, and its hashtype, which is None if it wasn't recognized."""
+		if self.args.FILE is not None:
+			e = Errors(to_exit=True, error_type='input error')
+			e.print_error('only the FILE can be given with --from-manifest, its hash sum is the listed one!')
+		from manifest import open_manifest
+		filename = self.args.HASH_SUM
+		manifest = open_manifest(self.args.from_manifest)
+		hashtype = self.args.type or manifest.get_hashtype()
+		entry = manifest.lookup(filename, hashtype) or manifest.lookup(os.path.normpath(filename), hashtype)
+		if entry is None:
+			e = Errors(to_exit=True, error_type='input error')
+			e.print_error(f'{filename!r} is not listed in {self.args.from_manifest!r}!')
+
+		name, hashsum, size, entry_hashtype = entry
+		hashtype = self.args.type or entry_hashtype or hashtype or get_hashtype_from_string_length(hashsum)
+		segments = load_manifest_segments(self.args.from_manifest, hashtype)
+		file = File(name, hashsum, given_size=self.args.size if self.args.size is not None else size,
+			given_segments=segments.get(name))
+		return file, hashtype
+
+
+class HelpFormatter(argparse.HelpFormatter):
+	"""Formats the help as argparse does, but finds the width of the terminal without importing shutil
+	(and the compression modules it imports), as a formatter is created for each argument added."""
+
+	def __init__(self, prog: str, **kwargs):
+		kwargs.setdefault('width', get_terminal_width() - 2)
+		super().__init__(prog, **kwargs)
+
+
+def get_terminal_width() -> int:
+	"""Returns the number of columns of the terminal, as `shutil.get_terminal_size` does."""
+	try:
+		return int(os.environ['COLUMNS'])
+	except (KeyError, ValueError):
+		pass
+	try:
+		return os.get_terminal_size(sys.__stdout__.fileno()).columns
+	except (AttributeError, ValueError, OSError):
+		return 80
+
+
+def hashtypes_argument(value: str) -> list:
+	"""Argparse type for comma separated hash types, e.g.: 'md5,sha256' or 'all'."""
+	hashtypes = get_hashtypes_from_string(value)
+	if hashtypes is None:
+		raise argparse.ArgumentTypeError(f'{value!r} has unsupported hash types, '
+			f'use one or more of: {get_available_hashtypes()} (comma separated) or all')
+	return hashtypes
+
+
+def hashtype_argument(value: str) -> str:
+	"""Argparse type for one hash type, e.g.: 'sha256' or 'blake2b'."""
+	hashtype = value.strip().lower()
+	if not is_supported_hashtype(hashtype):
+		raise argparse.ArgumentTypeError(f'{value!r} is not a supported hash type, use one of: {get_available_hashtypes()}')
+	return hashtype
+
+
+def get_available_hashtypes() -> str:
+	"""Returns the names of the supported hash types, for the messages."""
+	return ", ".join(get_algorithms()) + f" (or any of them with the {File.TREE_SUFFIX!r} suffix)"
+
+
+# The options of how the files are read and hashed, by their defaults, the daemon reads them its own way,
+# so when any of them is given (e.g. --max-rate, limiting the reads of a shared machine) it isn't used.
+DAEMON_READING_DEFAULTS = {'max_rate': None, 'buffer_size': None, 'io': 'auto', 'jobs': 1, 'executor': 'thread',
+	'in_flight': None}
+
+
+def connect_daemon(args):
+	"""Returns the client of the running daemon (see `shazam serve`) which hashes the files, if there is
+	one and it can be used, else None. It isn't used when the cache isn't either (--no-cache or --refresh),
+	nor when the files must be read in another way than the daemon's (see `DAEMON_READING_DEFAULTS`)."""
+	if args.subparser not in ('check', 'calc', 'read') or args.no_daemon or args.no_cache or args.refresh:
+		return None
+	if any(getattr(args, option, default) != default for option, default in DAEMON_READING_DEFAULTS.items()):
+		return None
+	from server import Client, get_socket_path
+	socket_path = args.socket or get_socket_path()
+	if not os.path.exists(socket_path):
+		return None
+	try:
+		return Client(socket_path)
+	except OSError:
+		return None
+
+
+def shard_argument(value: str) -> tuple:
+	"""Argparse type for a shard of the files, e.g.: '2/8' (see `shard.parse_shard`)."""
+	from shard import parse_shard
+	shard = parse_shard(value)
+	if shard is None:
+		raise argparse.ArgumentTypeError(f'{value!r} is not a shard, give K/N with 1 <= K <= N, e.g.: 1/4')
+	return shard
+
+
+def size_argument(value: str) -> int:
+	"""Argparse type for sizes in bytes, e.g.: '4096', '64K', '200M'."""
+	size = parse_size(value)
+	if size is None:
+		raise argparse.ArgumentTypeError(f'{value!r} is not a valid size, e.g.: 4096, 64K, 200M or 1G')
+	return size
+
+
+def count_argument(value: str) -> int:
+	"""Argparse type for numbers of things, which can't be negative."""
+	try:
+		count = int(value)
+	except ValueError:
+		count = -1
+	if count < 0:
+		raise argparse.ArgumentTypeError(f'{value!r} is not a number of 0 or more')
+	return count
+
+
+def positive_count_argument(value: str) -> int:
+	"""Argparse type for numbers of things, which must be at least 1."""
+	count = count_argument(value)
+	if count == 0:
+		raise argparse.ArgumentTypeError(f'{value!r} is not a number of 1 or more')
+	return count
+
+
+def add_reading_arguments(parser: argparse.ArgumentParser) -> None:
+	"""Adds the arguments controlling how the files are read."""
+	parser.add_argument('--max-rate', type=size_argument, metavar='RATE',
+		help='Maximum number of bytes read per second, e.g.: 200M (default: no limit)'
+	)
+	parser.add_argument('--buffer-size', type=size_argument, metavar='SIZE',
+		help='Size of the buffer used for reading the files, e.g.: 256K (default: adapted to each file)'
+	)
+	parser.add_argument('--io', choices=File.IO_MODES, default='auto',
+		help='Memory-map the files (mmap), read them (read) or memory-map only the big ones (auto, the default, '
+			'but for serve and read --watch, which read them)'
+	)
+
+
+def add_filter_arguments(parser: argparse.ArgumentParser) -> None:
+	"""Adds the arguments for including or excluding files by glob patterns."""
+	parser.add_argument('--include', action='append', default=[], metavar='PATTERN',
+		help='Only use the files whose path or name matches this glob pattern, can be repeated'
+	)
+	parser.add_argument('--exclude', action='append', default=[], metavar='PATTERN',
+		help='Skip the files (and directories) whose path or name matches this glob pattern, can be repeated'
+	)
+
+
+def add_cache_arguments(parser: argparse.ArgumentParser) -> None:
+	"""Adds the arguments controlling the cache of the calculated hash sums."""
+	parser.add_argument('--no-cache', action='store_true',
+		help='Neither use nor update the cache of the hash sums of unchanged files'
+	)
+	parser.add_argument('--refresh', action='store_true',
+		help='Calculate again the hash sums found in the cache, and update it'
+	)
+
+
+def add_daemon_arguments(parser: argparse.ArgumentParser) -> None:
+	"""Adds the arguments for hashing the files with the running daemon."""
+	parser.add_argument('--socket', metavar='PATH',
+		help='Socket of the daemon started by `shazam serve`, which hashes the files when it is running '
+			'(default: $SHAZAM_SOCKET, else shazam.sock inside $XDG_RUNTIME_DIR or the cache directory)'
+	)
+	parser.add_argument('--no-daemon', action='store_true',
+		help='Hash the files here, even if the daemon is running, also done when the files must be read in '
+			'another way than the daemon\'s (--max-rate, --buffer-size, --io, -j, --executor or --in-flight)'
+	)
+
+
+def add_output_arguments(parser: argparse.ArgumentParser) -> None:
+	"""Adds the arguments controlling how the results are printed."""
+	parser.add_argument('--format', choices=Process.OUTPUTS, default='human', dest='output',
+		help='How the results are printed: for people (human), plain lines for scripts (porcelain) or '
+			'one JSON record per file, printed as soon as it is hashed, for programs (jsonl) (default: human)'
+	)
+	parser.add_argument('-q', '--quiet', '--porcelain', action='store_const', const='porcelain', dest='output',
+		help='Print only plain result lines, for scripts: no colors, progress bars, animations or cache statistics'
+	)
+
+
+def add_stats_arguments(parser: argparse.ArgumentParser) -> None:
+	"""Adds the arguments for measuring where the time is spent."""
+	parser.add_argument('--stats', action='store_true',
+		help='Print to the standard error where the time was spent: probing, reading, hashing '
+			'(by hash type) and printing the results, with the number of files and bytes hashed'
+	)
+	parser.add_argument('--profile', metavar='FILE',
+		help='Profile the execution with cProfile, saving the profile in this file (see the pstats module)'
+	)
+
+
+def add_jobs_arguments(parser: argparse.ArgumentParser, jobs: int = 1) -> None:
+	"""Adds the arguments controlling the parallel hashing of the files, `jobs` is the default number of jobs."""
+	parser.add_argument('-j', '--jobs', type=count_argument, default=jobs, metavar='N',
+		help=f'Number of files hashed at the same time, 0 uses one per cpu core (default: {jobs})'
+	)
+	parser.add_argument('--executor', choices=list(Process.EXECUTORS), default='thread',
+		help='Kind of worker pool used when hashing more than one file at the same time, '
+			'async reads the files with JOBS threads while hashing the data already read (default: thread)'
+	)
+	parser.add_argument('--in-flight', type=positive_count_argument, metavar='N',
+		help=f'Maximum number of files being hashed or read ahead at the same time (default: {Process.FILES_PER_WORKER} per job)'
+	)
+
+
+def get_args():
+	hash_types = Process.HASHTYPES_LIST + Process.TREE_HASHTYPES_LIST + ['all']
+
+	parser = argparse.ArgumentParser(
+		prog="shazam",
+		formatter_class=HelpFormatter,
+		usage='%(prog)s {sub-command}',
+		epilog='SHAZAM - %s' % __copyright__
+	)
+	parser.add_argument("--version",
+		help="print the current version of this program", action='version',
+		version='%(prog)s {}'.format(__version__)
+	)
+
+	# Only the arguments of the given sub command are added, as adding all of them
+	# takes about as long as a short run (e.g. checking one small file).
+	command = next((arg for arg in sys.argv[1:] if not arg.startswith('-')), None)
+
+	# Stores all subparsers
+	subparser = parser.add_subparsers(dest='subparser', title='Sub Commands')
+
+	# Positional arguments for check and compare hashsums
+	check = subparser.add_parser('check', formatter_class=HelpFormatter,
+		help="check and Compare the file's hash sum",
+		description="Verifies the integrity of the file.",
+		usage='shazam check <HASH_SUM> <FILE> {--type/-t <HASH_TYPE>}\n       shazam check --from-manifest <MANIFEST> <FILE>'
+	)
+	if command in (None, 'check'):
+		check.add_argument("-t", "--type", help=f"The type of hash sum, e.g.: {hash_types[:-1]}, blake2b or sha3_256",
+			type=hashtype_argument, metavar='TYPE')
+		check.add_argument("HASH_SUM", help="file's hash sum (or, with --from-manifest, the file)")
+		check.add_argument("FILE", nargs='?', help="file's full or relative location")
+		check.add_argument('-m', '--from-manifest', metavar='MANIFEST',
+			help='Check the FILE with its hash sum (and size) listed in this manifest, looked up without reading all '
+				'of it when it is a binary one (see `shazam convert`)'
+		)
+		check.add_argument("-V", "--verbose", action='store_true')
+		check.add_argument('-s', '--size', type=int, metavar='BYTES',
+			help='Original size of the file, in bytes, if it has another size it is reported as modified without reading it'
+		)
+		add_output_arguments(check)
+		add_reading_arguments(check)
+		add_cache_arguments(check)
+		add_daemon_arguments(check)
+		add_stats_arguments(check)
+	# Positional arguments for only calculate hashsums
+	calc = subparser.add_parser('calc', formatter_class=HelpFormatter,
+		help='calculates and show the hash sum',
+		usage='shazam calc {-t/--type} <FILES> (...) {-r/--recursive <DIR>}',
+		description='Calculates and show the hash sum.'
+	)
+	if command in (None, 'calc'):
+		calc.add_argument("-t", "--type", required=True, metavar='TYPE', type=hashtypes_argument,
+			help=f"The type of hash sum, it must be one or more (comma separated, e.g.: md5,sha256) of these: {hash_types}, "
+				"or of the others supported, e.g.: blake2b or sha3_256")
+		calc.add_argument("-w", "--write", action='store_true',
+			help='Saves the calculated hash sums inside one file per hash type'
+		)
+		calc.add_argument('-u', '--update', metavar='MANIFEST',
+			help='Update this file with hash sums (written by --write), hashing only the listed or given files '
+				'which are new or changed (by their stat kept beside it in FILE.stat, else by the cache of the hash sums), '
+				'the listed paths are relative to its directory'
+		)
+		calc.add_argument('--prune', action='store_true',
+			help='With --update, drop the listed files which were not found, instead of keeping them'
+		)
+		calc.add_argument('--sizes', action='store_true',
+			help='Write (or update) the file with the sizes of the files too, so they can be checked without reading '
+				'the ones which have another size'
+		)
+		calc.add_argument('--tag', action='store_true',
+			help='Write (or update) the file with the hash type in each line: TYPE (FILE) = HASH, '
+				'always done for the hash types which can\'t be known by the length of their hash sums'
+		)
+		calc.add_argument('--dupes', action='store_true',
+			help='Instead of printing the hash sums, report the groups of files with the same data, only the files '
+				'with the same size as others are read, and only entirely when their first bytes are the same'
+		)
+		calc.add_argument("--no-verbose", "--noverbose", action='store_false')
+		calc.add_argument('-n', '--name', metavar='NAME',
+			help='Use this with the argument --write for determining the file\'s name.'
+		)
+		calc.add_argument('FILES', nargs='*',
+			help="One or more files for calculating the hash sums"
+		)
+		calc.add_argument('-r', '--recursive', action='append', default=[], metavar='DIR',
+			help='Calculate the hash sums of all files inside this directory and its subdirectories, can be repeated'
+		)
+		calc.add_argument('-L', '--follow-symlinks', action='store_true',
+			help='Use the symbolic links found inside the directories (by default they are skipped)'
+		)
+		add_filter_arguments(calc)
+		add_output_arguments(calc)
+		add_jobs_arguments(calc)
+		add_reading_arguments(calc)
+		add_cache_arguments(calc)
+		add_daemon_arguments(calc)
+		add_stats_arguments(calc)
+
+	# Positional arguments for reading a file which
+	# has the file sum and names wrote in.
+	read = subparser.add_parser('read', formatter_class=HelpFormatter,
+		help='read a file with hash sum and filename inside',
+		description='Read a file with hash sum and filename inside.',
+		usage='shazam read [-h/--help] [--verbose] filename'
+	)
+	if command in (None, 'read'):
+		read.add_argument('filename',
+			help="file to read in, and check the hash sum of the files inside"
+		)
+		read.add_argument('-V', '--verbose', action='store_true', help="verbose option")
+		read.add_argument('--fail-fast', action='store_true',
+			help='Stop at the first file which was modified, not found or unreadable, exiting with 1'
+		)
+		read.add_argument('-w', '--watch', action='store_true',
+			help='After checking the files, keep checking again the ones which change (by size, modification or status '
+				'change time, or inode), until it is interrupted with Ctrl+C'
+		)
+		read.add_argument('--interval', type=float, default=2.0, metavar='SECS',
+			help='With --watch, the seconds between the looks for changed files (default: 2)'
+		)
+		read.add_argument('--debounce', type=float, default=1.0, metavar='SECS',
+			help='With --watch, a changed file is checked again only after this many seconds without changing (default: 1)'
+		)
+		read.add_argument('--inotify', action='store_true',
+			help='With --watch, find the changed files by inotify instead of polling them, when it is available (Linux)'
+		)
+		read.add_argument('--only', action='append', default=[], metavar='PATTERN',
+			help='Only check the listed files whose path matches this glob pattern, can be repeated, the binary '
+				'manifests (see `shazam convert`) are only searched for the paths starting as the pattern'
+		)
+		read.add_argument('--shard', type=shard_argument, metavar='K/N',
+			help='Only check the K-th of N shards of the listed files, so N workers (processes or machines) can each '
+				'check one of them, see --shard-by, --results and `shazam merge`'
+		)
+		read.add_argument('--shard-by', choices=['path', 'size'], default='path',
+			help='With --shard, split the files by the hash of their listed paths (the default), or into ranges of the '
+				'list with about the same number of bytes, which needs their sizes in the file (calc --write --sizes)'
+		)
+		read.add_argument('--results', metavar='FILE',
+			help='With --shard, write the results of the shard into this file too, to be merged with the ones of the '
+				'other shards by `shazam merge`'
+		)
+		read.add_argument('--root', metavar='DIR',
+			help='Directory where the files listed inside the file to read are, by default they are relative to the current one'
+		)
+		add_filter_arguments(read)
+		add_output_arguments(read)
+		read.add_argument('-t', '--type', metavar='', type=hashtype_argument,
+			help='This can be used to specify the hashtype if it was not recognized in the file\'s name.'
+		)
+		add_jobs_arguments(read)
+		add_reading_arguments(read)
+		add_cache_arguments(read)
+		add_daemon_arguments(read)
+		add_stats_arguments(read)
+
+	# Arguments for merging the results of the shards checked by read --shard.
+	merge = subparser.add_parser('merge', formatter_class=HelpFormatter,
+		help='merge the results of the shards checked by read --shard',
+		description='Merges the results of all shards of the files checked by read --shard K/N --results FILE into '
+			'one report, which exits with 1 if some file was modified, not found or unreadable, or some shard '
+			'was not entirely checked.',
+		usage='shazam merge <RESULTS> (...)'
+	)
+	if command in (None, 'merge'):
+		merge.add_argument('RESULTS', nargs='+', help='the results files of all shards, written by read --results')
+		add_output_arguments(merge)
+
+	# Arguments for converting the manifests between the text and binary formats.
+	convert = subparser.add_parser('convert', formatter_class=HelpFormatter,
+		help='convert a file with hash sums between the text and binary formats',
+		description='Converts a file with hash sums (e.g. written by calc --write) from the text format into the '
+			'binary one, which is indexed for fast lookups by read --only and check --from-manifest, or back '
+			'from the binary format into the same text it was converted from.',
+		usage='shazam convert <SOURCE> <DESTINATION>'
+	)
+	if command in (None, 'convert'):
+		convert.add_argument('SOURCE', help='file with hash sums, in the text or binary format')
+		convert.add_argument('DESTINATION', help='file written in the other format')
+		add_output_arguments(convert)
+
+	# Arguments for running the daemon which hashes the files for the other sub commands.
+	serve = subparser.add_parser('serve', formatter_class=HelpFormatter,
+		help='run the daemon which hashes the files for the other sub commands',
+		description='Runs the daemon which hashes the files for the other sub commands (and other local clients), '
+			'listening to a Unix socket, with a pool of workers and the recent hash sums kept between them.',
+		usage='shazam serve [--socket PATH] [-j N]'
+	)
+	if command in (None, 'serve'):
+		serve.add_argument('--socket', metavar='PATH',
+			help='Socket where the daemon listens (default: $SHAZAM_SOCKET, else shazam.sock inside '
+				'$XDG_RUNTIME_DIR or the cache directory)'
+		)
+		serve.add_argument('--max-entries', type=int, metavar='N',
+			help='Number of recent hash sums kept in memory (default: 100000)'
+		)
+		add_output_arguments(serve)
+		add_jobs_arguments(serve, jobs=0)
+		add_reading_arguments(serve)
+
+	return parser.parse_args()
+
+
+def main() -> None:
+	"""Runs the sub-command of the command line, or prints the usage if it wasn't given."""
+	# If there are more than one arguments it will execute the program else send the usage message to the user
+	if len(sys.argv) > 1:
+		args = get_args()
+		flow = MainFlow(args)
+		profiler = None
+		if getattr(args, 'profile', None):
+			import cProfile
+			profiler = cProfile.Profile()
+			profiler.enable()
+		try:
+			flow.make_process()
+		except ShazamError as error:
+			e = Errors(to_exit=True, error_type=error.error_type)
+			e.print_error(*error.messages)
+		except BrokenPipeError:
+			# The reader of the output (e.g. `head`) has exited, the rest of it isn't needed.
+			os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+			sys.exit(1)
+		finally:
+			flow.close()
+			if profiler is not None:
+				profiler.disable()
+				profiler.dump_stats(args.profile)
+	else:
+		print("usage: shazam [-h] [--version] {Sub-Command}")
+		print("       shazam --help         display the help section and exit")
+		print("       shazam --version      display the Version information and exit")
@@ -8,12 +8,25 @@ __version__ = "0.4.7.1-beta"
 __license__ = "GNU General Public License v3.0"
 __copyright__ = "Copyright (c) 2020-2021 by " + __author__
 
+import io
 import os
 import sys
-import string
-import hashlib as hlib
-from time import sleep
-from typing import Generator, Iterable
+import mmap
+import stat
+import importlib
+import threading
+import contextlib
+from time import sleep, monotonic, perf_counter, time_ns
+from collections import deque
+from itertools import chain, islice
+from collections.abc import Generator, Iterable
+from cache import DigestCache
+from algorithms import get_algorithms, get_name_from_tag, is_supported, new_hasher
+from stats import RunStats, format_size
+
+# The modules only needed by some commands (json, fnmatch, hmac, signal...) are imported where
+# they are used, so each command starts faster (see ``python3 -X importtime``).
+HEXDIGITS = '0123456789abcdefABCDEF'
 
 
 class Errors:
@@ -82,35 +95,97 @@ class Errors:
 		self._exit_handler()
 
 
-to_install = []
-try:
-	from termcolor import colored as clr
-except ImportError:
-	to_install.append('termcolor')
-try:
-	from tqdm import tqdm
-except ImportError:
-	to_install.append('tqdm')
-finally:
-	if any(to_install):
-		modules_to_install = ' and '.join(to_install)
-		modules_to_install_instructions = ' '.join(to_install)
-		e = Errors(to_exit=True, error_type='module not found error')
-		e.print_error(f"The package(s) {modules_to_install!r} must be installed before using the program!",
-			f"\nInstall them with:\n\n\t $ pip install {modules_to_install_instructions}\n")
+class ShazamError(Exception):
+	"""Error of the input given to the program (e.g. a manifest which can't be read), raised instead
+	of exiting, so it can be handled when shazam is used as a library (see the `api` module). The command
+	line program prints its messages as an error of its `error_type` (see `Errors.print_error`) and exits."""
+
+	error_type = 'error'
+
+	def __init__(self, *messages: str, error_type: str = None):
+		super().__init__('\n'.join(messages))
+		self.messages = messages
+		if error_type is not None:
+			self.error_type = error_type
+
+
+class InputError(ShazamError, ValueError):
+	error_type = 'input error'
+
+
+class ReadingError(ShazamError):
+	error_type = 'reading error'
+
+
+# The packages only needed by a terminal (termcolor and tqdm) are imported when they are
+# first used, so the program starts faster, and doesn't import them at all when piped.
+_ui_objects = {}
+
+
+def _import_ui_object(package: str, name: str):
+	if package not in _ui_objects:
+		try:
+			_ui_objects[package] = getattr(importlib.import_module(package), name)
+		except ImportError:
+			e = Errors(to_exit=True, error_type='module not found error')
+			e.print_error(f"The package {package!r} must be installed before using the program!",
+				f"\nInstall it with:\n\n\t $ pip install {package}\n")
+	return _ui_objects[package]
+
+
+def is_terminal(stream=None) -> bool:
+	"""Returns if the stream (the standard output by default) is a terminal."""
+	stream = sys.stdout if stream is None else stream
+	try:
+		return stream.isatty()
+	except (AttributeError, ValueError):
+		return False
+
+
+def clr(text: str, color: str) -> str:
+	"""Colors the text, only when the standard output is a terminal."""
+	if not is_terminal():
+		return text
+	return _import_ui_object('termcolor', 'colored')(text, color)
+
+
+class NoProgressBar(object):
+	"""Stands for a disabled progress bar, without importing tqdm."""
+
+	def update(self, n: int = 1) -> None:
+		pass
+
+	def close(self) -> None:
+		pass
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_info) -> None:
+		self.close()
+
+
+def progress_bar(disable: bool = False, **kwargs):
+	"""Returns a tqdm progress bar created with the kwargs, or a `NoProgressBar` if disabled."""
+	if disable is True:
+		return NoProgressBar()
+	return _import_ui_object('tqdm', 'tqdm')(**kwargs)
+
+
+def write_line(text: str = '') -> None:
+	"""Prints the line without breaking the progress bars which may be running."""
+	if 'tqdm' in _ui_objects:
+		_ui_objects['tqdm'].write(text)
 	else:
-		del to_install
+		print(text)
 
 
-def hexa_to_int(hexa: str):
-	"""Receive hexadecimal string and return integer."""
-	if set(hexa).issubset(string.hexdigits):
-		return int(hexa, 16)
+def hexa_to_bytes(hexa: str):
+	"""Receive hexadecimal string and return its raw bytes."""
+	if set(hexa).issubset(HEXDIGITS) and len(hexa) % 2 == 0:
+		return bytes.fromhex(hexa)
 	else:
-		# TODO: to_exit should be False here below!
-		e = Errors(to_exit=True, error_type='input error')
-		e.print_error(f"{hexa!r} is not an hexadecimal value!")
-		return None
+		raise InputError(f"{hexa!r} is not an hexadecimal value!")
 
 
 def get_hashtype_from_string_length(string: str):
@@ -132,22 +207,140 @@ def get_hashtype_from_string_length(string: str):
 		return None
 
 
-def get_hashtype_from_filename(filename: str):
-	"""Analyses the filename and return the hashtype."""
-	for stype in Process.HASHTYPES_LIST[::-1]:
-		if stype in filename:
-			return stype
-	else:
-		t = TextFile(filename)
-		content = t.get_content()
-		if any(content):
-			_, hashsum = content[0]
-			return get_hashtype_from_string_length(hashsum)
+def parse_size(string: str):
+	"""Receive a size like '200M', '64k', '1G' or '4096' (in bytes, binary multiples)
+	and return it as an integer, or None if it isn't a valid size."""
+	units = {'': 1, 'k': 1024, 'm': 1024 ** 2, 'g': 1024 ** 3, 't': 1024 ** 4}
+	value = string.strip().lower()
+	for suffix in ('ib', 'b'):
+		if value.endswith(suffix):
+			value = value[:-len(suffix)]
+			break
+	unit = value[-1:] if value[-1:] in units else ''
+	number = value[:len(value) - len(unit)]
+	try:
+		size = int(float(number) * units[unit])
+	except ValueError:
+		return None
+	return size if size > 0 else None
+
+
+def is_tree_hashtype(hashtype: str) -> bool:
+	"""Returns if the hashtype is a hash tree one, e.g.: 'sha256-tree' (see `File.update_tree_data`)."""
+	return hashtype.endswith(File.TREE_SUFFIX)
+
+
+def is_supported_hashtype(hashtype: str) -> bool:
+	"""Returns if the hashtype is one of the supported algorithms (see `algorithms.get_algorithms`),
+	or the hash tree type of one of them."""
+	if is_tree_hashtype(hashtype):
+		hashtype = hashtype[:-len(File.TREE_SUFFIX)]
+	return is_supported(hashtype)
+
+
+def get_hashsum_length(hashtype: str) -> int:
+	"""Returns the length of the hexadecimal hash sums of the hashtype."""
+	if is_tree_hashtype(hashtype):
+		hashtype = hashtype[:-len(File.TREE_SUFFIX)]
+	return len(new_hasher(hashtype).hexdigest())
+
+
+def get_hashtypes_from_string(string: str):
+	"""Return the list of hashtypes given in a comma separated string, e.g.: 'md5,sha256',
+	'all' stands for the usual hash types (`Process.HASHTYPES_LIST`), the others (e.g.: 'blake2b',
+	'sha3_256' or 'sha256-tree') must be given by name. Returns None if some hash type is not supported."""
+	hashtypes = []
+	for stype in string.lower().split(','):
+		stype = stype.strip()
+		if stype == 'all':
+			selected = Process.HASHTYPES_LIST
+		elif is_supported_hashtype(stype):
+			selected = [stype]
 		else:
 			return None
+		hashtypes.extend(s for s in selected if s not in hashtypes)
+	return hashtypes or None
+
+
+def get_hashtype_from_filename(filename: str):
+	"""Analyses the file and return the hashtype: the one its first line is tagged with, else the one
+	in its name (e.g.: 'sha256sum.txt'), else the one given by the length of its first hash sum."""
+	# Only the first line is read, the hash sums of the file must all be of the same type.
+	hashsum = ''
+	for _, hashsum, _, hashtype in TextFile(filename).iter_entries():
+		if hashtype is not None:
+			return hashtype
+		break
+
+	# The longest names first, so e.g. 'sha256-tree' isn't taken for 'sha256'.
+	names = sorted(get_algorithms(), key=len, reverse=True)
+	for stype in [name + File.TREE_SUFFIX for name in names] + names:
+		if stype in os.path.basename(filename):
+			return stype
+	return get_hashtype_from_string_length(hashsum)
+
+
+def load_segments(filename: str) -> dict:
+	"""Returns the hexadecimal hash sums of the segments of each file, by file name, written
+	beside a manifest of hash tree sums (see `Process.SEGMENTS_EXTENSION`), or an empty dict if
+	the file doesn't exist. Each of its lines is: ``SEGMENT_HASH_SUM,... NAME``, the name is
+	last, so it can have spaces, as in the tagged lines of the manifests of hash tree sums."""
+	segments = {}
+	try:
+		with open(filename, 'rt') as segments_file:
+			for line in segments_file:
+				line = line.rstrip('\n')
+				if not line.strip():
+					continue
+				sums, _, name = line.partition(' ')
+				sums = sums.split(',') if sums else []
+				if not all(sum_ and len(sum_) % 2 == 0 and set(sum_).issubset(HEXDIGITS) for sum_ in sums):
+					# Written by an older version: ``NAME SEGMENT_HASH_SUM...``, whose names can't have spaces.
+					name, *sums = line.split()
+				segments[name] = sums
+	except FileNotFoundError:
+		pass
+	except (UnicodeDecodeError, OSError):
+		raise ReadingError(f'{filename!r} is not possible to read!') from None
+	return segments
+
+
+def load_manifest_segments(manifest: str, hashtype: str) -> dict:
+	"""Returns the hash sums of the segments of the files listed in the manifest (see `load_segments`), which are
+	used for finding which bytes of them were modified, when the hashtype is a hash tree one, else an empty dict."""
+	if hashtype is None or not is_tree_hashtype(hashtype):
+		return {}
+	return load_segments(manifest + Process.SEGMENTS_EXTENSION)
+
+
+def get_stat_signature(file_stat: os.stat_result) -> tuple:
+	"""Returns the inode, size, modification and status change time of the file, which are written
+	beside the manifests (see `Process.STAT_EXTENSION`)."""
+	return (file_stat.st_ino, file_stat.st_size, file_stat.st_mtime_ns, file_stat.st_ctime_ns)
+
+
+def load_stat_signatures(filename: str) -> dict:
+	"""Returns the stat signatures (see `get_stat_signature`) of the files, by file name, written beside
+	a manifest (see `Process.STAT_EXTENSION`), or an empty dict if the file doesn't exist or can't be
+	read. Each of its lines is: ``INODE SIZE MTIME_NS CTIME_NS NAME``, the name is last, so it can have spaces."""
+	signatures = {}
+	try:
+		with open(filename, 'rt') as signatures_file:
+			for line in signatures_file:
+				*numbers, name = line.rstrip('\n').split(' ', 4)
+				if len(numbers) == 4 and all(number.isdigit() for number in numbers) and name:
+					signatures[name] = tuple(int(number) for number in numbers)
+	except (UnicodeDecodeError, OSError):
+		# It only spares reading the unchanged files again.
+		pass
+	return signatures
 
 
 def animate(string: str, secs: float = 0.1):
+	if not is_terminal():
+		# Nobody is watching it.
+		print(string)
+		return
 	for char in string:
 		if char != '\n' and char != '\t':
 			sleep(secs)
@@ -156,336 +349,1603 @@ def animate(string: str, secs: float = 0.1):
 	print('')	# Go to new line
 
 
-class File(object):
-
-	def __init__(self, filename: str, given_hashsum: str = '', file_for_check: bool = True, **kwargs):
-		"""This class holds all necessary informations and operations for one file object."""
-		self._file_is_for_check = file_for_check
-		self._dir, self._fname = os.path.split(filename)
-		if '.' in self._fname:
-			self._name, self._extension = os.path.splitext(self._fname)
-		else:
-			self._name, self._extension = self._fname, ''
-
-		if len(self._name) > 1 and self._name.startswith('*') and not self.exists():
-			self._name = self._name[1:]
+def match_filters(path: str, include: Iterable = (), exclude: Iterable = ()) -> bool:
+	"""Returns if the path (or only its name) matches any of the `include` glob patterns,
+	when there are some, and none of the `exclude` ones."""
+	if not include and not exclude:
+		return True
+	import fnmatch
+	name = os.path.basename(path)
+
+	def matches(patterns):
+		return any(fnmatch.fnmatch(path, p) or fnmatch.fnmatch(name, p) for p in patterns)
+
+	return (not include or matches(include)) and not matches(exclude)
+
+
+def walk_files(root: str, include: Iterable = (), exclude: Iterable = (), follow_symlinks: bool = False) -> Generator:
+	"""Lazily yields one `File` for each regular file inside the root directory and its subdirectories,
+	sorted by name, directory by directory. The files (and directories) are filtered by their path,
+	relative to root, with `match_filters`. Symbolic links are skipped unless `follow_symlinks` is
+	True. The `os.stat_result` of each directory entry is given to its `File`, so it isn't queried again."""
+	directories = [(root, '')]
+	visited = set()
+	if follow_symlinks:
+		root_stat = os.stat(root)
+		visited.add((root_stat.st_dev, root_stat.st_ino))
+	while directories:
+		directory, relative_dir = directories.pop()
+		try:
+			with os.scandir(directory) as it:
+				entries = sorted(it, key=lambda entry: entry.name)
+		except OSError:
+			continue
+
+		subdirectories = []
+		for entry in entries:
+			relative_path = os.path.join(relative_dir, entry.name)
+			try:
+				if entry.is_symlink() and not follow_symlinks:
+					continue
+				if entry.is_dir():
+					if match_filters(relative_path, exclude=exclude):
+						subdirectories.append((entry, relative_path))
+				elif entry.is_file() and match_filters(relative_path, include, exclude):
+					yield File(entry.path, stat_result=entry.stat())
+			except OSError:
+				# e.g. broken symbolic links or files removed while walking.
+				continue
+
+		for entry, relative_path in reversed(subdirectories):
+			if follow_symlinks:
+				# Symbolic links can make loops, so each directory is only walked once.
+				try:
+					entry_stat = entry.stat()
+				except OSError:
+					continue
+				if (entry_stat.st_dev, entry_stat.st_ino) in visited:
+					continue
+				visited.add((entry_stat.st_dev, entry_stat.st_ino))
+			directories.append((entry.path, relative_path))
+
+
+def write_atomically(filename: str, lines: Iterable, binary: bool = False) -> None:
+	"""Writes the lines into a temporary file beside the file, which then replaces it, so the file
+	is never left half written, even if the program is interrupted. The permissions of the replaced
+	file are kept. The lines are bytes if `binary` is True.
+
+	Raises `OSError` when the file can't be written."""
+	import tempfile
+	directory, name = os.path.split(os.path.abspath(filename))
+	try:
+		mode = stat.S_IMODE(os.stat(filename).st_mode)
+	except FileNotFoundError:
+		umask = os.umask(0)
+		os.umask(umask)
+		mode = 0o666 & ~umask
+
+	fd, temp_filename = tempfile.mkstemp(dir=directory, prefix=f'.{name}.', suffix='.tmp')
+	try:
+		with open(fd, 'wb' if binary else 'wt') as temp_file:
+			temp_file.writelines(lines)
+			temp_file.flush()
+			os.fsync(temp_file.fileno())
+		os.chmod(temp_filename, mode)
+		os.replace(temp_filename, filename)
+	except BaseException:
+		with contextlib.suppress(OSError):
+			os.unlink(temp_filename)
+		raise
+
+
+class RateLimiter(object):
+	"""Token bucket which limits the number of bytes read per second,
+	it can be shared by many threads reading at the same time."""
+
+	def __init__(self, rate: int, burst: int = None):
+		self._rate = rate
+		# At most this number of bytes can be read at once after being idle.
+		self._capacity = burst or max(rate // 10, 1)
+		self._tokens = self._capacity
+		self._last = monotonic()
+		self._lock = threading.Lock()
+
+	def get_rate(self) -> int:
+		"""Returns the maximum number of bytes per second."""
+		return self._rate
+
+	def consume(self, nbytes: int) -> None:
+		"""Takes nbytes from the bucket, sleeping until they are refilled if it runs out."""
+		with self._lock:
+			now = monotonic()
+			self._tokens = min(self._capacity, self._tokens + (now - self._last) * self._rate)
+			self._last = now
+			self._tokens -= nbytes
+			wait = -self._tokens / self._rate
+		if wait > 0:
+			sleep(wait)
 
-		# ´givensum´ is the original file sum which is give at the download place.
-		self._gsum = given_hashsum
 
-		# ´self._given_integer_sum´ is the integer value of the hash sum,
-		# it will be used in comparisons for checking if the values are equal.
-		self._given_integer_sum = hexa_to_int(self._gsum) if self._gsum else None
-		if self._file_is_for_check is True:
-			self._calculated_hashes = []
-			self._hlist = {
-				"md5": hlib.md5(),
-				"sha1": hlib.sha1(),
-				"sha224": hlib.sha224(),
-				"sha256": hlib.sha256(),
-				"sha384": hlib.sha384(),
-				"sha512": hlib.sha512()
-			}
+class File(object):
+	# Limits of the size of the buffer used for reading the files, the actual
+	# size is chosen from the size of the file and the filesystem's block size.
+	MIN_BUFFER_SIZE = 64 * 1024
+	MAX_BUFFER_SIZE = 1024 * 1024
+	# Files of at least this size are memory-mapped instead of read, in the 'auto' io mode.
+	MMAP_THRESHOLD = 256 * 1024 * 1024
+	# Size of the slices of the memory-mapped files given to the hashers.
+	MMAP_CHUNK_SIZE = 8 * 1024 * 1024
+	# Ways of reading the files: 'auto' chooses between 'mmap' and 'read' by the file's size.
+	IO_MODES = ['auto', 'mmap', 'read']
+	# Files smaller than this are hashed in a blink, so they never get their own progress bar.
+	PROGRESS_BAR_MIN_SIZE = 32 * 1024 * 1024
+	# The hash tree sums (e.g. 'sha256-tree') hash the files by segments of this size, in parallel.
+	TREE_SUFFIX = '-tree'
+	TREE_SEGMENT_SIZE = 64 * 1024 * 1024
+
+	# Objects of this class are kept by the thousands when checking big lists of files,
+	# so they only hold the path, the given and calculated digests (and the ones of
+	# their segments for the hash tree sums), the stat result, the time spent hashing them
+	# and the error which didn't let them be read.
+	__slots__ = ['_path', '_gdigest', '_gsize', '_gsegments', '_digests', '_segments', '_stat', '_hash_time', '_error']
+
+	def __init__(self, filename: str, given_hashsum: str = '', **kwargs):
+		"""This class holds all necessary informations and operations for one file object.
+
+		The file is queried with `os.stat` at most once, the first time its existence, type or size
+		is needed, and the result is kept.
 
+		Keyword args:
+			stat_result -- the `os.stat_result` of the file, if it is already known (e.g. from
+				`os.scandir`), so it isn't queried at all,
+			given_size -- the original size of the file, in bytes, if it is known, so a file with
+				another size is known to be modified without reading it (see `File.has_wrong_size`),
+			given_segments -- the original hexadecimal hash sums of the segments of the file, when the
+				given hash sum is a hash tree one, for finding the modified bytes (see `File.get_corrupt_ranges`)."""
+		self._stat = kwargs['stat_result'] if 'stat_result' in kwargs else None
+		self._gsize = kwargs['given_size'] if 'given_size' in kwargs else None
+		given_segments = kwargs['given_segments'] if 'given_segments' in kwargs else None
+		self._gsegments = [bytes.fromhex(segment) for segment in given_segments] if given_segments else None
+		self._path = filename
+
+		directory, fullname = os.path.split(filename)
+		name, extension = os.path.splitext(fullname)
+		if len(name) > 1 and name.startswith('*') and not self.exists():
+			# A binary mode entry (``HASH *NAME``), the stat of the path with the '*' isn't the file's.
+			self._path = os.path.join(directory, name[1:] + extension)
+			self._stat = None
+
+		# ´self._gdigest´ holds the raw bytes of the original file sum which is give at the
+		# download place, it will be compared with the calculated one for checking the file.
+		self._gdigest = hexa_to_bytes(given_hashsum) if given_hashsum else None
+		# Raw digests already calculated, by hashtype, the hashers are only
+		# created when the file is read.
+		self._digests = None
+		# Raw digests of the segments of the file, by hash tree hashtype.
+		self._segments = None
+		# Seconds spent reading and hashing the file, None while it wasn't read.
+		self._hash_time = None
+		# The `OSError` raised while reading the file, if it couldn't be read.
+		self._error = None
 
 	def __str__(self):
 		return self.get_fullpath()
 
 	def get_name(self) -> str:
 		"""Returns the name of the file without its extension, and without its the full path address."""
-		return str(self._name)
+		return os.path.splitext(self.get_fullname())[0]
 
 	def get_extension(self) -> str:
 		"""Returns the extension of the file."""
-		return str(self._extension)
+		return os.path.splitext(self.get_fullname())[1]
 
 	def get_fullname(self) -> str:
 		"""Returns the name of the file plus its extension, but without his full path address."""
-		return self.get_name() + self.get_extension()
+		return os.path.basename(self._path)
 
 	def get_dir(self) -> str:
 		"""Returns the current directory of this file."""
-		return str(self._dir)
+		return os.path.dirname(self._path)
 
 	def get_fullpath(self) -> str:
 		"""Returns the full path of this file."""
-		return os.path.join(self.get_dir(), self.get_fullname())
+		return self._path
+
+	def get_stat(self):
+		"""Returns the `os.stat_result` of the file, or None if it doesn't exist.
+		The file is only queried the first time, the result is kept."""
+		if self._stat is None:
+			try:
+				self._stat = os.stat(self.get_fullpath())
+			except (OSError, ValueError):
+				# False means the file doesn't exist (or can't be reached).
+				self._stat = False
+		return self._stat or None
 
 	def get_size(self) -> int:
 		"""Returns the size in bytes of the file, only if it exists, else None."""
-		if self.exists() is True:
-			return os.path.getsize(self.get_fullpath())
-		return None
+		file_stat = self.get_stat()
+		return file_stat.st_size if file_stat is not None else None
 
 	def get_given_sum(self) -> str:
 		"""Returns the given sum of the file which will be used to compare with the calculated one,
 		for checking this file integrity."""
-		return str(self._gsum)
+		return self._gdigest.hex() if self._gdigest is not None else ''
+
+	def get_given_size(self):
+		"""Returns the given original size of the file, in bytes, or None if it isn't known."""
+		return self._gsize
 
-	def exists(self) -> str:
+	def has_wrong_size(self) -> bool:
+		"""Returns if the file's size isn't the given original one, so it is surely modified.
+		Only the size of regular files is known before reading them."""
+		if self._gsize is None or not self.exists() or not stat.S_ISREG(self.get_stat().st_mode):
+			return False
+		return self.get_size() != self._gsize
+
+	def exists(self) -> bool:
 		"""Returns if this objects exists on his directory."""
-		return os.path.exists(self.get_fullpath())
+		return self.get_stat() is not None
 
 	def is_dir(self) -> bool:
 		"""Returns if this object is a directory."""
-		return os.path.isdir(self.get_fullpath())
+		file_stat = self.get_stat()
+		return file_stat is not None and stat.S_ISDIR(file_stat.st_mode)
 
 	def is_readable(self) -> bool:
 		"""Returns if the file is readable or not. It must: exist on its directory, not be a directory and
-		be readable in the binary mode."""
-		if not self.exists() or self.is_dir():
-			return False
-		try:
-			with open(self.get_fullpath(), 'rb') as f:
-				f.read(1)
-			return True
-		except (UnicodeDecodeError, PermissionError):
-			return False
+		be readable by the current user. No data is read, so pipes aren't consumed by this check."""
+		return self.exists() and not self.is_dir() and os.access(self.get_fullpath(), os.R_OK)
 
 	def get_hashsum(self, hashtype: str):
 		"""Return the file's hash sum."""
-		if hashtype in self._calculated_hashes:
-			return self._hlist[hashtype].hexdigest()
-		return None
-
-	def gen_data(self, *, bar_anim: bool = True) -> Generator:
-		"""Generates binary data.
+		if self._digests is None or hashtype not in self._digests:
+			return None
+		return self._digests[hashtype].hex()
+
+	def set_hashsums(self, hashsums: dict) -> None:
+		"""Stores hash sums calculated elsewhere (e.g. by a worker process), by hashtype."""
+		if self._digests is None:
+			self._digests = {}
+		for hashtype, hashsum in hashsums.items():
+			self._digests[hashtype] = bytes.fromhex(hashsum)
+
+	@staticmethod
+	def get_buffer_size(file_size: int, block_size: int = None) -> int:
+		"""Returns the size of the buffer for reading a file: about 1/64 of the file, between
+		`File.MIN_BUFFER_SIZE` and `File.MAX_BUFFER_SIZE`, but never much bigger than the file
+		itself, and rounded up to a multiple of the filesystem's block size."""
+		block_size = block_size or io.DEFAULT_BUFFER_SIZE
+		size = min(max(file_size // 64, File.MIN_BUFFER_SIZE), File.MAX_BUFFER_SIZE, file_size)
+		return max(-(-size // block_size) * block_size, block_size)
+
+	def gen_data(self, *, bar_anim: bool = True, limiter: RateLimiter = None, buffer_size: int = None,
+		io_mode: str = 'auto') -> Generator:
+		"""Generates binary data, each chunk is a `memoryview` of one reused buffer or
+		of the memory-mapped file, so it is only valid until the next chunk is generated.
 
-        Keyword arg:
-			bars_anim -- if True the function will show progress bars when generating the data.
+		Keyword args:
+			bars_anim -- if True the function will show progress bars when generating the data
+				of files of at least `File.PROGRESS_BAR_MIN_SIZE` bytes,
+			limiter -- if given, the reading speed is limited by it (default: None, full speed),
+			buffer_size -- size of the chunks (default: None, chosen by `File.get_buffer_size`),
+			io_mode -- 'mmap', 'read' or 'auto' for memory-mapping only files of at least
+				`File.MMAP_THRESHOLD` bytes (default: 'auto'). Pipes, special files and files
+				which can't be memory-mapped are always read. A memory-mapped file truncated
+				while it is hashed kills the process with SIGBUS, which can't be handled.
+
+		Raises `OSError` when the file can't be opened or read.
 		"""
-		if self.is_readable() is False:
-			e = Errors(to_exit=True)
-			e.files_not_readable_error([self])
-
-		BUF_SIZE = 32768
-		times = (self.get_size() // BUF_SIZE) + (self.get_size() % BUF_SIZE)
-		loop = tqdm(range(times), ncols=80, desc='CALCULATING BINARIES') if bar_anim else range(times)
-		with open(self.get_fullpath(), 'rb') as f:
-			for _ in loop:
-				yield f.read(BUF_SIZE)
-				sleep(Process.SLEEP_VALUE)
+		with open(self.get_fullpath(), 'rb', buffering=0) as f:
+			file_stat = os.fstat(f.fileno())
+			mapping = File._map(f, file_stat, io_mode)
+			if mapping is not None:
+				chunks = File._gen_mapped_data(mapping, buffer_size or File.MMAP_CHUNK_SIZE)
+			else:
+				chunks = File._gen_read_data(f,
+					buffer_size or File.get_buffer_size(file_stat.st_size, file_stat.st_blksize))
+
+			bar = progress_bar(total=file_stat.st_size, ncols=80, desc='CALCULATING BINARIES',
+				unit='B', unit_scale=True, disable=not bar_anim or file_stat.st_size < File.PROGRESS_BAR_MIN_SIZE)
+			try:
+				for chunk in chunks:
+					if limiter is not None:
+						limiter.consume(len(chunk))
+					bar.update(len(chunk))
+					yield chunk
+			finally:
+				chunks.close()
+				bar.close()
+
+	@staticmethod
+	def _map(f, file_stat: os.stat_result, io_mode: str):
+		"""Returns the file opened in `f` memory-mapped for reading, or None if
+		it should be read instead (or can't be memory-mapped)."""
+		if io_mode == 'read' or not stat.S_ISREG(file_stat.st_mode) or file_stat.st_size == 0:
+			return None
+		if io_mode == 'auto' and file_stat.st_size < File.MMAP_THRESHOLD:
+			return None
+		try:
+			mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+		except (OSError, ValueError):
+			return None
+		if hasattr(mapping, 'madvise') and hasattr(mmap, 'MADV_SEQUENTIAL'):
+			mapping.madvise(mmap.MADV_SEQUENTIAL)
+		return mapping
+
+	@staticmethod
+	def _gen_mapped_data(mapping: mmap.mmap, chunk_size: int) -> Generator:
+		"""Generates slices of the memory-mapped file, without copying them."""
+		with mapping, memoryview(mapping) as view:
+			for offset in range(0, len(view), chunk_size):
+				chunk = view[offset:offset + chunk_size]
+				try:
+					yield chunk
+				finally:
+					# The mapping can only be closed after all of its slices are released.
+					chunk.release()
+
+	@staticmethod
+	def _gen_read_data(f, buffer_size: int) -> Generator:
+		"""Generates the data read from the file into one reused buffer, until its end."""
+		buffer = bytearray(buffer_size)
+		view = memoryview(buffer)
+		while True:
+			n = f.readinto(buffer)
+			if not n:
+				break
+			yield view[:n]
 
 	def update_data(self, hashtype: str, generated_data: Iterable) -> None:
 		"""Updates binary data to the hashtype's class."""
-		if self.is_readable() is False:
-			e = Errors(to_exit=True)
-			e.files_not_readable_error([self])
+		self.update_many_data((hashtype,), generated_data)
+
+	def update_many_data(self, hashtypes: Iterable, generated_data: Iterable, stats: RunStats = None) -> None:
+		"""Updates binary data to the classes of all the given hashtypes at once, so
+		each chunk of data is read only one time, whatever the number of hashtypes.
+		If `stats` is given, the time spent generating and hashing each chunk is added to it."""
+		hashers = {hashtype: new_hasher(hashtype) for hashtype in hashtypes}
+		if stats is None:
+			updaters = [hasher.update for hasher in hashers.values()]
+			for file_data in generated_data:
+				for update in updaters:
+					update(file_data)
+		else:
+			File._update_measured(hashers, generated_data, stats)
+
+		if self._digests is None:
+			self._digests = {}
+		for hashtype, hasher in hashers.items():
+			self._digests[hashtype] = hasher.digest()
+
+	def update_tree_data(self, hashtype: str, jobs: int = 1, limiter: RateLimiter = None,
+		buffer_size: int = None) -> None:
+		"""Calculates the hash tree sum of the hashtype (e.g. 'sha256-tree'): the file is split in
+		segments of `File.TREE_SEGMENT_SIZE` bytes, each one hashed apart, by `jobs` threads at the same
+		time, and the hash sum of the file is the one of all the (raw) segment hash sums joined. The
+		hash sums of the segments are kept, so the modified ones can be found. Files which can't be
+		read at any offset (e.g. pipes) are read sequentially.
+
+		Raises `OSError` when the file can't be opened or read."""
+		algorithm = hashtype[:-len(File.TREE_SUFFIX)]
+		buffer_size = buffer_size or File.MAX_BUFFER_SIZE
+
+		with open(self.get_fullpath(), 'rb', buffering=0) as f:
+			file_stat = os.fstat(f.fileno())
+			if stat.S_ISREG(file_stat.st_mode):
+				def hash_segment(n: int) -> bytes:
+					hasher = new_hasher(algorithm)
+					offset = n * File.TREE_SEGMENT_SIZE
+					end = min(offset + File.TREE_SEGMENT_SIZE, file_stat.st_size)
+					while offset < end:
+						data = os.pread(f.fileno(), min(buffer_size, end - offset), offset)
+						if not data:
+							break
+						if limiter is not None:
+							limiter.consume(len(data))
+						hasher.update(data)
+						offset += len(data)
+					return hasher.digest()
+
+				n_segments = -(-file_stat.st_size // File.TREE_SEGMENT_SIZE)
+				if jobs > 1 and n_segments > 1:
+					from concurrent.futures import ThreadPoolExecutor
+					# hashlib releases the GIL while hashing, so the threads use many cores.
+					with ThreadPoolExecutor(max_workers=min(jobs, n_segments)) as executor:
+						segments = list(executor.map(hash_segment, range(n_segments)))
+				else:
+					segments = [hash_segment(n) for n in range(n_segments)]
+			else:
+				segments = []
+				hasher, hashed = new_hasher(algorithm), 0
+				for data in File._gen_read_data(f, buffer_size):
+					while len(data) > 0:
+						part = data[:File.TREE_SEGMENT_SIZE - hashed]
+						hasher.update(part)
+						hashed += len(part)
+						data = data[len(part):]
+						if hashed == File.TREE_SEGMENT_SIZE:
+							segments.append(hasher.digest())
+							hasher, hashed = new_hasher(algorithm), 0
+				if hashed > 0:
+					segments.append(hasher.digest())
+
+		if self._digests is None:
+			self._digests = {}
+		if self._segments is None:
+			self._segments = {}
+		self._digests[hashtype] = new_hasher(algorithm, b''.join(segments)).digest()
+		self._segments[hashtype] = segments
+
+	def get_segment_sums(self, hashtype: str):
+		"""Returns the hexadecimal hash sums of the segments of the file, for the hash tree
+		hashtype, or None if they weren't calculated."""
+		if self._segments is None or hashtype not in self._segments:
+			return None
+		return [segment.hex() for segment in self._segments[hashtype]]
+
+	def set_segment_sums(self, hashtype: str, segments: list) -> None:
+		"""Stores the hexadecimal hash sums of the segments calculated elsewhere, for the hash tree hashtype."""
+		if self._segments is None:
+			self._segments = {}
+		self._segments[hashtype] = [bytes.fromhex(segment) for segment in segments]
+
+	def copy_given(self) -> 'File':
+		"""Returns a new file of the same path, with the same given hash sum, size and segments,
+		but whose stat and hash sums aren't known yet, e.g. for checking it again after it changed."""
+		given_segments = [segment.hex() for segment in self._gsegments] if self._gsegments is not None else None
+		return File(self._path, self.get_given_sum(), given_size=self._gsize, given_segments=given_segments)
+
+	def copy_hashsums(self, other: 'File', hashtypes: Iterable) -> None:
+		"""Stores the hash sums of the hashtypes (and the ones of their segments) calculated for the other
+		file, which has the same data, e.g. because it is a hard link of this one, with the time spent
+		hashing it, so this one is only reported as cached (see `make_record`) when the other was."""
+		if self._digests is None:
+			self._digests = {}
+		self._hash_time = other._hash_time
+		for hashtype in hashtypes:
+			self._digests[hashtype] = other._digests[hashtype]
+			if other._segments is not None and hashtype in other._segments:
+				if self._segments is None:
+					self._segments = {}
+				self._segments[hashtype] = other._segments[hashtype]
+
+	def get_link_key(self):
+		"""Returns the device and inode of the file, identifying all of its hard links, or None if it
+		has no other (or isn't a regular file), or its size is wrong, so it isn't read anyway."""
+		file_stat = self.get_stat()
+		if file_stat is None or not stat.S_ISREG(file_stat.st_mode) or file_stat.st_nlink < 2 or self.has_wrong_size():
+			return None
+		return file_stat.st_dev, file_stat.st_ino
 
-		for file_data in generated_data:
-			self._hlist[hashtype].update(file_data)
-		self._calculated_hashes.append(hashtype)
+	def get_corrupt_ranges(self, hashtype: str):
+		"""Returns the ranges of bytes, as ``(first, last)`` tuples, of the segments whose hash sums
+		aren't the given ones, for the hash tree hashtype, or None if they can't be compared. When the file
+		was truncated, the original size isn't known, so the last range ends with its last original segment."""
+		if self._gsegments is None or self._segments is None or hashtype not in self._segments:
+			return None
+		segments = self._segments[hashtype]
+		if len(segments) < len(self._gsegments):
+			end = len(self._gsegments) * File.TREE_SEGMENT_SIZE
+		else:
+			end = self.get_size() or 0
+		ranges = []
+		for n in range(max(len(segments), len(self._gsegments))):
+			if n < len(segments) and n < len(self._gsegments) and segments[n] == self._gsegments[n]:
+				continue
+			first = n * File.TREE_SEGMENT_SIZE
+			last = min((n + 1) * File.TREE_SEGMENT_SIZE, end) - 1
+			if ranges and ranges[-1][1] + 1 == first:
+				ranges[-1] = (ranges[-1][0], last)
+			else:
+				ranges.append((first, last))
+		return ranges
+
+	@staticmethod
+	def _update_measured(hashers: dict, generated_data: Iterable, stats: RunStats) -> None:
+		"""Updates the data to the hashers, measuring the reading and hashing times apart. The pages
+		of memory-mapped files are only read when hashed, so their reading time is counted as hashing."""
+		chunks = iter(generated_data)
+		while True:
+			start = perf_counter()
+			file_data = next(chunks, None)
+			if file_data is None:
+				break
+			stats.add_read(perf_counter() - start, len(file_data))
+			for hashtype, hasher in hashers.items():
+				start = perf_counter()
+				hasher.update(file_data)
+				stats.add_digest(hashtype, perf_counter() - start, len(file_data))
+
+	def get_hash_time(self):
+		"""Returns the seconds spent reading and hashing the file, or None if it wasn't read
+		(e.g. its hash sums were found in the cache)."""
+		return self._hash_time
+
+	def set_hash_time(self, seconds: float) -> None:
+		self._hash_time = seconds
+
+	def get_read_error(self):
+		"""Returns the `OSError` raised while reading the file, or None if it was read (or not yet)."""
+		return self._error
+
+	def set_read_error(self, error: OSError) -> None:
+		self._error = error
 
 	def checksum(self, hashtype: str) -> bool:
 		"""Compares file's sum with givensum and return the results"""
-		return hexa_to_int(self.get_hashsum(hashtype)) == self._given_integer_sum
+		if self._gdigest is None or self._digests is None or hashtype not in self._digests:
+			return False
+		import hmac
+		return hmac.compare_digest(self._digests[hashtype], self._gdigest)
 
 
 class TextFile(File):
 
+	__slots__ = []
+
 	def __init__(self, filename: str, **kwargs):
-		super().__init__(filename,
-			given_hashsum=kwargs['given_hashsum'] if 'given_hashsum' in kwargs else '',
-			file_for_check=kwargs['file_for_check'] if 'file_for_check' in kwargs else False,
-			**kwargs)
-
-		e = Errors(to_exit=True)
-		if self.exists() is True and self.is_readable() is False:
-			e.files_not_readable_error([self])
-		elif self.exists() is False:
-			e.files_not_found_error([self])
-		else:
-			pass
+		super().__init__(filename, **kwargs)
+
+		if self.exists() is False:
+			raise ReadingError(f'{self.get_fullpath()!r} was not found!', error_type='file not found error')
+		elif self.is_dir() is True:
+			raise ReadingError(f'{self.get_fullpath()!r} is not possible to read!')
 
 	def get_content(self):
 		"""Return a `list with tuples` with the content of the file,
 		each tuple has the following structure: ``(file name, file hash sum)``."""
+		return list(self.iter_content())
+
+	def iter_content(self) -> Generator:
+		"""Generates the content of the file line by line, as tuples with the following
+		structure: ``(file name, file hash sum)``, so the file is never fully loaded."""
+		for name, hashsum, _, _ in self.iter_entries():
+			yield name, hashsum
+
+	def iter_entries(self) -> Generator:
+		"""Generates the content of the file line by line, as tuples with the following structure:
+		``(file name, file hash sum, file size, hashtype)``, the size or hashtype are None when the line
+		doesn't have them. The lines are either ``HASH  NAME`` (as sha256sum writes them), ``HASH NAME`` or,
+		with the size in bytes, ``HASH SIZE NAME`` (only with single spaces), or tagged with their hashtype: ``TYPE (NAME) = HASH``, optionally followed by the size."""
 		try:
 			with open(self.get_fullpath(), 'rt') as textfile:
-				content = [self._split_line(line) for line in textfile]
-			return content
+				for line in textfile:
+					yield self._split_line(line)
 		except IndexError:
-			e = Errors(to_exit=True, error_type='reading error')
-			e.print_error(f"error reading file {self.get_fullpath()!r}:",
-				 " - Each line of the file should only have the file hash sum and file name!")
-		except UnicodeDecodeError:
-			e = Errors(to_exit=True)
-			e.files_not_readable_error([self])
-
+			raise ReadingError(f"error reading file {self.get_fullpath()!r}:",
+				" - Each line of the file should only have the file hash sum, optionally its size, and the file name!",
+				" - Or, tagged with a supported hash type: TYPE (FILE NAME) = HASH SUM, optionally followed by the size!"
+			) from None
+		except (UnicodeDecodeError, OSError):
+			raise ReadingError(f'{self.get_fullpath()!r} is not possible to read!') from None
+
+	def get_hashtype(self):
+		"""Returns the hashtype of the file's hash sums, see `get_hashtype_from_filename`."""
+		return get_hashtype_from_filename(self.get_fullpath())
+
+	def lookup(self, name: str, hashtype: str = None):
+		"""Returns the first entry of the file (see `iter_entries`) and, if it is given, whose hashtype is the
+		one given or not known, or None if it isn't listed. The file is read until the entry is found."""
+		for entry in self.iter_entries():
+			if entry[0] == name and (hashtype is None or entry[3] is None or entry[3] == hashtype):
+				return entry
 		return None
 
-	def _split_line(self, line: str) -> tuple:
-		"""Split the line read and return the file's name and hash sum inside a tuple."""
-		content = line.split()
+	def iter_matching(self, patterns: Iterable) -> Generator:
+		"""Generates the entries (see `iter_entries`) whose paths match any of the glob patterns."""
+		import fnmatch
+		for entry in self.iter_entries():
+			if any(fnmatch.fnmatchcase(entry[0], pattern) for pattern in patterns):
+				yield entry
 
-		if not any(content) or len(content) > 2:
+	def _split_line(self, line: str) -> tuple:
+		"""Split the line read and return the file's name, hash sum, size and hashtype (or None) inside a tuple."""
+		if ') = ' in line and ' (' in line:
+			head, _, tail = line.rpartition(') = ')
+			tag, _, name = head.partition(' (')
+			content = tail.split()
+			hashtype = get_name_from_tag(tag.strip())
+			if hashtype is None or not any(content) or len(content) > 2 or not content[-1].isdigit() and len(content) == 2:
+				raise IndexError()
+			return (name, content[0], int(content[1]) if len(content) == 2 else None, hashtype)
+
+		hashsum, _, rest = line.strip().partition(' ')
+		if not rest.strip():
 			raise IndexError()
-		else:
-			return (content[1], content[0])
+		elif rest.startswith(' '):
+			# ``HASH  NAME``, as written by sha256sum, whose names can start with a number and a space.
+			return (rest[1:], hashsum, None, None)
+		# ``HASH SIZE NAME``, only written by shazam, else ``HASH NAME``, whose names can have spaces too.
+		size, _, name = rest.partition(' ')
+		if size.isdigit() and name:
+			return (name, hashsum, int(size), None)
+		return (rest, hashsum, None, None)
+
+
+# Options used by `File.gen_data` inside the worker processes, set by `_init_worker_process`.
+_worker_read_options = {}
+
+
+def _init_worker_process(read_options: dict) -> None:
+	"""Initializes one worker process of the pool with its own reading options, whose limiter is only
+	created here from its 'max_rate', as a lock can't be pickled for the spawned processes. The interruptions
+	(Ctrl+C) are handled by the main process only, which stops the workers (e.g. the daemon's)."""
+	import signal
+	signal.signal(signal.SIGINT, signal.SIG_IGN)
+	read_options = dict(read_options)
+	max_rate = read_options.pop('max_rate')
+	read_options['limiter'] = RateLimiter(max_rate) if max_rate else None
+	_worker_read_options.update(read_options)
+
+
+def _hash_file_data(file: File, hashtypes: tuple, generated_data: Iterable, read_options: dict,
+	stats: RunStats = None, tree_jobs: int = 1) -> None:
+	"""Calculates the hash sums of the file, the ones of the hash tree hashtypes are calculated apart,
+	with `tree_jobs` threads, the others with the generated data, which is only read if needed."""
+	hashtypes_of_data = tuple(hashtype for hashtype in hashtypes if not is_tree_hashtype(hashtype))
+	if any(hashtypes_of_data):
+		file.update_many_data(hashtypes_of_data, generated_data, stats)
+	for hashtype in hashtypes:
+		if is_tree_hashtype(hashtype):
+			file.update_tree_data(hashtype, tree_jobs, read_options['limiter'], read_options['buffer_size'])
+
+
+def _hash_file_worker(filename: str, hashtypes: tuple, read_options: dict = None, measure: bool = False) -> tuple:
+	"""Calculates the hash sums of one file inside a worker of the pool, returns a dict with the
+	hexadecimal hash sums by hashtype, a dict with the ones of the segments by hash tree hashtype,
+	the seconds spent calculating them and, if `measure` is True, the measurements of the reading
+	and hashing times (see `RunStats.to_dict`)."""
+	start = monotonic()
+	stats = RunStats() if measure else None
+	read_options = _worker_read_options if read_options is None else read_options
+	file = File(filename)
+	_hash_file_data(file, hashtypes, file.gen_data(bar_anim=False, **read_options), read_options, stats)
+	hashsums = {hashtype: file.get_hashsum(hashtype) for hashtype in hashtypes}
+	segments = {hashtype: file.get_segment_sums(hashtype) for hashtype in hashtypes if is_tree_hashtype(hashtype)}
+	return hashsums, segments, monotonic() - start, stats.to_dict() if measure else None
+
+
+def make_record(file: File, hashtype: str, status: str) -> dict:
+	"""Returns the record of the file's result, printed as one line by the jsonl output (see `api.Result`)."""
+	file_stat = file.get_stat()
+	seconds = file.get_hash_time()
+	size = file_stat.st_size if file_stat else None
+	error = file.get_read_error()
+	record = {
+		'path': file.get_fullpath(),
+		'algorithm': hashtype,
+		'expected': file.get_given_sum() or None,
+		'actual': file.get_hashsum(hashtype) if status not in ('missing', 'unreadable') else None,
+		'status': status,
+		'size': size,
+		'expected_size': file.get_given_size(),
+		'seconds': round(seconds or 0.0, 6),
+		'bytes_per_s': round(size / seconds, 1) if seconds and size is not None else None,
+		'cached': seconds is None and status not in ('missing', 'unreadable') and not file.has_wrong_size(),
+		'error': (error.strerror or str(error)) if error is not None else None,
+	}
+	if is_tree_hashtype(hashtype):
+		corrupt_ranges = file.get_corrupt_ranges(hashtype) if status == 'failed' else None
+		record['corrupt_ranges'] = [list(r) for r in corrupt_ranges] if corrupt_ranges is not None else None
+	return record
+
+
+def dump_record(file: File, hashtype: str, status: str) -> str:
+	"""Returns the record of the file's result (see `make_record`) as one line of JSON."""
+	import json
+	return json.dumps(make_record(file, hashtype, status))
 
 
 class Process(object):
-	# When lower is the sleep value, faster will be the reading,
-	# but it will increase the CPU usage, it can be changed to
-	# improve the performance.
-	SLEEP_VALUE = 1e-7
 	# List of all supported hash sums:
 	HASHTYPES_LIST = ["md5", "sha1", "sha224", "sha256", "sha384", "sha512"]
+	# List of the hash tree sums, whose files are hashed by segments, in parallel (see `File.update_tree_data`):
+	TREE_HASHTYPES_LIST = [hashtype + File.TREE_SUFFIX for hashtype in HASHTYPES_LIST]
+	# The hash sums of the segments of the files are written beside the manifests
+	# of hash tree sums, in a file with the same name plus this extension.
+	SEGMENTS_EXTENSION = '.segments'
+	# The stat signatures of the listed files (see `get_stat_signature`) are written beside the manifests, in
+	# a file with the same name plus this extension, so `Process.update` doesn't read the unchanged ones again.
+	STAT_EXTENSION = '.stat'
+	# Kinds of worker pools that can be used for hashing the files in parallel, the 'async' one
+	# reads the files with a pool of threads while the data already read is hashed by asyncio.
+	EXECUTORS = ["thread", "process", "async"]
+	# Ways of printing the results: 'human' for reading them in a terminal, 'porcelain' for
+	# scripts, plain lines without colors, progress bars or animations, and 'jsonl' for
+	# programs, one JSON record per file and hashtype (see `make_record`).
+	OUTPUTS = ["human", "porcelain", "jsonl"]
+	# Number of files submitted to the pool per worker, by default, it bounds the
+	# memory used while keeping all workers busy.
+	FILES_PER_WORKER = 4
+	# Only this many bytes from the start of the files with the same size are hashed, for finding
+	# which of them may be duplicates, before hashing them entirely (see `Process.duplicates`).
+	DUPES_PARTIAL_SIZE = 64 * 1024
+	# Number of files sent at once to the daemon which hashes them (see `server.Daemon`).
+	DAEMON_BATCH_SIZE = 1000
+
+	def __init__(self, jobs: int = 1, executor: str = 'thread', max_rate: int = None, buffer_size: int = None,
+		io_mode: str = 'auto', cache: DigestCache = None, in_flight: int = None, output: str = 'human',
+		progress: bool = None, stats: RunStats = None, daemon=None):
+		"""`jobs` files are hashed at the same time (0 means one per cpu core) by the pool of the `executor` (see
+		`Process.EXECUTORS`), with at most `in_flight` of them hashed or read ahead (None means `Process.FILES_PER_WORKER`
+		per job). `max_rate` (in bytes per second, for all jobs), `buffer_size` and `io_mode` set how the files are
+		read (see `File.gen_data`). The hash sums are kept in the `cache`, printed as the `output` (see `Process.OUTPUTS`), with
+		progress bars if `progress` (None means in a terminal), measured by `stats`, and hashed by the `daemon`, a
+		`server.Client`, if it is given. Raises `InputError` for negative jobs, or less than one file in flight."""
+		if jobs < 0:
+			raise InputError(f'the number of jobs can\'t be negative, not {jobs}!')
+		if in_flight is not None and in_flight < 1:
+			raise InputError(f'the number of files in flight must be at least 1, not {in_flight}!')
+		self._jobs = jobs if jobs > 0 else (os.cpu_count() or 1)
+		self._executor = executor
+		self._in_flight = in_flight or self._jobs * Process.FILES_PER_WORKER
+		# Options given to every `File.gen_data` call, this is the only place where
+		# the reading of the files is configured.
+		self._read_options = {
+			'limiter': RateLimiter(max_rate) if max_rate else None,
+			'buffer_size': buffer_size,
+			'io_mode': io_mode
+		}
+		self._cache = cache
+		self._output = output
+		self._progress = (is_terminal() if progress is None else progress) and output == 'human'
+		self._stats = stats
+		self._daemon = daemon
+
+	def close(self) -> None:
+		"""Saves the cached hash sums."""
+		if self._cache is not None:
+			self._cache.close()
+		if self._daemon is not None:
+			self._daemon.close()
+
+	def get_output(self) -> str:
+		"""Returns how the results are printed, see `Process.OUTPUTS`."""
+		return self._output
+
+	def print_cache_stats(self) -> None:
+		"""Prints how many hash sums were found in the cache and how many had to be calculated."""
+		if self._output != 'human':
+			return
+		if self._cache is not None and self._cache.hits + self._cache.misses > 0:
+			hits, misses = self._cache.hits, self._cache.misses
+			print(f"\ncache: {hits} hit{'s' if hits != 1 else ''}, {misses} miss{'es' if misses != 1 else ''}")
+
+	def print_stats(self) -> None:
+		"""Prints where the time was spent to the standard error, if it was measured."""
+		if self._stats is not None:
+			for line in self._stats.report(self._cache):
+				print(line, file=sys.stderr)
+
+	def _timer(self, phase: str):
+		"""Returns a context manager measuring the time spent inside it in the phase (see `RunStats`)."""
+		return self._stats.timer(phase) if self._stats is not None else contextlib.nullcontext()
+
+	def _load_cached(self, file: File, hashtypes: tuple) -> tuple:
+		"""Sets on the file its cached hash sums, returns the file's cache key and
+		the hashtypes whose hash sums still must be calculated, none if the file
+		is already known to be modified by its size."""
+		if file.has_wrong_size():
+			return None, ()
+		if self._cache is None:
+			return None, hashtypes
+		with self._timer('cache'):
+			key = self._cache.get_key(file.get_fullpath(), file.get_stat())
+			if key is None:
+				return None, hashtypes
+			cached = {}
+			for hashtype in hashtypes:
+				# The hash sums of the segments aren't cached, so the hash tree ones are only stored (see `_store_cached`).
+				hashsum = self._cache.get(key, hashtype) if not is_tree_hashtype(hashtype) else None
+				if hashsum is not None:
+					cached[hashtype] = hashsum
+			file.set_hashsums(cached)
+		return key, tuple(hashtype for hashtype in hashtypes if hashtype not in cached)
+
+	def _store_cached(self, file: File, key: tuple, hashtypes: tuple) -> None:
+		"""Stores the calculated hash sums of the file in the cache, also the hash tree ones, which are only
+		looked up by `Process.update`, as the manifest has the hash sums of their segments."""
+		if self._cache is not None and key is not None:
+			for hashtype in hashtypes:
+				self._cache.put(key, hashtype, file.get_hashsum(hashtype))
+
+	def _gen_data(self, file: File, bar_anim: bool = True) -> Generator:
+		return file.gen_data(bar_anim=bar_anim, **self._read_options)
+
+	def _worker_process_read_options(self) -> dict:
+		"""Returns the reading options of each worker process (see `_init_worker_process`), which
+		can't share the limiter, so the maximum rate is split between them."""
+		options = dict(self._read_options)
+		limiter = options.pop('limiter')
+		options['max_rate'] = max(limiter.get_rate() // self._jobs, 1) if limiter is not None else None
+		return options
+
+	def iter_hashed(self, files: Iterable, hashtypes: Iterable, unreadable: list = None) -> Generator:
+		"""Yields the files, in the same order, as soon as their hash sums of the hashtypes are calculated,
+		without printing anything (see `_iter_hashed`). Used by the library functions of the `api` module."""
+		return self._iter_hashed(files, hashtypes, bar_anim=False, unreadable=unreadable)
+
+	def _iter_hashed(self, files: Iterable, hashtypes: Iterable, bar_anim: bool = True, unreadable: list = None) -> Generator:
+		"""Calculates the hash sums of the given hashtypes of the files and yields each file,
+		in the same order they were given, as soon as its hash sums are available. The files
+		can be lazily generated, they are consumed as they are hashed.
+
+		The hard links of one file (see `File.get_link_key`) are read only once, the others get
+		the hash sums of the first one. The files which fail to be opened or read are appended
+		to `unreadable` instead of being yielded, if it is given, else the `OSError` is raised."""
+		hashtypes = tuple(hashtypes)
+		# The files in the order they were given, each one with the first of its hard links
+		# (None for the first ones and the files without hard links), until they are yielded.
+		pending = deque()
+		first_links = {}
+
+		def gen_first_links():
+			for file in files:
+				key = file.get_link_key()
+				first = first_links.get(key) if key is not None else None
+				pending.append((file, first))
+				if first is None:
+					if key is not None:
+						first_links[key] = file
+					yield file
+
+		def gen_linked(until: File = None):
+			"""Yields the pending hard links given before the file (all, if it is None), whose
+			first links were already hashed, or not, if they couldn't be read."""
+			while pending and pending[0][0] is not until:
+				file, first = pending.popleft()
+				if first is None:
+					# It couldn't be read, so it was appended to `unreadable`.
+					continue
+				if all(first.get_hashsum(hashtype) is not None for hashtype in hashtypes):
+					file.copy_hashsums(first, hashtypes)
+					yield file
+				elif unreadable is not None:
+					unreadable.append(file)
+
+		# The hard links of a list of files are found before hashing it, so the progress bar knows how
+		# many files are read.
+		unique_files = list(gen_first_links()) if isinstance(files, (list, tuple)) else gen_first_links()
+		for file in self._iter_hashed_unique(unique_files, hashtypes, bar_anim, unreadable):
+			yield from gen_linked(until=file)
+			pending.popleft()
+			yield file
+		yield from gen_linked()
+
+	def _iter_hashed_unique(self, files: Iterable, hashtypes: tuple, bar_anim: bool = True, unreadable: list = None) -> Generator:
+		"""Calculates the hash sums of the files, as `_iter_hashed`, but reading every given file."""
+		if self._daemon is not None and not any(is_tree_hashtype(hashtype) for hashtype in hashtypes):
+			yield from self._iter_hashed_by_daemon(files, hashtypes, unreadable)
+			return
+		bar_anim = bar_anim and self._progress
+		total = len(files) if isinstance(files, (list, tuple)) else None
+		files = iter(files)
+		first_files = list(islice(files, 2))
+
+		if len(first_files) == 1:
+			# Only one file, so its own progress bar is shown.
+			file = first_files[0]
+			if self._hash_file(file, hashtypes, unreadable, bar_anim=bar_anim):
+				yield file
+			return
+
+		files = chain(first_files, files)
+
+		with progress_bar(total=total, desc='CALCULATING BINARIES', ncols=80, disable=not bar_anim) as bar:
+			if self._executor == 'async' and not any(is_tree_hashtype(hashtype) for hashtype in hashtypes):
+				yield from self._iter_hashed_async(files, hashtypes, bar, unreadable)
+			elif self._jobs == 1:
+				for file in files:
+					hashed = self._hash_file(file, hashtypes, unreadable, bar_anim=False)
+					bar.update()
+					if hashed:
+						yield file
+			else:
+				yield from self._iter_hashed_in_pool(files, hashtypes, bar, unreadable)
+
+	def _hash_file(self, file: File, hashtypes: tuple, unreadable: list, bar_anim: bool) -> bool:
+		"""Calculates the hash sums of the file which aren't cached, returns False if the
+		file couldn't be read (appending it to `unreadable` if it is given)."""
+		key, missing = self._load_cached(file, hashtypes)
+		if any(missing):
+			start = monotonic()
+			try:
+				# Only one file is hashed at a time, so its segments are hashed with one thread per cpu core.
+				_hash_file_data(file, missing, self._gen_data(file, bar_anim=bar_anim), self._read_options,
+					self._stats, tree_jobs=os.cpu_count() or 1)
+			except OSError as error:
+				if unreadable is None:
+					raise
+				file.set_read_error(error)
+				unreadable.append(file)
+				return False
+			file.set_hash_time(monotonic() - start)
+			if self._stats is not None:
+				self._stats.add_file()
+			self._store_cached(file, key, missing)
+		return True
+
+	def _iter_hashed_in_pool(self, files: Iterable, hashtypes: tuple, bar, unreadable: list = None) -> Generator:
+		"""Hashes the files using a pool of workers, keeping a bounded number of them
+		in flight, and yields them in the order they were given."""
+		in_flight = deque()
+		if self._executor == 'process':
+			pool_options = {'initializer': _init_worker_process, 'initargs': (self._worker_process_read_options(),)}
+			read_options = None
+		else:
+			pool_options = {}
+			read_options = self._read_options
+
+		def collect(file: File, key: tuple, missing: tuple, future) -> File:
+			if future is not None:
+				try:
+					hashsums, segments, seconds, measurements = future.result()
+				except OSError as error:
+					if unreadable is None:
+						raise
+					file.set_read_error(error)
+					unreadable.append(file)
+					return None
+				file.set_hashsums(hashsums)
+				for hashtype, segment_sums in segments.items():
+					file.set_segment_sums(hashtype, segment_sums)
+				file.set_hash_time(seconds)
+				if measurements is not None:
+					self._stats.merge(measurements)
+					self._stats.add_file()
+				self._store_cached(file, key, missing)
+			return file
+
+		with self._create_pool(**pool_options) as executor:
+			try:
+				for file in files:
+					key, missing = self._load_cached(file, hashtypes)
+					if any(missing):
+						future = executor.submit(_hash_file_worker, file.get_fullpath(), missing, read_options,
+							self._stats is not None)
+						future.add_done_callback(lambda _: bar.update())
+					else:
+						future = None
+						bar.update()
+					in_flight.append((file, key, missing, future))
+
+					if len(in_flight) >= self._in_flight:
+						file = collect(*in_flight.popleft())
+						if file is not None:
+							yield file
+
+				while in_flight:
+					file = collect(*in_flight.popleft())
+					if file is not None:
+						yield file
+			finally:
+				# When the rest of the files isn't wanted (e.g. the checking stopped), the pool
+				# is closed without waiting for the ones whose hashing didn't start yet.
+				for *_, future in in_flight:
+					if future is not None:
+						future.cancel()
+
+	def _iter_hashed_by_daemon(self, files: Iterable, hashtypes: tuple, unreadable: list = None) -> Generator:
+		"""Hashes the files with the running daemon, sending them by batches of `Process.DAEMON_BATCH_SIZE`,
+		and yields them in the order they were given, as soon as the daemon hashes them."""
+		files = iter(files)
+		while True:
+			batch = list(islice(files, Process.DAEMON_BATCH_SIZE))
+			if not any(batch):
+				break
+			# The files with another size than the given one aren't read at all.
+			paths = [os.path.abspath(file.get_fullpath()) for file in batch if not file.has_wrong_size()]
+			records = self._daemon.hash(paths, hashtypes) if any(paths) else iter(())
+			for file in batch:
+				if file.has_wrong_size():
+					yield file
+					continue
+				try:
+					file_records = [next(records) for _ in hashtypes]
+				except (OSError, StopIteration) as error:
+					raise ShazamError(f'the daemon stopped hashing the files: {str(error) or "no more results"}',
+						error_type='daemon error') from None
+				if file_records[0]['status'] != 'hashed':
+					error = OSError(file_records[0]['error'] or f"{file.get_fullpath()!r} is {file_records[0]['status']}")
+					if unreadable is None:
+						raise error
+					file.set_read_error(error)
+					unreadable.append(file)
+					continue
+				file.set_hashsums({record['algorithm']: record['actual'] for record in file_records})
+				file.set_hash_time(None if file_records[0]['cached'] else file_records[0]['seconds'])
+				yield file
+
+	def _create_pool(self, **pool_options):
+		"""Returns a new pool of `jobs` workers of the kind of executor, the 'async' one uses threads.
+		The pools are imported only when used, because most executions hash the files sequentially."""
+		from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+		pool = ProcessPoolExecutor if self._executor == 'process' else ThreadPoolExecutor
+		return pool(max_workers=self._jobs, **pool_options)
+
+	def _iter_hashed_async(self, files: Iterable, hashtypes: tuple, bar, unreadable: list = None) -> Generator:
+		"""Hashes the files with asyncio, keeping a bounded number of them in flight, whose data is read
+		ahead by a pool of reader threads, so the latency of the disk (or network filesystem) overlaps
+		with the hashing. The files are yielded in the order they were given."""
+		import asyncio
+		loop = asyncio.new_event_loop()
+		readers = self._create_pool()
+		in_flight = deque()
+
+		def collect(file: File, key: tuple, missing: tuple, task) -> File:
+			if task is not None:
+				try:
+					hashsums, seconds = loop.run_until_complete(task)
+				except OSError as error:
+					if unreadable is None:
+						raise
+					file.set_read_error(error)
+					unreadable.append(file)
+					return None
+				file.set_hashsums(hashsums)
+				file.set_hash_time(seconds)
+				if self._stats is not None:
+					self._stats.add_file()
+				self._store_cached(file, key, missing)
+			return file
 
-	def __init__(self):
-		# TODO: Check this init!!
-		pass
+		try:
+			for file in files:
+				key, missing = self._load_cached(file, hashtypes)
+				if any(missing):
+					task = loop.create_task(self._hash_file_async(file, missing, readers))
+					task.add_done_callback(lambda _: bar.update())
+				else:
+					task = None
+					bar.update()
+				in_flight.append((file, key, missing, task))
+
+				if len(in_flight) >= self._in_flight:
+					# While waiting for the oldest file, all the others in flight are also progressing.
+					file = collect(*in_flight.popleft())
+					if file is not None:
+						yield file
+
+			while in_flight:
+				file = collect(*in_flight.popleft())
+				if file is not None:
+					yield file
+		finally:
+			tasks = [task for *_, task in in_flight if task is not None]
+			for task in tasks:
+				task.cancel()
+			if any(tasks):
+				loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+			loop.close()
+			readers.shutdown()
+
+	async def _hash_file_async(self, file: File, hashtypes: tuple, readers) -> dict:
+		"""Calculates the hash sums of the file, reading the next chunk of data in the reader
+		threads (a `ThreadPoolExecutor`) while the current one is hashed, returns the hexadecimal
+		hash sums by hashtype and the seconds spent calculating them."""
+		import asyncio
+		start = monotonic()
+		loop = asyncio.get_running_loop()
+		limiter = self._read_options['limiter']
+		f = await loop.run_in_executor(readers, open, file.get_fullpath(), 'rb', 0)
+
+		stats = self._stats
+
+		def read(buffer: bytearray) -> int:
+			read_start = perf_counter()
+			n = f.readinto(buffer)
+			if limiter is not None and n:
+				limiter.consume(n)
+			if stats is not None:
+				stats.add_read(perf_counter() - read_start, n)
+			return n
+
+		pending = None
+		try:
+			file_stat = await loop.run_in_executor(readers, os.fstat, f.fileno())
+			buffer_size = self._read_options['buffer_size'] or File.get_buffer_size(
+				file_stat.st_size, file_stat.st_blksize)
+			# One buffer is hashed while the other is being filled.
+			buffers = [bytearray(buffer_size), bytearray(buffer_size)]
+			hashers = {hashtype: new_hasher(hashtype) for hashtype in hashtypes}
+
+			pending = loop.run_in_executor(readers, read, buffers[0])
+			while True:
+				n = await pending
+				pending = None
+				if not n:
+					break
+				buffers.reverse()
+				pending = loop.run_in_executor(readers, read, buffers[0])
+				with memoryview(buffers[1]) as view:
+					for hashtype, hasher in hashers.items():
+						digest_start = perf_counter()
+						hasher.update(view[:n])
+						if stats is not None:
+							stats.add_digest(hashtype, perf_counter() - digest_start, n)
+		finally:
+			if pending is not None:
+				# The file can only be closed after the reading in progress finishes.
+				await asyncio.wait([pending])
+			f.close()
+
+		return {hashtype: hasher.hexdigest() for hashtype, hasher in hashers.items()}, monotonic() - start
 
 	def _format_file_result(self, file: File, hashtype: str):
 		if file.checksum(hashtype) is True:
 			prefix = ''
 			color = "green"
 			result = "not modified"
+		elif file.has_wrong_size():
+			prefix = clr("* ", "red")
+			color = "red"
+			result = f"modified!! (its size is {file.get_size()} bytes, not {file.get_given_size()})"
 		else:
 			prefix = clr("* ", "red")
 			color = "red"
 			result = "probably modified!!"
+			corrupt_ranges = file.get_corrupt_ranges(hashtype)
+			if corrupt_ranges:
+				result = "modified!! (bytes " + ", ".join(f"{first}-{last}" for first, last in corrupt_ranges) + ")"
 		return prefix + clr(f'{file.get_fullpath()}', "white") + clr(f" was {result}", color)
 
+	def _print_record(self, file: File, hashtype: str, status: str) -> None:
+		"""Prints the JSON record of the file's result (see `make_record`), flushed at once,
+		so it can be read while the other files are still being hashed."""
+		print(dump_record(file, hashtype, status), flush=True)
+
+	def _print_hashed(self, file: File, hashtypes: Iterable) -> None:
+		"""Prints the calculated hash sums of the file as soon as they are known, except
+		with the human output, where they are printed after all files are hashed."""
+		if self._output == 'porcelain':
+			if len(hashtypes) == 1:
+				# The same lines as `sha256sum`.
+				print(f"{file.get_hashsum(hashtypes[0])}  {file.get_fullpath()}")
+			else:
+				# The same lines as `sha256sum --tag`, one per hash type.
+				for hashtype in hashtypes:
+					print(f"{hashtype.upper()} ({file.get_fullpath()}) = {file.get_hashsum(hashtype)}")
+		elif self._output == 'jsonl':
+			for hashtype in hashtypes:
+				self._print_record(file, hashtype, 'hashed')
+
+	def _print_errors(self, not_found: list, unreadable: list, hashtypes: Iterable, to_exit: bool = False) -> None:
+		"""Prints the files which weren't found or couldn't be read, as records with the jsonl output."""
+		if self._output == 'jsonl':
+			for files, status in ((not_found, 'missing'), (unreadable, 'unreadable')):
+				for file in files:
+					for hashtype in hashtypes:
+						self._print_record(file, hashtype, status)
+			if to_exit and (any(not_found) or any(unreadable)):
+				sys.exit(1)
+			return
+		e = Errors(to_exit=to_exit)
+		if any(not_found):
+			e.files_not_found_error(not_found)
+		if any(unreadable):
+			e.files_not_readable_error(unreadable)
+
+	def _print_check_result(self, file: File, hashtype: str, verbosity: bool):
+		if self._output == 'jsonl':
+			self._print_record(file, hashtype, 'ok' if file.checksum(hashtype) is True else 'failed')
+			return
+		elif self._output == 'porcelain':
+			# The same lines as `sha256sum --check`.
+			print(f"{file.get_fullpath()}: {'OK' if file.checksum(hashtype) is True else 'FAILED'}")
+			return
+		# Written through tqdm, so the results can be shown while a progress bar is running.
+		write_line(f"\n{ ' ┌──' if verbosity else '' } {self._format_file_result(file, hashtype)}")
+		if verbosity:
+			write_line(f" │ ORIGINAL {hashtype.upper()}SUM:  {file.get_given_sum()!r}")
+			write_line(f" │ CURRENT  {hashtype.upper()}SUM:  {file.get_hashsum(hashtype)!r}")
+			write_line(' └──────────────')
+
 	def checkfile(self, file: File, hashtype: str, **kwargs):
 		"""Check and Compare the hash sum."""
-		file_data = kwargs['file_data'] if 'file_data' in kwargs else None
 		bar_anim  = kwargs['bar_anim'] if 'bar_anim' in kwargs else True
 		verbosity = kwargs['verbosity'] if 'verbosity' in kwargs else True
 
-		e = Errors(to_exit=True)
-		if file.exists() is True and file.is_readable() is False:
-			e.files_not_readable_error([file])
-		elif file.exists() is False:
-			e.files_not_found_error([file])
+		if file.exists() is False:
+			self._print_errors([file], [], (hashtype,), to_exit=True)
+		elif file.is_dir() is True:
+			self._print_errors([], [file], (hashtype,), to_exit=True)
 		else:
 			pass
 
-		file.update_data(hashtype=hashtype,
-			generated_data=file_data or file.gen_data(bar_anim=bar_anim))
-		print(f"\n{ ' ┌──' if verbosity else '' } {self._format_file_result(file, hashtype)}")
-		if verbosity:
-			print(f" │ ORIGINAL {hashtype.upper()}SUM:  {file.get_given_sum()!r}")
-			print(f" │ CURRENT  {hashtype.upper()}SUM:  {file.get_hashsum(hashtype)!r}")
-			print(' └──────────────')
-
-	def calculate_hash_sum(self, files: Iterable, hashtype: str, verbosity: bool = True):
-		"""Calculates and prints the file's hash sum."""
-		found, not_found, unreadable = self._analyse_files(files)
-
-		if any(found):
-			if len(found) == 1:
-				file = found[0]
-				file.update_data(hashtype, file.gen_data(bar_anim=True))
+		unreadable = []
+		for _ in self._iter_hashed([file], (hashtype,), bar_anim=bar_anim, unreadable=unreadable):
+			pass
+		if any(unreadable):
+			self._print_errors([], unreadable, (hashtype,), to_exit=True)
+		with self._timer('output'):
+			self._print_check_result(file, hashtype, verbosity)
+
+	def calculate_hash_sum(self, files: Iterable, hashtype: str, verbosity: bool = True) -> list:
+		"""Calculates and prints the file's hash sum, returns the files which were hashed."""
+		not_found, unreadable = [], []
+		found = []
+		for file in self._iter_hashed(self._find_files(files, not_found, unreadable), (hashtype,), unreadable=unreadable):
+			found.append(file)
+			if verbosity:
+				with self._timer('output'):
+					self._print_hashed(file, (hashtype,))
+
+		if any(found) and self._output == 'human':
+			with self._timer('output'):
 				print()
 				if verbosity:
-					print(f"{file.get_hashsum(hashtype)} {file.get_fullpath()}")
-			else:
-				for file in tqdm(found, desc='CALCULATING BINARIES', ncols=80):
-					file.update_data(hashtype, file.gen_data(bar_anim=False))
-
-				if verbosity:
-					print()
 					for file in found:
 						print(f"{file.get_hashsum(hashtype)} {file.get_fullpath()}")
 
-			if any(not_found) or any(unreadable):
-				print()  # Skip one line
-
-		e = Errors(to_exit=False)
-		if any(not_found):
-			e.files_not_found_error(not_found)
-		if any(unreadable):
-			e.files_not_readable_error(unreadable)
-
-	def checkfiles(self, files: Iterable, hashtype: str, verbosity=False):
-		"""Checks and compare the hash sums of more than one files."""
-		found, not_found, unreadable = self._analyse_files(files)
-
-		if any(found) and len(found) == 1:
-			self.checkfile(found[0], hashtype, verbosity=verbosity)
-		elif any(found):
-			storedData = []
-			for file in tqdm(found, desc='CALCULATING BINARIES', ncols=80):
-				if verbosity is False:
-					file.update_data(
-						hashtype=hashtype,
-						generated_data=file.gen_data(bar_anim=False))
-				elif verbosity is True:
-					storedData.append(list(file.gen_data(bar_anim=False)))
+				if any(not_found) or any(unreadable):
+					print()  # Skip one line
+
+		self._print_errors(not_found, unreadable, (hashtype,))
+
+		return found
+
+	def checkfiles(self, files: Iterable, hashtype: str, verbosity=False, fail_fast: bool = False, results=None):
+		"""Checks and compare the hash sums of more than one files. The files can be lazily
+		generated, each result is printed as soon as it is known, in the given order.
+		If `fail_fast` is True, the program exits (with 1) at the first file which was modified,
+		not found or unreadable, without checking the others. `results`, if given, is a file where
+		the JSON record of each result is also written, one per line (see `make_record`)."""
+		if not isinstance(verbosity, bool):
+			e = Errors(to_exit=True, error_type='internal funtion call error')
+			e.print_error('verbosity in function checkfiles from common.py must be bool (True or False)!')
+
+		not_found, unreadable = [], []
+		n_found = 0
+		modified = False
+		for file in self._iter_hashed(self._find_files(files, not_found, unreadable), (hashtype,), unreadable=unreadable):
+			with self._timer('output'):
+				if verbosity is True or self._output != 'human':
+					self._print_check_result(file, hashtype, verbosity)
 				else:
-					e = Errors(to_exit=True, error_type='internal funtion call error')
-					e.print_error('verbosity in function checkfiles from common.py must be bool (True or False)!')
-
-			if verbosity is True:
-				for file, file_data in zip(found, storedData):
-					self.checkfile(file, hashtype, file_data=file_data, bar_anim=False)
-				print('') # new line at the end
+					if n_found == 0:
+						write_line('')
+					write_line(self._format_file_result(file, hashtype))
+			if results is not None:
+				status = 'ok' if file.checksum(hashtype) is True else 'failed'
+				results.write(dump_record(file, hashtype, status) + '\n')
+			n_found += 1
+			modified = modified or file.checksum(hashtype) is not True
+			if fail_fast and (modified or any(not_found) or any(unreadable)):
+				break
+
+		if n_found > 0 and self._output == 'human':
+			print('') # new line at the end
+
+		if results is not None:
+			for failed, status in ((not_found, 'missing'), (unreadable, 'unreadable')):
+				for file in failed:
+					results.write(dump_record(file, hashtype, status) + '\n')
+
+		self._print_errors(not_found, unreadable, (hashtype,))
+
+		if fail_fast and (modified or any(not_found) or any(unreadable)):
+			if self._output == 'human':
+				e = Errors(to_exit=True, error_type='check error')
+				e.print_error('stopped at the first file which was modified, not found or unreadable!')
+			sys.exit(1)
+
+	def totalcheck(self, files: Iterable, hashtypes: Iterable = None) -> list:
+		"""Print the hash sums of the given hashtypes (all supported by default) of the files,
+		each file is read only once, whatever the number of hashtypes. Returns the files which
+		were hashed."""
+		hashtypes = list(hashtypes or Process.HASHTYPES_LIST)
+		not_found, unreadable = [], []
+		found = []
+		for file in self._iter_hashed(self._find_files(files, not_found, unreadable), hashtypes, unreadable=unreadable):
+			found.append(file)
+			with self._timer('output'):
+				self._print_hashed(file, hashtypes)
+
+		if any(found) and self._output == 'human':
+			with self._timer('output'):
+				print('\n')
+
+				for n, file in enumerate(found):
+					if n > 0:
+						print("\n")
+
+					print(f" ┌── {file.get_fullname()!r}")
+					for hashtype in hashtypes:
+						print(f" │ {hashtype}: {file.get_hashsum(hashtype)} {file.get_fullpath()}")
+					print(' └────────────────────')
+
+		self._print_errors(not_found, unreadable, hashtypes)
+
+		return found
+
+	def _gen_partial_sums(self, files: Iterable, hashtype: str, unreadable: list) -> Generator:
+		"""Yields each file with the hash sum of its first `Process.DUPES_PARTIAL_SIZE` bytes,
+		appending the files which can't be read to `unreadable`. They are read as the others (e.g. limited by
+		`max_rate`), but never memory-mapped, as only one buffer of data is needed."""
+		# The segments don't matter here, so the hash tree hashtypes use their algorithm.
+		algorithm = hashtype[:-len(File.TREE_SUFFIX)] if is_tree_hashtype(hashtype) else hashtype
+		read_options = dict(self._read_options, buffer_size=Process.DUPES_PARTIAL_SIZE, io_mode='read')
+		for file in files:
+			hasher = new_hasher(algorithm)
+			remaining = Process.DUPES_PARTIAL_SIZE
+			try:
+				with self._timer('read'), contextlib.closing(file.gen_data(bar_anim=False, **read_options)) as chunks:
+					for chunk in chunks:
+						hasher.update(chunk[:remaining])
+						remaining -= len(chunk)
+						if remaining <= 0:
+							break
+			except OSError as error:
+				file.set_read_error(error)
+				unreadable.append(file)
+				continue
+			yield file, hasher.digest()
+
+	def find_duplicates(self, files: Iterable, hashtype: str, not_found: list = None, unreadable: list = None) -> list:
+		"""Returns the groups of files with the same data, as lists of files, with their hash sums of the
+		hashtype. Only the files with the same size as others are read, first only their starting bytes
+		(see `Process.DUPES_PARTIAL_SIZE`), and entirely only when those are the same as the ones of others.
+		The hard links of one file are read once and are always in the same group.
+
+		The files which weren't found or couldn't be read are appended to `not_found` and `unreadable`."""
+		not_found = not_found if not_found is not None else []
+		unreadable = unreadable if unreadable is not None else []
+		by_size = {}
+		for file in self._find_files(files, not_found, unreadable):
+			if stat.S_ISREG(file.get_stat().st_mode):
+				by_size.setdefault(file.get_size(), []).append(file)
+
+		candidates = []
+		for size, group in by_size.items():
+			if len(group) < 2:
+				continue
+			# The hard links of one file are surely the same, so only the first one is read.
+			links = {}
+			for file in group:
+				links.setdefault(file.get_link_key() or id(file), []).append(file)
+			if size <= Process.DUPES_PARTIAL_SIZE or len(links) < 2:
+				candidates += group
+				continue
+			by_partial = {}
+			first_links = (linked[0] for linked in links.values())
+			for file, partial in self._gen_partial_sums(first_links, hashtype, unreadable):
+				by_partial.setdefault(partial, []).extend(links[file.get_link_key() or id(file)])
+			candidates += chain.from_iterable(linked for linked in by_partial.values() if len(linked) > 1)
+
+		by_hashsum = {}
+		for file in self._iter_hashed(candidates, (hashtype,), bar_anim=True, unreadable=unreadable):
+			by_hashsum.setdefault((file.get_size(), file.get_hashsum(hashtype)), []).append(file)
+		return [group for group in by_hashsum.values() if len(group) > 1]
+
+	def duplicates(self, files: Iterable, hashtype: str) -> list:
+		"""Finds and prints the groups of duplicated files (see `Process.find_duplicates`),
+		with the space they are wasting, returns the groups."""
+		not_found, unreadable = [], []
+		groups = self.find_duplicates(files, hashtype, not_found, unreadable)
+
+		with self._timer('output'):
+			if self._output == 'jsonl':
+				import json
+				for group in groups:
+					print(json.dumps({
+						'algorithm': hashtype,
+						'digest': group[0].get_hashsum(hashtype),
+						'size': group[0].get_size(),
+						'paths': [file.get_fullpath() for file in group],
+					}), flush=True)
+			elif self._output == 'porcelain':
+				# The same lines as `fdupes`: the paths of each group, and an empty line after it.
+				for group in groups:
+					for file in group:
+						print(file.get_fullpath())
+					print()
 			else:
-				print('') # new line at the end
-				for file in found:
-					print(self._format_file_result(file, hashtype))
-
-
-		e = Errors(to_exit=False)
-		if any(not_found) or any(unreadable):
-			print('')
-			e.files_not_found_error(not_found)
-			e.files_not_readable_error(unreadable)
-
-	def totalcheck(self, files: Iterable):
-		"""Print all supported hash sums of one file."""
-		found, not_found, unreadable = self._analyse_files(files)
-
-		if any(found):
-			generated_datas = [
-				tuple(file.gen_data(bar_anim=False)) for file in tqdm(found, ncols=71, desc='Calculating Binaries')
-			]
-
-			def update_generator():
-				for file, generated_data in zip(found, generated_datas):
-					for hashtype in file._hlist.keys():
-						file.update_data(hashtype, generated_data)
-						sleep(Process.SLEEP_VALUE)
-						yield
-
-			ug = update_generator()
-			n_found = len(found)
-
-			for _ in tqdm(range(len(found[0]._hlist.keys())*n_found), ncols=75, desc='Getting Hash Sums'):
-				next(ug)
-			print('\n')
+				wasted = 0
+				for group in groups:
+					# The hard links of one file don't waste any space.
+					copies = len({file.get_link_key() or id(file) for file in group}) - 1
+					wasted += copies * group[0].get_size()
+					print(f"\n ┌── {len(group)} files of {format_size(group[0].get_size())} "
+						f"({hashtype}: {group[0].get_hashsum(hashtype)})")
+					for file in group:
+						print(f" │ {file.get_fullpath()}")
+					print(' └────────────────────')
+				n_files = sum(len(group) for group in groups)
+				print(f"\n{n_files} duplicated files in {len(groups)} groups, {format_size(wasted)} could be saved")
+				if any(not_found) or any(unreadable):
+					print()
 
-			for n, file in enumerate(found):
-				if n > 0 and n < n_found:
-					print("\n")
+		self._print_errors(not_found, unreadable, (hashtype,))
+		return groups
 
-				print(f" ┌── {file.get_fullname()!r}")
-				for hashtype in file._hlist.keys():
-					print(f" │ {hashtype}: {file.get_hashsum(hashtype)} {file.get_fullpath()}")
-				print(' └────────────────────')
+	def _find_files(self, files: Iterable, not_found: list, unreadable: list) -> Iterable:
+		"""Returns the files which exist and aren't directories, appending the others to `not_found`
+		or `unreadable`, with one `os.stat` per file. The files which can't be opened are only found
+		when they are hashed. A list is returned when a list is given, else the files are lazily generated."""
+		def generate():
+			for file in files:
+				with self._timer('probe'):
+					exists = file.exists()
+					is_dir = exists and file.is_dir()
+				if not exists:
+					not_found.append(file)
+				elif is_dir:
+					unreadable.append(file)
+				else:
+					yield file
 
-		e = Errors(to_exit=False)
-		if any(not_found) or any(unreadable):
-			e.files_not_found_error(not_found)
-			e.files_not_readable_error(unreadable)
+		return list(generate()) if isinstance(files, list) else generate()
 
 	def _analyse_files(self, files: Iterable):
-		not_found = [file for file in files if not file.exists()]
-		unreadable = [file for file in files if file not in not_found and not file.is_readable()]
-		readable = [file for file in files if file not in unreadable and file not in not_found]
+		not_found, unreadable = [], []
+		readable = list(self._find_files(files, not_found, unreadable))
 
 		return readable, not_found, unreadable
 
-	def write(self, files: Iterable, hashtype: str, name: str = None):
+	def _write_manifest(self, filename: str, entries: Iterable, hashtype: str, sizes: bool = False,
+		tag: bool = False, stats: dict = None) -> None:
+		"""Writes the entries, ``(name, hash sum, size, segment hash sums)`` tuples, into the manifest, atomically,
+		with their sizes if `sizes` is True (and the size is known), and tagged with the hashtype if `tag` is True
+		or the hashtype can't be known by the length of its hash sums (see `TextFile.iter_entries`). The
+		hash sums of the segments of the files are written beside the manifest of a hash tree hashtype (see
+		`Process.SEGMENTS_EXTENSION`), and the `os.stat_result` of the hashed files, by name, in `stats`,
+		beside any manifest (see `Process.STAT_EXTENSION`)."""
+		entries = list(entries)
+		if stats is not None:
+			self._write_stat_signatures(filename + Process.STAT_EXTENSION, stats)
+		if is_tree_hashtype(hashtype):
+			segments_filename = filename + Process.SEGMENTS_EXTENSION
+			try:
+				write_atomically(segments_filename, (
+					f"{','.join(segments or ())} {name}\n" for name, _, _, segments in entries))
+			except OSError as err:
+				e = Errors(to_exit=True, error_type='save error')
+				e.print_error(f'{segments_filename!r} could not be written: {err.strerror}!')
+
+		def format_line(name: str, hashsum: str, size) -> str:
+			size = size if sizes is True else None
+			if tag is True or get_hashtype_from_string_length('0' * get_hashsum_length(hashtype)) != hashtype:
+				return f"{hashtype.upper()} ({name}) = {hashsum}" + (f" {size}" if size is not None else "") + "\n"
+			elif size is not None:
+				return f"{hashsum} {size} {name}\n"
+			# As sha256sum, so a name starting with a number and a space isn't read as a size.
+			return f"{hashsum}  {name}\n"
+
+		lines = (format_line(name, hashsum, size) for name, hashsum, size, _ in entries)
+		try:
+			write_atomically(filename, lines)
+		except OSError as err:
+			e = Errors(to_exit=True, error_type='save error')
+			e.print_error(f'{filename!r} could not be written: {err.strerror}!')
+
+	def _write_stat_signatures(self, filename: str, stats: dict) -> None:
+		"""Writes the stat signatures of the files (see `load_stat_signatures`), but the ones modified too recently
+		for trusting them (see `cache.DigestCache.RACY_WINDOW_NS`), which are then read by the next update."""
+		now = time_ns()
+		lines = (
+			' '.join(str(number) for number in get_stat_signature(file_stat)) + f' {name}\n'
+			for name, file_stat in stats.items()
+			if now - max(file_stat.st_mtime_ns, file_stat.st_ctime_ns) >= DigestCache.RACY_WINDOW_NS
+		)
+		try:
+			write_atomically(filename, lines)
+		except OSError:
+			# It only spares reading the unchanged files again.
+			pass
+
+	def write(self, files: Iterable, hashtype: str, name: str = None, sizes: bool = False, tag: bool = False):
+		"""Writes the hash sums of the files into a manifest, with their sizes if `sizes` is True,
+		tagged with the hashtype if `tag` is True (see `Process._write_manifest`)."""
 		found, _, _ = self._analyse_files(files)
 
 		if len(found) != 0:
 			filename = name or (hashtype + 'sum.txt')
-			with open(filename, 'wt') as txt:
-				for file in found:
-					txt.write(f"{file.get_hashsum(hashtype)} {file.get_fullpath()}\n")
-			animate(f"\nFile {filename!r} was created!", secs=0.045)
+			self._write_manifest(filename, (
+				(file.get_fullpath(), file.get_hashsum(hashtype), file.get_size(), file.get_segment_sums(hashtype))
+				for file in found), hashtype, sizes, tag, {file.get_fullpath(): file.get_stat() for file in found})
+			if self._output == 'human':
+				animate(f"\nFile {filename!r} was created!", secs=0.045)
 		else:
 			e = Errors('save error')
 			e.print_error('there are no avaliable files for saving hash sums!')
+
+	def _is_unchanged(self, file: File, hashtype: str, segments: list = None, signature: tuple = None) -> bool:
+		"""Returns if the file still has its given hash sum of the hashtype, as its stat `signature` written by the
+		last update (see `Process.STAT_EXTENSION`) is unchanged, or its given hash sum is the one cached for its
+		current state (see `cache.DigestCache`), so it isn't read again. The given hash sum (and the `segments`
+		of the hash tree ones, which must be given) are then set as the calculated ones."""
+		if file.has_wrong_size() or (is_tree_hashtype(hashtype) and segments is None):
+			return False
+		if signature is None or get_stat_signature(file.get_stat()) != signature:
+			if self._cache is None:
+				return False
+			with self._timer('cache'):
+				key = self._cache.get_key(file.get_fullpath(), file.get_stat())
+				if key is None or self._cache.get(key, hashtype) != file.get_given_sum():
+					return False
+		file.set_hashsums({hashtype: file.get_given_sum()})
+		if is_tree_hashtype(hashtype):
+			file.set_segment_sums(hashtype, segments)
+		return True
+
+	def update(self, manifest: str, files: Iterable, hashtype: str, sizes: bool = False, tag: bool = False,
+		prune: bool = False) -> list:
+		"""Updates the manifest (a file with the hash sums of the hashtype, as written by `write`)
+		with the given files, which are added to it if they are new. The listed paths are relative to
+		the manifest's directory, and so are the new ones written. Only the new files and the listed ones
+		which changed since the manifest was written (see `Process._is_unchanged`) are hashed. The listed
+		files which weren't found keep their entries, unless `prune` is True, and so do the ones which
+		couldn't be read. The manifest is written atomically, also created if it doesn't exist, with the
+		sizes of the files if `sizes` is True or it already had them, and tagged if `tag` is True or it
+		already was. Returns the written entries (see `Process._write_manifest`), and exits with 1 after
+		writing them if some given file wasn't found or some file couldn't be read."""
+		directory = os.path.dirname(manifest)
+		# The files listed or given, by absolute path, and the names written for them.
+		listed = {}
+		names = {}
+		segments = load_manifest_segments(manifest, hashtype)
+		signatures = load_stat_signatures(manifest + Process.STAT_EXTENSION)
+		if os.path.exists(manifest):
+			for filename, hashsum, size, entry_hashtype in TextFile(manifest).iter_entries():
+				if (entry_hashtype or hashtype) != hashtype or len(hashsum) != get_hashsum_length(hashtype):
+					e = Errors(to_exit=True, error_type='input error')
+					e.print_error(f'{manifest!r} does not have {hashtype} hash sums!')
+				sizes = sizes or size is not None
+				tag = tag or entry_hashtype is not None
+				file = File(os.path.join(directory, filename), hashsum, given_size=size)
+				if listed.setdefault(os.path.abspath(file.get_fullpath()), file) is file:
+					names[file] = filename
+		manifest_path = os.path.abspath(manifest)
+		for file in files:
+			path = os.path.abspath(file.get_fullpath())
+			if path not in listed and path != manifest_path:
+				listed[path] = file
+				relative = directory and not os.path.isabs(file.get_fullpath())
+				names[file] = os.path.relpath(file.get_fullpath(), directory) if relative else file.get_fullpath()
+
+		# The entries are kept in their order, the new files are added at the end.
+		not_found, unreadable = [], []
+		changed = []
+		stats = {}
+		for file in self._find_files(list(listed.values()), not_found, unreadable):
+			name = names[file]
+			if file.get_given_sum() and self._is_unchanged(file, hashtype, segments.get(name), signatures.get(name)):
+				stats[name] = file.get_stat()
+			else:
+				# Without the old hash sum and size, which aren't the expected ones anymore.
+				changed.append(File(file.get_fullpath(), stat_result=file.get_stat()))
+		n_unchanged = len(stats)
+
+		hashed = {}
+		for file in self._iter_hashed(changed, (hashtype,), unreadable=unreadable):
+			hashed[file.get_fullpath()] = file
+			with self._timer('output'):
+				self._print_hashed(file, (hashtype,))
+
+		# The listed files which weren't found are only dropped when pruned, the given ones are errors.
+		missing = [file for file in not_found if file.get_given_sum()]
+		not_found = [file for file in not_found if not file.get_given_sum()]
+		entries = []
+		for file in listed.values():
+			name = names[file]
+			file = hashed.get(file.get_fullpath(), file)
+			if file.get_hashsum(hashtype) is not None:
+				entries.append((name, file.get_hashsum(hashtype), file.get_size(), file.get_segment_sums(hashtype)))
+				stats[name] = file.get_stat()
+			elif file.get_given_sum() and not (prune and file in missing):
+				# Kept as it was listed, as it couldn't be hashed.
+				entries.append((name, file.get_given_sum(), file.get_given_size(), segments.get(name)))
+
+		self._write_manifest(manifest, entries, hashtype, sizes, tag, stats)
+		if self._output == 'human':
+			print(f"\n{n_unchanged} unchanged, {len(hashed)} hashed, {len(missing) if prune else 0} removed")
+			if any(missing) and not prune:
+				print(f"{len(missing)} listed files were not found, their entries were kept, drop them with --prune")
+			animate(f"\nFile {manifest!r} was updated!", secs=0.045)
+		elif self._output == 'jsonl':
+			self._print_errors(missing, [], (hashtype,))
+		self._print_errors(not_found, unreadable, (hashtype,))
+		if any(not_found) or any(unreadable):
+			sys.exit(1)
+		return entries
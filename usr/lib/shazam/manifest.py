@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+""" Manifest is a support module, which keeps the manifests (the files with the hash sums
+of other files, written by ``shazam calc --write``) in a compact binary format, which is
+read with mmap, so one entry can be looked up without loading, or even reading, the whole
+file, and which can be converted to and from the text format without losing anything.
+
+The binary manifest is, in little endian order:
+	the header (see `BinaryManifest.HEADER`), with the offsets of the other sections,
+	the metadata, in JSON: the hashtype, the tags of the tagged lines and if the text ended with a newline,
+	the prefix table: the offset and length of each directory shared by the paths,
+	the strings: the directories and the names of the files, encoded as the file system does,
+	the digests: the raw bytes of the hash sums,
+	the records: one per entry, in the order of the text (see `BinaryManifest.RECORD`),
+	the index: the numbers of the records, sorted by path.
+"""
+# -*- coding: utf-8 -*-
+
+__author__ = "Anaxímeno Brito"
+__version__ = "0.4.7.1-beta"
+__license__ = "GNU General Public License v3.0"
+__copyright__ = "Copyright (c) 2020-2021 by " + __author__
+
+import os
+import sys
+import mmap
+import array
+import struct
+from itertools import zip_longest
+from collections.abc import Generator, Iterable
+from algorithms import get_name_from_tag
+from common import TextFile, Process, InputError, ReadingError
+from common import get_hashtype_from_filename, hexa_to_bytes, write_atomically
+
+
+class BinaryManifest(object):
+	"""Manifest in the binary format (see the module's docstring), memory-mapped while it is open,
+	which has the methods of `common.TextFile` for reading the entries of the text ones."""
+
+	MAGIC = b'SHAZAMBM'
+	VERSION = 1
+	# magic, version, number of entries and prefixes, offset and length of the metadata,
+	# and the offsets of the prefix table, strings, digests, records and index.
+	HEADER = struct.Struct('<8sIQQQQQQQQQ')
+	# Offset and length of a directory inside the strings.
+	PREFIX = struct.Struct('<QI')
+	# Prefix number, offset and length of the name inside the strings, offset and length of the
+	# digest, style of the line (see the `STYLE_` flags), tag number and size (-1 if it isn't known).
+	RECORD = struct.Struct('<IQIQBBHq')
+	INDEX_ITEM = struct.Struct('<I')
+	# The flags of the style of the lines of the text, so they are written back the same.
+	STYLE_TAGGED = 0x1
+	STYLE_SIZE = 0x2
+	STYLE_TWO_SPACES = 0x4
+	STYLE_UPPERCASE = 0x8
+	# Characters which start the glob part of a pattern, the paths are only searched after them.
+	WILDCARDS = '*?['
+
+	def __init__(self, filename: str):
+		"""Raises `common.ReadingError` when the file can't be read or isn't a binary manifest."""
+		import json
+		self._filename = filename
+		try:
+			with open(filename, 'rb') as f:
+				self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+		except FileNotFoundError:
+			raise ReadingError(f'{filename!r} was not found!', error_type='file not found error') from None
+		except (OSError, ValueError):
+			raise ReadingError(f'{filename!r} is not possible to read!') from None
+		try:
+			(magic, version, self._length, n_prefixes, meta_offset, meta_length, self._prefixes_offset,
+				self._strings_offset, self._digests_offset, self._records_offset,
+				self._index_offset) = BinaryManifest.HEADER.unpack_from(self._map)
+			if magic != BinaryManifest.MAGIC or version != BinaryManifest.VERSION:
+				raise ValueError()
+			metadata = json.loads(self._map[meta_offset:meta_offset + meta_length])
+		except (struct.error, ValueError):
+			self.close()
+			raise ReadingError(f'{filename!r} is not a binary manifest of this version!') from None
+		self._hashtype = metadata['hashtype']
+		self._tags = metadata['tags']
+		self._hashtypes = [get_name_from_tag(tag.strip()) for tag in self._tags]
+		self._final_newline = metadata['final_newline']
+
+	def close(self) -> None:
+		if self._map is not None:
+			self._map.close()
+			self._map = None
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_info) -> None:
+		self.close()
+
+	def __len__(self) -> int:
+		return self._length
+
+	def get_fullpath(self) -> str:
+		return self._filename
+
+	def get_hashtype(self):
+		"""Returns the hashtype of the manifest, found (as for the text ones) when it was converted, or None."""
+		return self._hashtype
+
+	def _get_string(self, offset: int, length: int) -> bytes:
+		start = self._strings_offset + offset
+		return self._map[start:start + length]
+
+	def _get_record(self, n: int) -> tuple:
+		return BinaryManifest.RECORD.unpack_from(self._map, self._records_offset + n * BinaryManifest.RECORD.size)
+
+	def _get_path(self, record: tuple) -> bytes:
+		"""Returns the path of the record's file, as it is encoded in the manifest."""
+		prefix, name_offset, name_length = record[:3]
+		prefix_offset, prefix_length = BinaryManifest.PREFIX.unpack_from(
+			self._map, self._prefixes_offset + prefix * BinaryManifest.PREFIX.size)
+		return self._get_string(prefix_offset, prefix_length) + self._get_string(name_offset, name_length)
+
+	def _get_indexed(self, position: int) -> int:
+		"""Returns the number of the record at the position of the sorted index."""
+		return BinaryManifest.INDEX_ITEM.unpack_from(self._map, self._index_offset + position * 4)[0]
+
+	def _get_entry(self, n: int) -> tuple:
+		record = self._get_record(n)
+		_, _, _, digest_offset, digest_length, style, tag, size = record
+		start = self._digests_offset + digest_offset
+		hashsum = self._map[start:start + digest_length].hex()
+		if style & BinaryManifest.STYLE_UPPERCASE:
+			hashsum = hashsum.upper()
+		return (os.fsdecode(self._get_path(record)), hashsum,
+			size if style & BinaryManifest.STYLE_SIZE else None,
+			self._hashtypes[tag] if style & BinaryManifest.STYLE_TAGGED else None)
+
+	def iter_entries(self) -> Generator:
+		"""Generates the entries of the manifest, in order, as `common.TextFile.iter_entries` does."""
+		for n in range(self._length):
+			yield self._get_entry(n)
+
+	def _bisect(self, path: bytes) -> int:
+		"""Returns the first position of the sorted index whose path isn't before the path."""
+		low, high = 0, self._length
+		while low < high:
+			middle = (low + high) // 2
+			if self._get_path(self._get_record(self._get_indexed(middle))) < path:
+				low = middle + 1
+			else:
+				high = middle
+		return low
+
+	def _iter_prefixed(self, prefix: bytes) -> Generator:
+		"""Generates the numbers of the records whose paths start with the prefix, by path."""
+		for position in range(self._bisect(prefix), self._length):
+			n = self._get_indexed(position)
+			path = self._get_path(self._get_record(n))
+			if not path.startswith(prefix):
+				break
+			yield n, path
+
+	def lookup(self, name: str, hashtype: str = None):
+		"""Returns the first entry of the file (see `iter_entries`) and, if it is given, whose hashtype is the
+		one given or not known, or None if it isn't listed. Only O(log n) records are read."""
+		path = os.fsencode(name)
+		found = []
+		for position in range(self._bisect(path), self._length):
+			n = self._get_indexed(position)
+			if self._get_path(self._get_record(n)) != path:
+				break
+			found.append(n)
+		for n in sorted(found):
+			entry = self._get_entry(n)
+			if hashtype is None or entry[3] is None or entry[3] == hashtype:
+				return entry
+		return None
+
+	def iter_matching(self, patterns: Iterable) -> Generator:
+		"""Generates the entries (see `iter_entries`) whose paths match any of the glob patterns, in order. Only the
+		paths starting with the part of each pattern before its first wildcard are read, found in the sorted index."""
+		import fnmatch
+		found = set()
+		for pattern in patterns:
+			literal = pattern
+			for wildcard in BinaryManifest.WILDCARDS:
+				literal = literal.split(wildcard, 1)[0]
+			for n, path in self._iter_prefixed(os.fsencode(literal)):
+				if fnmatch.fnmatchcase(os.fsdecode(path), pattern):
+					found.add(n)
+		for n in sorted(found):
+			yield self._get_entry(n)
+
+	def iter_lines(self) -> Generator:
+		"""Generates the lines of the manifest in the text format, the same ones it was converted from."""
+		for n in range(self._length):
+			record = self._get_record(n)
+			_, _, _, digest_offset, digest_length, style, tag, size = record
+			start = self._digests_offset + digest_offset
+			hashsum = self._map[start:start + digest_length].hex()
+			if style & BinaryManifest.STYLE_UPPERCASE:
+				hashsum = hashsum.upper()
+			line = _format_line(os.fsdecode(self._get_path(record)), hashsum,
+				size if style & BinaryManifest.STYLE_SIZE else None,
+				self._tags[tag] if style & BinaryManifest.STYLE_TAGGED else None, style)
+			yield line + ('\n' if n < self._length - 1 or self._final_newline else '')
+
+
+def is_binary_manifest(filename: str) -> bool:
+	try:
+		with open(filename, 'rb') as f:
+			return f.read(len(BinaryManifest.MAGIC)) == BinaryManifest.MAGIC
+	except OSError:
+		return False
+
+
+def open_manifest(filename: str):
+	"""Returns the manifest, a `BinaryManifest` or a `common.TextFile`, by its contents."""
+	return BinaryManifest(filename) if is_binary_manifest(filename) else TextFile(filename)
+
+
+def _get_style(line: str, hashsum: str, size, tag) -> int:
+	"""Returns the style flags of the line of the text manifest (see `BinaryManifest.STYLE_TAGGED`)."""
+	style = 0
+	if tag is not None:
+		style |= BinaryManifest.STYLE_TAGGED
+	if size is not None:
+		style |= BinaryManifest.STYLE_SIZE
+	if hashsum != hashsum.lower():
+		style |= BinaryManifest.STYLE_UPPERCASE
+	if tag is None and size is None and line.startswith(hashsum + '  '):
+		style |= BinaryManifest.STYLE_TWO_SPACES
+	return style
+
+
+def write_binary(source: str, destination: str) -> int:
+	"""Converts the text manifest into a binary one, returns the number of entries. Raises `common.InputError`
+	if some line can't be converted losslessly (e.g. with other spaces than the ones written by shazam or
+	sha256sum), or its hash sum isn't hexadecimal, or `common.ReadingError` if it can't be read."""
+	import json
+	text = TextFile(source)
+	hashtype = get_hashtype_from_filename(source)
+	# The records are built in order, each string and tag is stored once.
+	strings = bytearray()
+	digests = bytearray()
+	records = bytearray()
+	prefixes = {}
+	prefix_table = []
+	tags = {}
+	paths = []
+	final_newline = True
+
+	def add_string(value: bytes) -> tuple:
+		strings.extend(value)
+		return len(strings) - len(value), len(value)
+
+	try:
+		with open(source, 'rt', newline='') as lines:
+			for number, (line, entry) in enumerate(zip_longest(lines, text.iter_entries()), start=1):
+				if line is None or entry is None:
+					raise InputError(f'{source!r} can not be converted without changing it, its lines are not '
+						'separated by newlines!')
+				name, hashsum, size, entry_hashtype = entry
+				tag = line.rpartition(') = ')[0].partition(' (')[0] if entry_hashtype is not None else None
+				if hashsum not in (hashsum.lower(), hashsum.upper()):
+					# Only the case of the whole hash sum is kept.
+					raise InputError(f'line {number} of {source!r} can not be converted without changing it, '
+						'its hash sum has both lowercase and uppercase letters!')
+				style = _get_style(line, hashsum, size, tag)
+				digest = hexa_to_bytes(hashsum)
+				path = os.fsencode(name)
+				directory, _, _ = path.rpartition(b'/')
+				directory = directory + b'/' if b'/' in path else b''
+				if directory not in prefixes:
+					prefixes[directory] = len(prefix_table)
+					prefix_table.append(add_string(directory))
+				name_offset, name_length = add_string(path[len(directory):])
+				tag_number = tags.setdefault(tag, len(tags)) if tag is not None else 0
+				records.extend(BinaryManifest.RECORD.pack(prefixes[directory], name_offset, name_length,
+					len(digests), len(digest), style, tag_number, size if size is not None else -1))
+				digests.extend(digest)
+				paths.append(path)
+				final_newline = line.endswith('\n')
+				if line.rstrip('\n') != _format_line(name, hashsum, size, tag, style):
+					raise InputError(f'line {number} of {source!r} can not be converted without changing it!')
+	except (UnicodeDecodeError, OSError):
+		raise ReadingError(f'{source!r} is not possible to read!') from None
+
+	index = array.array('I', sorted(range(len(paths)), key=paths.__getitem__))
+	if sys.byteorder == 'big':
+		index.byteswap()
+	metadata = json.dumps({'hashtype': hashtype, 'tags': list(tags), 'final_newline': final_newline}).encode()
+	table = b''.join(BinaryManifest.PREFIX.pack(offset, length) for offset, length in prefix_table)
+	sections = [metadata, table, strings, digests, records, index.tobytes()]
+	offsets = []
+	offset = BinaryManifest.HEADER.size
+	for section in sections:
+		offsets.append(offset)
+		offset += len(section)
+	header = BinaryManifest.HEADER.pack(BinaryManifest.MAGIC, BinaryManifest.VERSION, len(paths), len(prefix_table),
+		offsets[0], len(metadata), *offsets[1:])
+	write_atomically(destination, [header] + sections, binary=True)
+	return len(paths)
+
+
+def _format_line(name: str, hashsum: str, size, tag, style: int) -> str:
+	if tag is not None:
+		return f'{tag} ({name}) = {hashsum}' + (f' {size}' if size is not None else '')
+	elif size is not None:
+		return f'{hashsum} {size} {name}'
+	return hashsum + ('  ' if style & BinaryManifest.STYLE_TWO_SPACES else ' ') + name
+
+
+def write_text(source: str, destination: str) -> int:
+	"""Converts the binary manifest back into the text one it was converted from, returns the number of entries."""
+	with BinaryManifest(source) as manifest:
+		write_atomically(destination, manifest.iter_lines())
+		return len(manifest)
+
+
+def convert(source: str, destination: str) -> int:
+	"""Converts the manifest into the other format, from text to binary or from binary to text, and copies the hash
+	sums of the segments written beside it (see `common.Process.SEGMENTS_EXTENSION`). Returns the number of entries."""
+	import shutil
+	n_entries = write_text(source, destination) if is_binary_manifest(source) else write_binary(source, destination)
+	segments = source + Process.SEGMENTS_EXTENSION
+	if os.path.exists(segments):
+		shutil.copyfile(segments, destination + Process.SEGMENTS_EXTENSION)
+	return n_entries
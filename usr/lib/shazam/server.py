@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+""" Server is a support module, which runs shazam as a long running daemon (``shazam serve``),
+hashing the files requested by local clients through a Unix socket, with a pool of workers
+and a cache of the recent hash sums kept between the requests, so the clients (e.g. many
+``shazam check`` runs) don't pay for starting the workers or hashing the same files again.
+
+The requests and responses are JSON objects, one per line. The requests are:
+	{"op": "hash", "paths": [PATH, ...], "algos": ["sha256", ...]}
+	{"op": "verify", "algo": "sha256", "entries": [[PATH, HASH], [PATH, HASH, SIZE], ...]}
+	{"op": "ping"}
+The response of hash and verify is one record per file and algorithm, as soon as each file is
+hashed (see `common.make_record`), the paths should be absolute. Every response ends with one
+line with ``"done": true``, which also has the ``error`` and its ``error_type`` if the request
+failed, or the information about the daemon for ping.
+"""
+# -*- coding: utf-8 -*-
+
+__author__ = "Anaxímeno Brito"
+__version__ = "0.4.7.1-beta"
+__license__ = "GNU General Public License v3.0"
+__copyright__ = "Copyright (c) 2020-2021 by " + __author__
+
+import os
+import sys
+import threading
+from collections.abc import Generator, Iterable
+from cache import MemoryDigestCache, get_cache_dir
+from common import Process, ShazamError, InputError
+
+
+def get_socket_path() -> str:
+	"""Returns the path of the daemon's socket: $SHAZAM_SOCKET if it is set, else 'shazam.sock'
+	inside $XDG_RUNTIME_DIR, or inside the cache directory if there isn't one."""
+	return os.environ.get('SHAZAM_SOCKET') or os.path.join(os.environ.get('XDG_RUNTIME_DIR') or get_cache_dir(), 'shazam.sock')
+
+
+class _SharedPool(object):
+	"""The pool of workers of the daemon, given to each request as an executor (of `concurrent.futures`),
+	which doesn't shut it down. That module is only imported by the daemon, when its pool is created,
+	as this one is imported by every command, for connecting to the daemon."""
+
+	def __init__(self, pool):
+		self._pool = pool
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_info) -> None:
+		self.shutdown()
+
+	def submit(self, *args, **kwargs):
+		return self._pool.submit(*args, **kwargs)
+
+	def shutdown(self, wait: bool = True, **kwargs) -> None:
+		# Only shut down when the daemon stops, see `_WarmProcess.close`.
+		pass
+
+
+class _WarmProcess(Process):
+	"""Process whose pool of workers is only started once, and used by all the requests at the same time."""
+
+	def __init__(self, **kwargs):
+		super().__init__(**kwargs)
+		self._pool = None
+		self._pool_lock = threading.Lock()
+
+	def _create_pool(self, **pool_options):
+		with self._pool_lock:
+			if self._pool is None:
+				self._pool = super()._create_pool(**pool_options)
+		return _SharedPool(self._pool)
+
+	def close(self) -> None:
+		if self._pool is not None:
+			self._pool.shutdown(wait=False)
+		super().close()
+
+
+class Daemon(object):
+	"""Serves the hash and verify requests of the clients connected to its Unix socket, each one in its own
+	thread, all of them hashing the files with the same pool of workers and cache of the recent hash sums."""
+
+	def __init__(self, socket_path: str = None, max_entries: int = None, **options):
+		"""`socket_path` is where the daemon listens (None means `get_socket_path()`),
+		`max_entries` is the number of recent hash sums kept (see `MemoryDigestCache`),
+		the other options are the ones of `Process`, the jobs are one per cpu core by default, and the files
+		are read, not memory-mapped, unless the `io_mode` is 'mmap' (see `File.gen_data`)."""
+		options.setdefault('jobs', 0)
+		if options.get('io_mode', 'auto') == 'auto':
+			options['io_mode'] = 'read'
+		self._socket_path = socket_path or get_socket_path()
+		self._cache = MemoryDigestCache(max_entries)
+		self._process = _WarmProcess(cache=self._cache, progress=False, **options)
+		self._server = None
+
+	def get_socket_path(self) -> str:
+		return self._socket_path
+
+	def handle(self, request: dict) -> Generator:
+		"""Yields the response of the request, the records of the files and the final line."""
+		from api import hash_many, verify_many
+		if not isinstance(request, dict):
+			raise InputError('the request must be a JSON object!')
+		op = request.get('op')
+		if op == 'ping':
+			yield {'done': True, 'pid': os.getpid(), 'version': __version__,
+				'cache': {'entries': len(self._cache), 'hits': self._cache.hits, 'misses': self._cache.misses}}
+			return
+		elif op == 'hash':
+			results = hash_many(request['paths'], request.get('algos', 'sha256'), process=self._process)
+		elif op == 'verify':
+			results = verify_many(request['entries'], request['algo'], process=self._process)
+		else:
+			raise InputError(f'unknown op {op!r}, use one of: hash, verify or ping')
+		n_results = 0
+		for result in results:
+			yield result._asdict()
+			n_results += 1
+		yield {'done': True, 'results': n_results}
+
+	def listen(self) -> None:
+		"""Starts listening to the socket, the requests are only served by `serve_forever`.
+		Raises `ShazamError` if another daemon is already serving at the same socket."""
+		import json
+		import socketserver
+		daemon = self
+
+		class Handler(socketserver.StreamRequestHandler):
+			def handle(self):
+				for line in self.rfile:
+					try:
+						for response in daemon.handle(json.loads(line)):
+							self.wfile.write(json.dumps(response).encode() + b'\n')
+					except (ShazamError, ValueError, KeyError, TypeError) as error:
+						message = f'the request has no {error.args[0]!r}' if isinstance(error, KeyError) else str(error)
+						response = {'done': True, 'error': message,
+							'error_type': getattr(error, 'error_type', 'request error')}
+						self.wfile.write(json.dumps(response).encode() + b'\n')
+					except OSError:
+						# The client is gone, the rest of its results aren't hashed.
+						return
+
+		if os.path.exists(self._socket_path):
+			try:
+				Client(self._socket_path).close()
+			except OSError:
+				# Left by a daemon which didn't stop cleanly.
+				os.remove(self._socket_path)
+			else:
+				raise ShazamError(f'a daemon is already serving at {self._socket_path!r}!', error_type='daemon error')
+		os.makedirs(os.path.dirname(os.path.abspath(self._socket_path)), exist_ok=True)
+
+		# The files are read as the daemon's user, so only the same user can connect.
+		umask = os.umask(0o077)
+		try:
+			server = socketserver.ThreadingUnixStreamServer(self._socket_path, Handler)
+		finally:
+			os.umask(umask)
+		server.daemon_threads = True
+		self._server = server
+
+	def serve_forever(self) -> None:
+		"""Serves the requests until the daemon is interrupted or terminated, then removes the socket."""
+		import signal
+		if self._server is None:
+			self.listen()
+		signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+		try:
+			self._server.serve_forever()
+		finally:
+			self._server.server_close()
+			if os.path.exists(self._socket_path):
+				os.remove(self._socket_path)
+			self._process.close()
+
+
+class Client(object):
+	"""Client of a running daemon, which sends the requests and reads their responses (see the
+	module's docstring). It connects again if the last connection was closed."""
+
+	def __init__(self, socket_path: str = None):
+		"""Raises `OSError` if no daemon is serving at the socket (None means `get_socket_path()`)."""
+		self._socket_path = socket_path or get_socket_path()
+		self._socket = None
+		self._reader = None
+		self._connect()
+
+	def _connect(self) -> None:
+		import socket
+		self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		try:
+			self._socket.connect(self._socket_path)
+		except OSError:
+			self.close()
+			raise
+		self._reader = self._socket.makefile('rb')
+
+	def close(self) -> None:
+		if self._reader is not None:
+			self._reader.close()
+			self._reader = None
+		if self._socket is not None:
+			self._socket.close()
+			self._socket = None
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_info) -> None:
+		self.close()
+
+	def _send(self, message: dict) -> None:
+		import json
+		if self._socket is None:
+			self._connect()
+		self._socket.sendall(json.dumps(message).encode() + b'\n')
+
+	def _receive(self) -> dict:
+		line = self._reader.readline()
+		if not line:
+			self.close()
+			raise ConnectionError('the daemon closed the connection')
+		import json
+		response = json.loads(line)
+		if response.get('done') and 'error' in response:
+			raise ShazamError(response['error'], error_type=response.get('error_type', 'daemon error'))
+		return response
+
+	def ping(self) -> dict:
+		"""Returns the information about the daemon: its pid, version and cache."""
+		self._send({'op': 'ping'})
+		return self._receive()
+
+	def request(self, message: dict) -> Generator:
+		"""Sends the request and yields the records of its response, as soon as they are received."""
+		self._send(message)
+		done = False
+		try:
+			while not done:
+				response = self._receive()
+				done = bool(response.get('done'))
+				if not done:
+					yield response
+		finally:
+			if not done:
+				# The rest of the records aren't wanted, closing the connection stops hashing the files.
+				self.close()
+
+	def hash(self, paths: Iterable, algos: Iterable) -> Generator:
+		"""Yields the records of the hash sums of the algorithms of the files, see `api.hash_many`."""
+		return self.request({'op': 'hash', 'paths': list(paths), 'algos': list(algos)})
+
+	def verify(self, entries: Iterable, algo: str) -> Generator:
+		"""Yields the records of the verified entries, see `api.verify_many`."""
+		return self.request({'op': 'verify', 'entries': [list(entry) for entry in entries], 'algo': algo})
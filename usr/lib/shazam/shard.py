@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+""" Shard is a support module, which splits the files of a manifest into shards checked by
+independent workers (``shazam read --shard K/N``), e.g. processes of one machine or many
+machines sharing the files, with no coordinator: each worker finds its own shard from the
+manifest alone, and writes its results into a partial results file. ``shazam merge`` then
+combines the partial results of all shards into one report and exit status.
+
+A partial results file has JSON lines: first the header, with the shard, the number of
+shards, how the files were split and what was checked, then the record of each file (see
+`common.make_record`), and last the footer, ``{"done": true, ...}``, only written when the
+worker wasn't interrupted."""
+# -*- coding: utf-8 -*-
+
+__author__ = "Anaxímeno Brito"
+__version__ = "0.4.7.1-beta"
+__license__ = "GNU General Public License v3.0"
+__copyright__ = "Copyright (c) 2020-2021 by " + __author__
+
+import os
+import sys
+import json
+import zlib
+import contextlib
+from collections.abc import Generator, Iterable
+from common import InputError, ReadingError, Errors, clr, write_line
+
+# Ways of splitting the files: by the hash of their listed paths, or into ranges of the listed
+# order with about the same number of bytes, which needs the sizes in the manifest.
+SHARD_BY = ['path', 'size']
+# The statuses of the records of the files which are fine, the others make `merge` exit with 1.
+OK_STATUSES = ('ok', 'hashed')
+# What is reported of the files which aren't fine, by status, with the human output.
+PROBLEMS = {'failed': 'modified!!', 'missing': 'not found!', 'unreadable': 'not possible to read!'}
+
+
+def parse_shard(value: str):
+	"""Returns the shard and the number of shards of a 'K/N' string (e.g. '2/8', 1 <= K <= N),
+	or None if it isn't valid."""
+	shard, _, shards = value.partition('/')
+	try:
+		shard, shards = int(shard), int(shards)
+	except ValueError:
+		return None
+	return (shard, shards) if 1 <= shard <= shards else None
+
+
+def get_path_shard(name: str, shards: int) -> int:
+	"""Returns the shard of the listed path, 1 to `shards`, by its CRC-32, which is the same on every machine."""
+	return zlib.crc32(os.fsencode(name)) % shards + 1
+
+
+def iter_shard(entries: Iterable, shard: int, shards: int, by: str = 'path') -> Generator:
+	"""Generates the entries of a manifest (see `common.TextFile.iter_entries`) which are in the shard.
+	By 'path' the entries are generated as they are read, by 'size' they are all read first, then
+	each shard gets a range of the entries in the listed order with about the same number of bytes.
+	Raises `common.InputError` when splitting by size and an entry doesn't have its size."""
+	if by == 'path':
+		yield from (entry for entry in entries if get_path_shard(entry[0], shards) == shard)
+		return
+	elif by not in SHARD_BY:
+		raise InputError(f'the files can only be split by: {", ".join(SHARD_BY)}!')
+	entries = list(entries)
+	if any(entry[2] is None for entry in entries):
+		raise InputError('the files can only be split by size when the manifest has their sizes '
+			'(written by calc --write --sizes)!')
+	total = sum(entry[2] for entry in entries)
+	offset = 0
+	for n, entry in enumerate(entries):
+		# Each entry is in the shard of the middle of its bytes (or of its number, when all are empty).
+		middle = (offset + entry[2] / 2) / total if total else (n + 0.5) / len(entries)
+		offset += entry[2]
+		if min(int(middle * shards), shards - 1) + 1 == shard:
+			yield entry
+
+
+class ResultsWriter(object):
+	"""Writes the partial results file of one shard: the header when it is opened, the records of the files,
+	and the footer when it is closed, if the worker wasn't interrupted (or only stopped by --fail-fast)."""
+
+	def __init__(self, filename: str, header: dict):
+		"""Raises `OSError` when the file can't be written."""
+		self._file = open(filename, 'wt')
+		self._n_records = 0
+		self._file.write(json.dumps(header) + '\n')
+
+	def write(self, text: str) -> None:
+		"""Writes records, as written by `Process.checkfiles`, one per line."""
+		self._n_records += text.count('\n')
+		self._file.write(text)
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, *exc_info) -> None:
+		if exc_type is None or issubclass(exc_type, SystemExit):
+			self._file.write(json.dumps({'done': True, 'files': self._n_records, 'stopped': exc_type is not None}) + '\n')
+		self._file.close()
+
+
+def read_header(filename: str) -> dict:
+	"""Returns the header of the partial results file. Raises `common.ReadingError` when it can't be read."""
+	try:
+		with open(filename, 'rt') as results:
+			header = json.loads(results.readline())
+	except FileNotFoundError:
+		raise ReadingError(f'{filename!r} was not found!', error_type='file not found error') from None
+	except (UnicodeDecodeError, OSError, ValueError):
+		raise ReadingError(f'{filename!r} is not possible to read!') from None
+	if not isinstance(header, dict) or 'shard' not in header or 'shards' not in header:
+		raise ReadingError(f'{filename!r} is not a partial results file, written by read --shard K/N --results FILE!')
+	return header
+
+
+def iter_records(filename: str, footer: dict) -> Generator:
+	"""Generates the records of the partial results file, after its header, and updates the footer with
+	its own, which is left empty if the worker was interrupted. Raises `common.ReadingError` when a line
+	can't be read."""
+	try:
+		with open(filename, 'rt') as results:
+			results.readline()
+			for line in results:
+				record = json.loads(line)
+				if record.get('done'):
+					footer.update(record)
+					break
+				yield record
+	except (UnicodeDecodeError, OSError, ValueError):
+		raise ReadingError(f'{filename!r} is not possible to read!') from None
+
+
+def check_headers(headers: dict) -> None:
+	"""Raises `common.InputError` unless the headers, by file name, are of all the shards of the same checks."""
+	shards = {}
+	first = None
+	for filename, header in headers.items():
+		checked = {key: value for key, value in header.items() if key != 'shard'}
+		if first is None:
+			first = (filename, checked)
+		elif checked != first[1]:
+			raise InputError(f'{filename!r} and {first[0]!r} are not shards of the same checks!',
+				f'  {first[0]!r}: {json.dumps(first[1])}', f'  {filename!r}: {json.dumps(checked)}')
+		if header['shard'] in shards:
+			raise InputError(f'{filename!r} and {shards[header["shard"]]!r} have the same shard, {header["shard"]}!')
+		shards[header['shard']] = filename
+	missing = [str(shard) for shard in range(1, first[1]['shards'] + 1) if shard not in shards]
+	if any(missing):
+		raise InputError(f'the results of the shards {", ".join(missing)} of {first[1]["shards"]} were not given!')
+
+
+def merge(filenames: Iterable, output: str = 'human') -> bool:
+	"""Prints the results of all shards, from their partial results files, as one report: with the human
+	output only the files which aren't ok and the number of files by status, with the others all the files
+	(as printed by ``shazam read``). Returns if all files are ok and all workers finished. Raises
+	`common.ShazamError` when a file can't be read, or the files aren't of all the shards of the same checks."""
+	headers = {filename: read_header(filename) for filename in filenames}
+	check_headers(headers)
+	counts = {}
+	incomplete = []
+	for filename in sorted(headers, key=lambda filename: headers[filename]['shard']):
+		footer = {}
+		for record in iter_records(filename, footer):
+			status = record['status']
+			counts[status] = counts.get(status, 0) + 1
+			if output == 'jsonl':
+				print(json.dumps(record))
+			elif output == 'porcelain':
+				print(f"{record['path']}: {'OK' if status in OK_STATUSES else 'FAILED'}")
+			elif status not in OK_STATUSES:
+				write_line(clr('* ', 'red') + clr(record['path'], 'white') + clr(f" was {PROBLEMS.get(status, status)}", 'red'))
+		if not footer or footer.get('stopped'):
+			incomplete.append((filename, 'was stopped by --fail-fast' if footer else 'was interrupted'))
+
+	if output == 'human':
+		summary = ', '.join(f'{count} {status}' for status, count in sorted(counts.items()))
+		write_line(f"\n{sum(counts.values())} files checked by {len(headers)} shards: {summary or 'none'}")
+	e = Errors(to_exit=False, error_type='merge error')
+	# Only the results are printed to the standard output, but with the human output.
+	with contextlib.redirect_stdout(sys.stdout if output == 'human' else sys.stderr):
+		for filename, reason in incomplete:
+			e.print_error(f'the worker of {filename!r} {reason}, its shard was not entirely checked!')
+	return not incomplete and all(status in OK_STATUSES for status in counts)
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+""" Stats is a support module, which measures where the time of one execution
+of this programm was spent, for finding out why it is slow."""
+# -*- coding: utf-8 -*-
+
+__author__ = "Anaxímeno Brito"
+__version__ = "0.4.7.1-beta"
+__license__ = "GNU General Public License v3.0"
+__copyright__ = "Copyright (c) 2020-2021 by " + __author__
+
+import threading
+from time import perf_counter
+
+
+def format_size(size: float) -> str:
+	"""Returns the number of bytes in a human readable way, e.g.: '1.5 MiB'."""
+	for unit in ('B', 'KiB', 'MiB', 'GiB'):
+		if size < 1024:
+			return f'{size:.1f} {unit}'
+		size /= 1024
+	return f'{size:.1f} TiB'
+
+
+class RunStats(object):
+	"""Time spent by the phases of one execution and the number of files and bytes hashed.
+
+	The phases are: 'probe' (finding if the files exist and aren't directories), 'cache' (looking for
+	the hash sums in the cache), 'read' (reading the data, in `File.gen_data`), 'digest' (hashing it,
+	in `File.update_many_data`, also measured by hashtype) and 'output' (formatting and printing the
+	results). When the files are hashed in parallel, the times of all jobs are summed, so they can
+	be bigger than the total time. The measurements can be added from many threads at once."""
+
+	PHASES = ['probe', 'cache', 'read', 'digest', 'output']
+
+	def __init__(self):
+		self._lock = threading.Lock()
+		self._start = perf_counter()
+		self.times = dict.fromkeys(RunStats.PHASES, 0.0)
+		# Seconds and bytes hashed by each hashtype.
+		self.digest_times = {}
+		self.digest_bytes = {}
+		self.bytes_read = 0
+		self.files_hashed = 0
+
+	def add_time(self, phase: str, seconds: float) -> None:
+		with self._lock:
+			self.times[phase] += seconds
+
+	def add_read(self, seconds: float, nbytes: int) -> None:
+		with self._lock:
+			self.times['read'] += seconds
+			self.bytes_read += nbytes
+
+	def add_digest(self, hashtype: str, seconds: float, nbytes: int) -> None:
+		with self._lock:
+			self.times['digest'] += seconds
+			self.digest_times[hashtype] = self.digest_times.get(hashtype, 0.0) + seconds
+			self.digest_bytes[hashtype] = self.digest_bytes.get(hashtype, 0) + nbytes
+
+	def add_file(self) -> None:
+		with self._lock:
+			self.files_hashed += 1
+
+	def timer(self, phase: str) -> '_Timer':
+		"""Returns a context manager which adds the time spent inside it to the phase."""
+		return _Timer(self, phase)
+
+	def to_dict(self) -> dict:
+		"""Returns the measurements, which can be added to other stats with `merge`
+		(e.g. the ones measured inside a worker process)."""
+		with self._lock:
+			return {
+				'times': dict(self.times),
+				'digest_times': dict(self.digest_times),
+				'digest_bytes': dict(self.digest_bytes),
+				'bytes_read': self.bytes_read,
+				'files_hashed': self.files_hashed,
+			}
+
+	def merge(self, measurements: dict) -> None:
+		"""Adds the measurements returned by the `to_dict` of other stats."""
+		with self._lock:
+			for phase, seconds in measurements['times'].items():
+				self.times[phase] += seconds
+			for hashtype, seconds in measurements['digest_times'].items():
+				self.digest_times[hashtype] = self.digest_times.get(hashtype, 0.0) + seconds
+			for hashtype, nbytes in measurements['digest_bytes'].items():
+				self.digest_bytes[hashtype] = self.digest_bytes.get(hashtype, 0) + nbytes
+			self.bytes_read += measurements['bytes_read']
+			self.files_hashed += measurements['files_hashed']
+
+	def report(self, cache=None) -> list:
+		"""Returns the lines of the report, with the hits of the cache, if it is given."""
+		elapsed = perf_counter() - self._start
+		lines = [
+			f'stats: {elapsed:.3f}s in total',
+			f'  files hashed: {self.files_hashed} ({self.files_hashed / elapsed:.1f} files/s)',
+			f'  bytes hashed: {format_size(self.bytes_read)} ({format_size(self.bytes_read / elapsed)}/s)',
+		]
+		for phase in RunStats.PHASES:
+			lines.append(f'  {phase + ":":<8} {self.times[phase]:>10.3f}s')
+			if phase == 'cache' and cache is not None:
+				lines[-1] += f'  ({cache.hits} hits, {cache.misses} misses)'
+			elif phase == 'digest':
+				for hashtype, seconds in self.digest_times.items():
+					rate = format_size(self.digest_bytes[hashtype] / seconds) + '/s' if seconds > 0 else '-'
+					lines.append(f'    {hashtype + ":":<8} {seconds:>8.3f}s  {rate}')
+		return lines
+
+
+class _Timer(object):
+
+	__slots__ = ['_stats', '_phase', '_start']
+
+	def __init__(self, stats: RunStats, phase: str):
+		self._stats = stats
+		self._phase = phase
+
+	def __enter__(self):
+		self._start = perf_counter()
+		return self
+
+	def __exit__(self, *exc_info) -> None:
+		self._stats.add_time(self._phase, perf_counter() - self._start)
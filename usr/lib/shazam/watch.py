@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+""" Watch is a support module, which keeps checking the files of a manifest after they
+were verified (``shazam read --watch``), verifying again only the ones which changed,
+found by polling their stat metadata, or by inotify on Linux, if it is wanted."""
+# -*- coding: utf-8 -*-
+
+__author__ = "Anaxímeno Brito"
+__version__ = "0.4.7.1-beta"
+__license__ = "GNU General Public License v3.0"
+__copyright__ = "Copyright (c) 2020-2021 by " + __author__
+
+import os
+import sys
+import time
+import errno
+import select
+import struct
+from time import monotonic
+from collections.abc import Iterable
+from common import Process, write_line
+
+
+def get_signature(file_stat: os.stat_result):
+	"""Returns what identifies the version of a file, as in `cache.DigestCache`: its device, inode, size,
+	modification and status change time, None if it doesn't exist. The file is verified again when any of them changes."""
+	if file_stat is None:
+		return None
+	return file_stat.st_dev, file_stat.st_ino, file_stat.st_size, file_stat.st_mtime_ns, file_stat.st_ctime_ns
+
+
+def stat_signature(path: str):
+	try:
+		return get_signature(os.stat(path))
+	except (OSError, ValueError):
+		return None
+
+
+class StatWatcher(object):
+	"""Finds the files which may have changed by polling the stat metadata of all of them."""
+
+	def __init__(self, paths: Iterable):
+		self._paths = list(paths)
+
+	def wait(self, timeout: float) -> Iterable:
+		"""Waits for the timeout, returns the paths which may have changed since the last call."""
+		time.sleep(timeout)
+		return self._paths
+
+	def close(self) -> None:
+		pass
+
+
+class InotifyWatcher(object):
+	"""Finds the files which may have changed by the inotify events of their directories, so only the
+	changed files are queried. It is only available on Linux, with a C library which has inotify, else
+	`OSError` is raised. When some events are lost (or a directory is removed) all files are polled."""
+
+	IN_MODIFY = 0x2
+	IN_ATTRIB = 0x4
+	IN_CLOSE_WRITE = 0x8
+	IN_MOVED_FROM = 0x40
+	IN_MOVED_TO = 0x80
+	IN_CREATE = 0x100
+	IN_DELETE = 0x200
+	IN_Q_OVERFLOW = 0x4000
+	IN_IGNORED = 0x8000
+	IN_NONBLOCK = os.O_NONBLOCK
+	IN_CLOEXEC = 0o2000000
+	EVENTS_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+	# struct inotify_event: int wd, uint32_t mask, cookie and len, followed by the name.
+	EVENT_HEADER = struct.Struct('iIII')
+
+	def __init__(self, paths: Iterable):
+		import ctypes
+		import ctypes.util
+		try:
+			libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+			self._add_watch = libc.inotify_add_watch
+			self._fd = libc.inotify_init1(InotifyWatcher.IN_NONBLOCK | InotifyWatcher.IN_CLOEXEC)
+		except (OSError, AttributeError):
+			raise OSError(errno.ENOSYS, 'inotify is not available') from None
+		if self._fd < 0:
+			raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()))
+		self._paths = list(paths)
+		# The watched directories by watch descriptor, with the watched paths by directory and name.
+		self._directories = {}
+		self._names = {}
+		self._poll_all = False
+		try:
+			for path in self._paths:
+				directory, name = os.path.split(path)
+				directory = directory or os.curdir
+				if directory not in self._names:
+					wd = self._add_watch(self._fd, os.fsencode(directory), InotifyWatcher.EVENTS_MASK)
+					if wd < 0:
+						error = ctypes.get_errno()
+						raise OSError(error, f'{directory!r} can not be watched: {os.strerror(error)}')
+					self._directories[wd] = directory
+					self._names[directory] = {}
+				self._names[directory].setdefault(name, []).append(path)
+		except OSError:
+			self.close()
+			raise
+
+	def wait(self, timeout: float) -> Iterable:
+		if self._poll_all:
+			time.sleep(timeout)
+			return self._paths
+		readable, _, _ = select.select([self._fd], [], [], timeout)
+		if not readable:
+			return ()
+		changed = set()
+		while True:
+			try:
+				data = os.read(self._fd, 64 * 1024)
+			except BlockingIOError:
+				break
+			offset = 0
+			while offset < len(data):
+				wd, mask, _, length = InotifyWatcher.EVENT_HEADER.unpack_from(data, offset)
+				offset += InotifyWatcher.EVENT_HEADER.size
+				name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+				offset += length
+				if mask & (InotifyWatcher.IN_Q_OVERFLOW | InotifyWatcher.IN_IGNORED):
+					# Some events were lost, or the directory isn't watched anymore.
+					self._poll_all = mask & InotifyWatcher.IN_IGNORED != 0
+					return self._paths
+				changed.update(self._names.get(self._directories.get(wd), {}).get(name, ()))
+		return changed
+
+	def close(self) -> None:
+		if self._fd >= 0:
+			os.close(self._fd)
+			self._fd = -1
+
+
+def watch(process: Process, files: list, hashtype: str, interval: float = 2.0, debounce: float = 1.0,
+	inotify: bool = False, verbosity: bool = False, fail_fast: bool = False) -> None:
+	"""Verifies the files (see `Process.checkfiles`), then keeps verifying the ones which change, until it is
+	interrupted. A file is verified again `debounce` seconds after its last change was found, the changes
+	are looked for every `interval` seconds, or found by inotify if `inotify` is True and it is available."""
+	output = process.get_output()
+	process.checkfiles(files, hashtype, verbosity=verbosity, fail_fast=fail_fast)
+	# The files by path, with their signatures when they were verified (their stat is queried before hashing them).
+	files = {file.get_fullpath(): file for file in files}
+	signatures = {path: get_signature(file.get_stat()) for path, file in files.items()}
+	order = {path: n for n, path in enumerate(files)}
+
+	watcher = None
+	if inotify:
+		try:
+			watcher = InotifyWatcher(files)
+		except OSError as error:
+			if output == 'human':
+				write_line(f'shazam: watch error: {error.strerror or error}, polling the files instead')
+	watcher = watcher or StatWatcher(files)
+	if output == 'human':
+		write_line(f'\nwatching {len(files)} files for changes, stop it with Ctrl+C')
+	sys.stdout.flush()
+
+	# The time of the last change found in each changed file which wasn't verified yet.
+	pending = {}
+	try:
+		while True:
+			now = monotonic()
+			timeout = min([interval] + [changed + debounce - now for changed in pending.values()])
+			for path in watcher.wait(max(timeout, 0)):
+				signature = stat_signature(path)
+				if signature != signatures[path]:
+					signatures[path] = signature
+					pending[path] = monotonic()
+
+			now = monotonic()
+			ready = sorted((path for path, changed in pending.items() if now - changed >= debounce), key=order.get)
+			if not any(ready):
+				continue
+			for path in ready:
+				del pending[path]
+				files[path] = files[path].copy_given()
+			if output == 'human':
+				write_line(f"\n{time.strftime('%H:%M:%S')}: {len(ready)} changed file{'s' if len(ready) > 1 else ''}")
+			process.checkfiles([files[path] for path in ready], hashtype, verbosity=verbosity, fail_fast=fail_fast)
+			for path in ready:
+				signatures[path] = get_signature(files[path].get_stat())
+			sys.stdout.flush()
+	except KeyboardInterrupt:
+		pass
+	finally:
+		watcher.close()